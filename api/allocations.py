@@ -0,0 +1,239 @@
+# coding=utf-8
+"""
+Reports where memory is allocated during a request or a block of code, grouped by code site, by value object field type
+and by value object operation.
+
+Requires tracemalloc (Python 3.4+).
+
+Example:
+    with AllocationProfile('get_applicant_vo') as profile:
+        request.session.get_applicant_vo()
+
+    logger.info(json.dumps(profile.report))
+
+:see: api.middleware.AllocationProfilingMiddleware
+"""
+from __future__ import absolute_import, unicode_literals
+
+import inspect
+import os
+import sys
+import threading
+from time import time
+
+from api import instrumentation
+from api.value_object import fields
+
+try:
+  import tracemalloc
+except ImportError:
+  # Python 2 does not have tracemalloc; allocations can't be profiled.
+  tracemalloc = None
+
+_tracing_lock   = threading.Lock()
+_tracing_users  = 0
+_started_tracing = False
+
+# Before Python 3.7, tracebacks are ordered from the most recent frame to the oldest.
+_MOST_RECENT_FIRST = sys.version_info < (3, 7)
+
+
+class AllocationProfile(object):
+  """
+  Context manager that snapshots tracemalloc around a block of code, and reports the memory that was allocated (and
+    not freed) inside the block.
+
+  tracemalloc is started for the duration of the block, if it isn't tracing already.
+
+  Notes:
+    - Allocations are process-wide, so allocations made by other threads during the block are included.
+    - Value object operations (`by_value_object`) are only recorded while instrumentation is enabled.
+  """
+  def __init__(self, label=None, frames=10, top=10):
+    """
+    :type label: unicode
+    :param label: Included in the report (e.g., the request path).
+
+    :type frames: int
+    :param frames: Number of frames to record per allocation (only applies if tracemalloc isn't tracing already).
+      More frames make it more likely that allocations are attributed to a value object field, but make tracing
+      slower.
+
+    :type top: int
+    :param top: Number of allocation sites to report.
+    """
+    super(AllocationProfile, self).__init__()
+
+    if tracemalloc is None:
+      raise RuntimeError('Allocation profiling requires tracemalloc (Python 3.4+).')
+
+    self.label  = label
+    self.frames = frames
+    self.top    = top
+
+    self.report = None
+    """:type: dict"""
+
+    self._before  = None
+    self._started = None
+
+  def __enter__(self):
+    _start_tracing(self.frames)
+
+    self._before  = _take_snapshot()
+    self._started = time()
+
+    instrumentation.start_allocation_tracking()
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    try:
+      by_value_object = instrumentation.finish_allocation_tracking()
+      duration        = time() - self._started
+
+      diff = _take_snapshot().compare_to(self._before, 'traceback')
+    finally:
+      self._before = None
+      _stop_tracing()
+
+    self.report = build_report(diff, by_value_object, self.top)
+    self.report['label']    = self.label
+    self.report['duration'] = round(duration * 1000, 3)
+
+
+def build_report(diff, by_value_object, top=10):
+  """
+  :type diff: list[tracemalloc.StatisticDiff]
+  :param diff: Snapshot comparison, grouped by traceback.
+
+  :type by_value_object: dict[unicode, dict]
+  :param by_value_object: Allocations by value object operation (from `instrumentation.finish_allocation_tracking`).
+
+  :type top: int
+
+  :rtype: dict
+  """
+  sites       = {}
+  field_types = {}
+  net_bytes   = 0
+
+  for stat in diff:
+    if not (stat.size_diff or stat.count_diff):
+      continue
+
+    net_bytes += stat.size_diff
+
+    frames = list(reversed(stat.traceback)) if not _MOST_RECENT_FIRST else list(stat.traceback)
+
+    site = '{0}:{1}'.format(_relative_path(frames[0].filename), frames[0].lineno)
+    _add(sites, site, stat)
+
+    field_type = _get_field_type(frames)
+    if field_type:
+      _add(field_types, field_type, stat)
+
+  top_sites = sorted(sites.items(), key=lambda item: abs(item[1]['bytes']), reverse=True)[:top]
+
+  return {
+    'net_bytes':        net_bytes,
+    'top_sites':        [dict(entry, site=site) for site, entry in top_sites],
+    'by_field_type':    field_types,
+    'by_value_object':  by_value_object,
+  }
+
+
+def _add(groups, key, stat):
+  entry = groups.setdefault(key, {'bytes': 0, 'count': 0})
+  entry['bytes'] += stat.size_diff
+  entry['count'] += stat.count_diff
+
+
+def _start_tracing(frames):
+  global _tracing_users, _started_tracing
+
+  with _tracing_lock:
+    if _tracing_users == 0 and not tracemalloc.is_tracing():
+      tracemalloc.start(frames)
+      _started_tracing = True
+
+    _tracing_users += 1
+
+
+def _stop_tracing():
+  global _tracing_users, _started_tracing
+
+  with _tracing_lock:
+    _tracing_users -= 1
+
+    # Only stop tracing if we started it (e.g., not if it was started with `python -X tracemalloc`).
+    if _tracing_users == 0 and _started_tracing:
+      tracemalloc.stop()
+      _started_tracing = False
+
+
+def _take_snapshot():
+  return tracemalloc.take_snapshot().filter_traces((
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+  ))
+
+
+_field_type_lines = None
+""":type: dict[unicode, list[(int, int, unicode)]]"""
+
+
+def _get_field_type(frames):
+  """
+  Returns the name of the value object field class whose code made an allocation, if any.
+
+  :type frames: list[tracemalloc.Frame]
+  :param frames: Most recent first.
+
+  :rtype: unicode|None
+  """
+  global _field_type_lines
+
+  if _field_type_lines is None:
+    _field_type_lines = _index_field_types()
+
+  for frame in frames:
+    for start, end, name in _field_type_lines.get(frame.filename, ()):
+      if start <= frame.lineno < end:
+        return name
+
+  return None
+
+
+def _index_field_types():
+  """
+  Maps the source lines of every field class to the name of the class.
+
+  :rtype: dict[unicode, list[(int, int, unicode)]]
+  """
+  index     = {}
+  pending   = [fields.Field]
+
+  while pending:
+    cls = pending.pop()
+    pending.extend(cls.__subclasses__())
+
+    try:
+      filename        = inspect.getsourcefile(cls)
+      lines, start    = inspect.getsourcelines(cls)
+    except (IOError, OSError, TypeError):
+      continue
+
+    index.setdefault(filename, []).append((start, start + len(lines), cls.__name__))
+
+  return index
+
+
+def _relative_path(filename):
+  try:
+    relative = os.path.relpath(filename)
+  except ValueError:
+    # E.g., different drives on Windows.
+    return filename
+
+  return filename if relative.startswith(os.pardir) else relative
@@ -0,0 +1,467 @@
+# coding=utf-8
+"""
+ASGI support for Django 1.8 (which predates ASGI).
+
+Requests are read and responses are written on the event loop, so a slow client does not tie up a thread.  Views marked
+  as async (see `AsyncView`) run on the event loop and `await` anything that blocks (e.g., loading the session); all
+  other views, plus the response middleware (which is where the session gets saved), run in a thread pool.
+
+Requires Python 3.5+.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import asyncio
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+
+try:
+  import contextvars
+except ImportError:
+  # Python < 3.7.
+  contextvars = None
+
+from django import http
+from django.conf import settings
+from django.core import signals, urlresolvers
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http.multipartparser import MultiPartParserError
+from django.utils.encoding import force_text
+from django.views import debug
+from django.views.generic import View
+
+logger = logging.getLogger('django.request')
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+  """
+  Returns the thread pool used to run blocking code.
+
+  Its size (`settings.ASGI_THREADS`) caps the number of requests that can be using the database at the same time; it
+    does NOT cap the number of open connections.
+
+  :rtype: ThreadPoolExecutor
+  """
+  global _executor
+
+  if _executor is None:
+    with _executor_lock:
+      if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ASGI_THREADS', 10))
+
+  return _executor
+
+
+def shutdown_executor():
+  """
+  Waits for pending blocking calls to finish, then shuts down the thread pool.
+
+  A new thread pool is created the next time one is needed.
+  """
+  global _executor
+
+  with _executor_lock:
+    executor, _executor = _executor, None
+
+  if executor is not None:
+    executor.shutdown(wait=True)
+
+
+def _call_blocking(func, args, kwargs, urlconf):
+  if urlconf is not None:
+    urlresolvers.set_urlconf(urlconf)
+
+  try:
+    return func(*args, **kwargs)
+  finally:
+    # Same as at the end of a WSGI request:  honours `CONN_MAX_AGE`, and discards broken connections.
+    close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+  """
+  Runs a blocking callable in the thread pool, without blocking the event loop.
+  """
+  urlconf = urlresolvers.get_urlconf()
+  call    = partial(_call_blocking, func, args, kwargs, urlconf)
+
+  if contextvars is not None:
+    # The blocking code sees the same context variables as the coroutine that called it (e.g., the instrumentation stats
+    #   of the request that is being handled).
+    call = partial(contextvars.copy_context().run, call)
+
+  return await asyncio.get_event_loop().run_in_executor(get_executor(), call)
+
+
+async def load_session(session):
+  """
+  Loads a session (if it hasn't been loaded already), so that it can be accessed on the event loop without blocking.
+
+  :type session: django.contrib.sessions.backends.base.SessionBase
+  """
+  if getattr(session, '_session_cache', None) is None:
+    # `_get_session` only queries the database if there's a session key to load.
+    await run_blocking(session._get_session)
+
+
+class AsyncView(View):
+  """
+  Class-based view whose handlers are coroutines.
+
+  The ASGI handler awaits these on the event loop instead of running them in the thread pool, so they must never
+    block; use `run_blocking` (or `load_session`) for anything that does.
+  """
+  @classmethod
+  def as_view(cls, **initkwargs):
+    view = super(AsyncView, cls).as_view(**initkwargs)
+    view.is_async = True
+    return view
+
+
+class ASGIHandler(base.BaseHandler):
+  """
+  ASGI 3 application that serves a Django project.
+  """
+  request_class = WSGIRequest
+
+  def __init__(self, urlconf=None):
+    """
+    :type urlconf: unicode
+    :param urlconf: Overrides `settings.ROOT_URLCONF` (e.g., to route some paths to async views).
+    """
+    super(ASGIHandler, self).__init__()
+
+    self.urlconf = urlconf or settings.ROOT_URLCONF
+
+    self.load_middleware()
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.handle_lifespan(receive, send)
+
+    if scope['type'] != 'http':
+      raise ValueError('Unsupported ASGI scope type: {0}'.format(scope['type']))
+
+    body = await self.read_body(receive)
+    if body is None:
+      # The client disconnected before sending the entire request.
+      return
+
+    urlresolvers.set_script_prefix(scope.get('root_path', ''))
+    signals.request_started.send(sender=self.__class__, environ=None)
+
+    try:
+      request = self.request_class(self.build_environ(scope, body))
+    except UnicodeDecodeError:
+      logger.warning('Bad Request (UnicodeDecodeError)', exc_info=sys.exc_info(), extra={'status_code': 400})
+      response = http.HttpResponseBadRequest()
+    else:
+      response = await self.get_response_async(request)
+
+    response._handler_class = self.__class__
+
+    try:
+      await self.send_response(response, send)
+    finally:
+      # Fires `request_finished`.
+      await run_blocking(response.close)
+
+  @staticmethod
+  async def handle_lifespan(receive, send):
+    while True:
+      message = await receive()
+
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+
+      elif message['type'] == 'lifespan.shutdown':
+        await asyncio.get_event_loop().run_in_executor(None, shutdown_executor)
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  @staticmethod
+  async def read_body(receive):
+    """
+    Reads the request body, spooling large bodies to disk.
+
+    :rtype: SpooledTemporaryFile|None
+    :return: None if the client disconnected.
+    """
+    body = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+
+    while True:
+      message = await receive()
+
+      if message['type'] == 'http.disconnect':
+        body.close()
+        return None
+
+      body.write(message.get('body', b''))
+
+      if not message.get('more_body', False):
+        break
+
+    body.seek(0)
+    return body
+
+  @staticmethod
+  def build_environ(scope, body):
+    """
+    Converts an ASGI scope into the WSGI environ that Django's request class expects.
+
+    :type scope: dict
+    :type body: SpooledTemporaryFile
+
+    :rtype: dict
+    """
+    server      = scope.get('server') or ('localhost', 80)
+    client      = scope.get('client') or ('', 0)
+    script_name = scope.get('root_path', '')
+    path        = scope['path']
+
+    if script_name and path.startswith(script_name):
+      path = path[len(script_name):]
+
+    body.seek(0, 2)
+    content_length = body.tell()
+    body.seek(0)
+
+    environ = {
+      'REQUEST_METHOD':     str(scope['method']),
+      'SCRIPT_NAME':        str(script_name),
+      # WSGI paths are "bytes as latin-1" strings.
+      'PATH_INFO':          path.encode('utf-8').decode('latin-1'),
+      'QUERY_STRING':       scope.get('query_string', b'').decode('latin-1'),
+      'SERVER_NAME':        str(server[0]),
+      'SERVER_PORT':        str(server[1]),
+      'SERVER_PROTOCOL':    'HTTP/{0}'.format(scope.get('http_version', '1.1')),
+      'REMOTE_ADDR':        str(client[0]),
+      'REMOTE_PORT':        str(client[1]),
+      'CONTENT_LENGTH':     str(content_length),
+      'wsgi.input':         body,
+      'wsgi.errors':        sys.stderr,
+      'wsgi.version':       (1, 0),
+      'wsgi.url_scheme':    str(scope.get('scheme', 'http')),
+      'wsgi.multithread':   True,
+      'wsgi.multiprocess':  True,
+      'wsgi.run_once':      False,
+    }
+
+    for name, value in scope.get('headers', []):
+      name  = name.decode('latin-1').upper().replace('-', '_')
+      value = value.decode('latin-1')
+
+      if name == 'CONTENT_LENGTH':
+        # We already know the actual length.
+        continue
+
+      if name != 'CONTENT_TYPE':
+        name = 'HTTP_' + name
+
+      # Repeated headers are combined, same as in WSGI servers.
+      environ[name] = '{0},{1}'.format(environ[name], value) if name in environ else value
+
+    return environ
+
+  async def get_response_async(self, request):
+    """
+    Async version of `BaseHandler.get_response`.
+
+    :type request: WSGIRequest
+
+    :rtype: django.http.HttpResponseBase
+    """
+    urlconf = self.urlconf
+    urlresolvers.set_urlconf(urlconf)
+    resolver = urlresolvers.RegexURLResolver(r'^/', urlconf)
+
+    try:
+      response = None
+
+      # Request and view middleware only do in-memory work (e.g., the session is not loaded until it is accessed), so
+      #   they run on the event loop.
+      for middleware_method in self._request_middleware:
+        response = middleware_method(request)
+        if response:
+          break
+
+      if response is None:
+        if hasattr(request, 'urlconf'):
+          urlconf = request.urlconf
+          urlresolvers.set_urlconf(urlconf)
+          resolver = urlresolvers.RegexURLResolver(r'^/', urlconf)
+
+        resolver_match = resolver.resolve(request.path_info)
+        callback, callback_args, callback_kwargs = resolver_match
+        request.resolver_match = resolver_match
+
+        for middleware_method in self._view_middleware:
+          response = middleware_method(request, callback, callback_args, callback_kwargs)
+          if response:
+            break
+
+      if response is None:
+        try:
+          if getattr(callback, 'is_async', False):
+            response = callback(request, *callback_args, **callback_kwargs)
+
+            # E.g., `http_method_not_allowed` is not a coroutine.
+            if asyncio.iscoroutine(response):
+              response = await response
+
+          else:
+            response = await run_blocking(
+              self.make_view_atomic(callback),
+              request, *callback_args, **callback_kwargs
+            )
+
+        except Exception as e:
+          for middleware_method in self._exception_middleware:
+            response = middleware_method(request, e)
+            if response:
+              break
+
+          if response is None:
+            raise
+
+      if response is None:
+        raise ValueError(
+          "The view {module}.{name} didn't return an HttpResponse object. It returned None instead.".format(
+            module  = callback.__module__,
+            name    = getattr(callback, '__name__', type(callback).__name__),
+          ),
+        )
+
+      if hasattr(response, 'render') and callable(response.render):
+        for middleware_method in self._template_response_middleware:
+          response = middleware_method(request, response)
+          if response is None:
+            raise ValueError(
+              "{0}.process_template_response didn't return an HttpResponse object. It returned None instead.".format(
+                middleware_method.__self__.__class__.__name__,
+              ),
+            )
+
+        response = await run_blocking(response.render)
+
+    except http.Http404 as e:
+      logger.warning('Not Found: %s', request.path, extra={'status_code': 404, 'request': request})
+
+      if settings.DEBUG:
+        response = debug.technical_404_response(request, e)
+      else:
+        response = await run_blocking(self.get_exception_response, request, resolver, 404)
+
+    except PermissionDenied:
+      logger.warning('Forbidden (Permission denied): %s', request.path, extra={'status_code': 403, 'request': request})
+      response = await run_blocking(self.get_exception_response, request, resolver, 403)
+
+    except MultiPartParserError:
+      logger.warning(
+        'Bad request (Unable to parse request body): %s', request.path,
+        extra = {'status_code': 400, 'request': request},
+      )
+      response = await run_blocking(self.get_exception_response, request, resolver, 400)
+
+    except SuspiciousOperation as e:
+      security_logger = logging.getLogger('django.security.{0}'.format(e.__class__.__name__))
+      security_logger.error(force_text(e), extra={'status_code': 400, 'request': request})
+
+      if settings.DEBUG:
+        return debug.technical_500_response(request, *sys.exc_info(), status_code=400)
+
+      response = await run_blocking(self.get_exception_response, request, resolver, 400)
+
+    except Exception:
+      signals.got_request_exception.send(sender=self.__class__, request=request)
+      response = self.handle_uncaught_exception(request, resolver, sys.exc_info())
+
+    # Response middleware may block (e.g., saving the session), so it runs in the thread pool.
+    response = await run_blocking(self.apply_response_middleware, request, response, resolver)
+    response._closable_objects.append(request)
+
+    return response
+
+  def apply_response_middleware(self, request, response, resolver):
+    """
+    :type request: WSGIRequest
+    :type response: django.http.HttpResponseBase
+    :type resolver: urlresolvers.RegexURLResolver
+
+    :rtype: django.http.HttpResponseBase
+    """
+    try:
+      for middleware_method in self._response_middleware:
+        response = middleware_method(request, response)
+        if response is None:
+          raise ValueError(
+            "{0}.process_response didn't return an HttpResponse object. It returned None instead.".format(
+              middleware_method.__self__.__class__.__name__,
+            ),
+          )
+
+      return self.apply_response_fixes(request, response)
+    except Exception:
+      signals.got_request_exception.send(sender=self.__class__, request=request)
+      return self.handle_uncaught_exception(request, resolver, sys.exc_info())
+
+  @staticmethod
+  async def send_response(response, send):
+    """
+    :type response: django.http.HttpResponseBase
+    :type send: callable
+    """
+    headers = [
+      (str(name).encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in response.items()
+    ]
+
+    for cookie in response.cookies.values():
+      headers.append((b'Set-Cookie', cookie.output(header='').strip().encode('latin-1')))
+
+    await send({
+      'type':     'http.response.start',
+      'status':   response.status_code,
+      'headers':  headers,
+    })
+
+    if not response.streaming:
+      await send({'type': 'http.response.body', 'body': response.content})
+      return
+
+    # Streaming responses may do blocking work (e.g., database writes) while generating each chunk.
+    chunks = iter(response)
+    done   = object()
+
+    while True:
+      chunk = await run_blocking(next, chunks, done)
+      if chunk is done:
+        break
+
+      await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def get_asgi_application(urlconf=None):
+  """
+  Returns an ASGI application for the current Django project.
+
+  :type urlconf: unicode
+  :param urlconf: Overrides `settings.ROOT_URLCONF`.
+
+  :rtype: ASGIHandler
+  """
+  import django
+  django.setup()
+
+  return ASGIHandler(urlconf)
@@ -0,0 +1,39 @@
+# coding=utf-8
+"""
+Async versions of views, for use with the ASGI handler.
+
+Requires Python 3.5+.
+
+:see: api.asgi
+"""
+from __future__ import absolute_import, unicode_literals
+
+from api.asgi import AsyncView, load_session
+from api.forms import ApplicantForm
+from api.views import render_applicant
+
+
+class Applicant(AsyncView):
+  """
+  Same as `api.views.Applicant`, but the session is loaded without blocking the event loop.
+
+  Saving the session happens in the response middleware, which the ASGI handler runs in its thread pool.
+  """
+  @staticmethod
+  async def get(request):
+    await load_session(request.session)
+
+    return render_applicant(request, ApplicantForm, cache_form=True)
+
+  @staticmethod
+  async def post(request):
+    # The request body has already been read by the ASGI handler, so validating the form does not block.
+    form = ApplicantForm(request.POST)
+
+    await load_session(request.session)
+
+    if form.is_valid():
+      request.session.update_applicant_vo(form.cleaned_data)
+
+    # Bound forms contain user input, so they must never be cached.
+    return render_applicant(request, form, cache_form=False)
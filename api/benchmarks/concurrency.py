@@ -0,0 +1,329 @@
+# coding=utf-8
+"""
+Compares how many concurrent (slow) clients the WSGI and ASGI applications can serve with the same number of threads,
+when the database is slow too.
+
+Requires Python 3.5+.
+
+:see: api.asgi
+"""
+from __future__ import absolute_import, division, unicode_literals
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import sleep, time
+
+from django.conf import settings
+from django.db.backends import utils
+from django.test.utils import override_settings
+from django.utils.crypto import get_random_string
+from django.utils.http import urlencode
+from six import iteritems
+from six.moves import http_cookies
+
+from api import asgi
+from api.benchmarks.replay import ReplayReport, RequestReplayer
+
+
+def make_flow(requests):
+    """
+    Returns a typical flow:  the applicant form is submitted once, then viewed repeatedly.
+
+    :type requests: int
+    :param requests: Total number of requests in the flow.
+
+    :rtype: list[dict]
+    """
+    return [
+        {
+            'method':   'POST',
+            'path':     '/applicant',
+
+            'data': {
+                'first_name':   'Marcus',
+                'last_name':    'Brody',
+                'gender':       'm',
+                'birthday':     '1900-08-13',
+                'email':        'marcus.brody@marshall.edu',
+            },
+        },
+    ] + [{'method': 'GET', 'path': '/applicant'}] * max(requests - 1, 0)
+
+
+@contextmanager
+def slow_database(latency):
+    """
+    Adds latency to every database query, to simulate a database that is far away or under load.
+
+    :type latency: float
+    :param latency: Seconds.
+    """
+    if not latency:
+        yield
+        return
+
+    execute         = utils.CursorWrapper.execute
+    executemany     = utils.CursorWrapper.executemany
+
+    def slow_execute(self, *args, **kwargs):
+        sleep(latency)
+        return execute(self, *args, **kwargs)
+
+    def slow_executemany(self, *args, **kwargs):
+        sleep(latency)
+        return executemany(self, *args, **kwargs)
+
+    utils.CursorWrapper.execute     = slow_execute
+    utils.CursorWrapper.executemany = slow_executemany
+
+    try:
+        yield
+    finally:
+        utils.CursorWrapper.execute     = execute
+        utils.CursorWrapper.executemany = executemany
+
+
+async def asgi_request(application, method, path, data=None, cookies=None, csrf_token='', client_latency=0.0):
+    """
+    Sends a request to an ASGI application.
+
+    :type application: callable
+    :type method: unicode
+    :type path: unicode
+    :type data: dict
+    :type cookies: dict[unicode, unicode]
+    :type csrf_token: unicode
+
+    :type client_latency: float
+    :param client_latency: Seconds the client takes to send its request, and again to receive the response.
+
+    :rtype: (int, list[(bytes, bytes)], bytes)
+    """
+    path, _, query_string = path.partition('?')
+
+    body = b''
+    if method in ('GET', 'HEAD', 'DELETE'):
+        if data:
+            query_string = '&'.join(filter(None, [query_string, urlencode(data, doseq=True)]))
+    else:
+        body = urlencode(data or {}, doseq=True).encode('utf-8')
+
+    scope = {
+        'type':         'http',
+        'asgi':         {'version': '3.0'},
+        'http_version': '1.1',
+        'method':       method,
+        'scheme':       'http',
+        'path':         path,
+        'query_string': query_string.encode('latin-1'),
+        'root_path':    '',
+        'server':       ('localhost', 80),
+        'client':       ('127.0.0.1', 0),
+
+        'headers': [
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            (b'cookie', '; '.join('{0}={1}'.format(k, v) for k, v in iteritems(cookies or {})).encode('latin-1')),
+            (b'x-csrftoken', csrf_token.encode('latin-1')),
+        ],
+    }
+
+    sent = []
+
+    async def receive():
+        if sent:
+            # The application should not be reading anything else.
+            return {'type': 'http.disconnect'}
+
+        sent.append(True)
+        await asyncio.sleep(client_latency)
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    response = {'status': None, 'headers': [], 'body': []}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status']  = message['status']
+            response['headers'] = message['headers']
+
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+
+            if not message.get('more_body', False):
+                await asyncio.sleep(client_latency)
+
+    await application(scope, receive, send)
+
+    return response['status'], response['headers'], b''.join(response['body'])
+
+
+class ConcurrencyBenchmark(object):
+    """
+    Replays the same flows against the WSGI and ASGI applications, with the same number of threads.
+
+    The WSGI application is served the way a threaded WSGI server would:  each request occupies a thread while the
+        client sends the request and receives the response.  The ASGI application only uses threads for blocking work
+        (database queries, etc.).
+    """
+    def __init__(self, clients=50, requests=5, threads=10, client_latency=0.05, db_latency=0.005):
+        """
+        :type clients: int
+        :param clients: Number of concurrent clients.
+
+        :type requests: int
+        :param requests: Number of requests per client.
+
+        :type threads: int
+        :param threads: Number of threads available to each application.
+
+        :type client_latency: float
+        :param client_latency: Seconds each client takes to send a request, and again to receive the response.
+
+        :type db_latency: float
+        :param db_latency: Seconds added to each database query.
+        """
+        super(ConcurrencyBenchmark, self).__init__()
+
+        self.clients        = clients
+        self.requests       = requests
+        self.threads        = threads
+        self.client_latency = client_latency
+        self.db_latency     = db_latency
+
+    def run_wsgi(self, application):
+        """
+        :type application: callable
+
+        :rtype: ReplayReport
+        """
+        report  = ReplayReport()
+        lock    = threading.Lock()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as server:
+            def handle(environ):
+                # The client is sending its request; the thread has to wait.
+                sleep(self.client_latency)
+
+                result = {}
+
+                def start_response(status_line, response_headers, exc_info=None):
+                    result['status']    = int(status_line.split(' ', 1)[0])
+                    result['headers']   = response_headers
+
+                response = application(environ, start_response)
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    if hasattr(response, 'close'):
+                        response.close()
+
+                # ... and receiving the response.
+                sleep(self.client_latency)
+
+                return result['status'], result['headers']
+
+            def client():
+                csrf_token  = get_random_string(32)
+                cookies     = {settings.CSRF_COOKIE_NAME: csrf_token}
+
+                for entry in make_flow(self.requests):
+                    environ = RequestReplayer.build_environ(
+                        entry['method'],
+                        entry['path'],
+                        entry.get('data') or {},
+                        cookies,
+                        csrf_token,
+                    )
+
+                    started         = time()
+                    status, headers = server.submit(handle, environ).result()
+                    latency         = time() - started
+
+                    _update_cookies(cookies, headers)
+
+                    with lock:
+                        report.add('{0} {1}'.format(entry['method'], entry['path']), latency, None, status)
+
+            # Clients are simulated with threads of their own, which are not counted against the server's threads.
+            clients = [threading.Thread(target=client) for _ in range(self.clients)]
+
+            with slow_database(self.db_latency):
+                started = time()
+
+                for thread in clients:
+                    thread.start()
+
+                for thread in clients:
+                    thread.join()
+
+                report.elapsed = time() - started
+
+        return report
+
+    def run_asgi(self, application):
+        """
+        :type application: callable
+
+        :rtype: ReplayReport
+        """
+        report = ReplayReport()
+
+        async def client():
+            csrf_token  = get_random_string(32)
+            cookies     = {settings.CSRF_COOKIE_NAME: csrf_token}
+
+            for entry in make_flow(self.requests):
+                started = time()
+
+                status, headers, _ = await asgi_request(
+                    application     = application,
+                    method          = entry['method'],
+                    path            = entry['path'],
+                    data            = entry.get('data'),
+                    cookies         = cookies,
+                    csrf_token      = csrf_token,
+                    client_latency  = self.client_latency,
+                )
+
+                latency = time() - started
+
+                _update_cookies(cookies, [(k.decode('latin-1'), v.decode('latin-1')) for k, v in headers])
+                report.add('{0} {1}'.format(entry['method'], entry['path']), latency, None, status)
+
+        async def run():
+            await asyncio.gather(*[client() for _ in range(self.clients)])
+
+        loop = asyncio.new_event_loop()
+
+        try:
+            with override_settings(ASGI_THREADS=self.threads), slow_database(self.db_latency):
+                # Make sure the thread pool has the right size.
+                asgi.shutdown_executor()
+
+                started = time()
+                loop.run_until_complete(run())
+                report.elapsed = time() - started
+        finally:
+            asgi.shutdown_executor()
+            loop.close()
+
+        return report
+
+
+def _update_cookies(cookies, headers):
+    """
+    Applies Set-Cookie headers from a response.
+
+    :type cookies: dict[unicode, unicode]
+    :type headers: list[(unicode, unicode)]
+    """
+    for name, value in headers:
+        if name.lower() == 'set-cookie':
+            for morsel in http_cookies.SimpleCookie(str(value)).values():
+                if morsel.value:
+                    cookies[morsel.key] = morsel.value
+                else:
+                    cookies.pop(morsel.key, None)
@@ -0,0 +1,484 @@
+# coding=utf-8
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from io import BytesIO
+from multiprocessing import Pool
+from sys import stderr
+from time import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.utils.crypto import get_random_string
+from django.utils.http import urlencode
+from six import iteritems
+from six.moves import http_cookies
+from six.moves.queue import Empty, Queue
+
+
+def load_flows(lines):
+    """
+    Groups captured requests into flows that should be replayed sequentially.
+
+    Each line is a JSON object describing a single request::
+
+        {"session": "abc123", "method": "POST", "path": "/applicant", "data": {"first_name": "Marcus", ...}}
+
+    Requests that share the same `session` value belong to the same flow (requests without one are each their own flow);
+        cookies are carried between the requests in a flow, in the order they appear in the file.
+
+    :type lines: collections.Iterable[unicode]
+
+    :rtype: list[list[dict]]
+    """
+    flows = OrderedDict()
+
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+
+        entry = json.loads(line)
+        flows.setdefault(entry.get('session') or '#{0}'.format(i), []).append(entry)
+
+    return list(flows.values())
+
+
+class ReplayReport(object):
+    """
+    Latency, throughput and query count statistics from a replay.
+    """
+    def __init__(self):
+        super(ReplayReport, self).__init__()
+
+        self.elapsed    = 0.0
+        self.latencies  = defaultdict(list)
+        """:type: dict[unicode, list[float]]"""
+        self.queries    = defaultdict(list)
+        """:type: dict[unicode, list[int]]"""
+        self.statuses   = defaultdict(lambda: defaultdict(int))
+        """:type: dict[unicode, dict[int, int]]"""
+
+    def add(self, endpoint, latency, queries, status):
+        """
+        Records the result of a single request.
+
+        :type endpoint: unicode
+        :param endpoint: E.g., "GET /applicant".
+
+        :type latency: float
+        :param latency: Seconds.
+
+        :type queries: int|None
+        :type status: int
+        """
+        self.latencies[endpoint].append(latency)
+        if queries is not None:
+            self.queries[endpoint].append(queries)
+        self.statuses[endpoint][status] += 1
+
+    def merge(self, other):
+        """
+        Merges results from another report (e.g., from another worker process).
+
+        :type other: ReplayReport|dict
+        """
+        if isinstance(other, dict):
+            other = self.from_raw(other)
+
+        for endpoint, values in iteritems(other.latencies):
+            self.latencies[endpoint].extend(values)
+
+        for endpoint, values in iteritems(other.queries):
+            self.queries[endpoint].extend(values)
+
+        for endpoint, statuses in iteritems(other.statuses):
+            for status, count in iteritems(statuses):
+                self.statuses[endpoint][status] += count
+
+    def to_raw(self):
+        """
+        Converts the report into a picklable/JSON-serializable dict.
+
+        :rtype: dict
+        """
+        return {
+            'latencies':    dict(self.latencies),
+            'queries':      dict(self.queries),
+            'statuses':     {k: dict(v) for k, v in iteritems(self.statuses)},
+        }
+
+    @classmethod
+    def from_raw(cls, raw):
+        """
+        :type raw: dict
+
+        :rtype: ReplayReport
+        """
+        report = cls()
+
+        for endpoint, values in iteritems(raw['latencies']):
+            report.latencies[endpoint].extend(values)
+
+        for endpoint, values in iteritems(raw['queries']):
+            report.queries[endpoint].extend(values)
+
+        for endpoint, statuses in iteritems(raw['statuses']):
+            for status, count in iteritems(statuses):
+                report.statuses[endpoint][int(status)] += count
+
+        return report
+
+    def get_summary(self):
+        """
+        Returns throughput, latency percentiles (in milliseconds) and mean query counts, per endpoint.
+
+        :rtype: dict
+        """
+        total = sum(len(v) for v in self.latencies.values())
+
+        return {
+            'requests':     total,
+            'elapsed':      self.elapsed,
+            'throughput':   (total / self.elapsed) if self.elapsed else None,
+
+            'endpoints': {
+                endpoint: {
+                    'requests': len(latencies),
+                    'statuses': dict(self.statuses[endpoint]),
+                    'p50':      percentile(latencies, 50) * 1000,
+                    'p95':      percentile(latencies, 95) * 1000,
+                    'p99':      percentile(latencies, 99) * 1000,
+                    'max':      max(latencies) * 1000,
+                    'queries':  (
+                        (sum(self.queries[endpoint]) / len(self.queries[endpoint]))
+                            if self.queries[endpoint]
+                            else None
+                    ),
+                    'histogram': histogram(latencies),
+                }
+                    for endpoint, latencies in iteritems(self.latencies)
+            },
+        }
+
+    def format_text(self):
+        """
+        Formats the summary as a human-readable report.
+
+        :rtype: unicode
+        """
+        summary = self.get_summary()
+
+        lines = [
+            '{requests} requests in {elapsed:.2f}s ({throughput:.1f} req/s)'.format(
+                requests    = summary['requests'],
+                elapsed     = summary['elapsed'],
+                throughput  = summary['throughput'] or 0,
+            ),
+        ]
+
+        for endpoint, stats in sorted(iteritems(summary['endpoints'])):
+            lines.append('')
+            lines.append(
+                '{endpoint}: {requests} requests, statuses {statuses}, queries/request {queries}'.format(
+                    endpoint    = endpoint,
+                    requests    = stats['requests'],
+                    statuses    = ', '.join('{0}x{1}'.format(k, v) for k, v in sorted(stats['statuses'].items())),
+                    queries     = '-' if stats['queries'] is None else '{0:.1f}'.format(stats['queries']),
+                ),
+            )
+            lines.append('  p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms  max {max:.2f}ms'.format(**stats))
+
+            peak = max(count for _, count in stats['histogram']) or 1
+            for upper_bound, count in stats['histogram']:
+                lines.append('  <= {0:>8.2f}ms | {1:<40} {2}'.format(upper_bound, '#' * (40 * count // peak), count))
+
+        return '\n'.join(lines)
+
+
+def percentile(values, pct):
+    """
+    Returns the nearest-rank percentile of a list of values.
+
+    :type values: list[float]
+    :type pct: float
+
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank    = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def histogram(latencies):
+    """
+    Buckets latencies (in seconds) into a log-scale histogram.
+
+    :type latencies: list[float]
+
+    :rtype: list[(float, int)]
+    :return: (upper bound in milliseconds, count) for each non-empty bucket.
+    """
+    buckets = defaultdict(int)
+
+    for latency in latencies:
+        # Buckets double in size, starting at 0.125ms.
+        upper_bound = 0.125
+        while upper_bound < latency * 1000:
+            upper_bound *= 2
+        buckets[upper_bound] += 1
+
+    return sorted(buckets.items())
+
+
+class RequestReplayer(object):
+    """
+    Replays captured request flows directly against a WSGI application (no network involved).
+    """
+    def __init__(self, application, concurrency=1, use_processes=False, count_queries=True):
+        """
+        :type application: callable
+        :param application: The WSGI application, e.g. `exercise_misbehaving_app.wsgi.application`.
+
+        :type concurrency: int
+        :param concurrency: Number of threads (or processes) replaying flows at the same time.
+
+        :type use_processes: bool
+        :param use_processes: Whether to use processes instead of threads.
+
+        :type count_queries: bool
+        :param count_queries: Whether to count the DB queries that each request performs.
+            Note that this adds a bit of overhead to each query.
+        """
+        super(RequestReplayer, self).__init__()
+
+        self.application    = application
+        self.concurrency    = max(concurrency, 1)
+        self.use_processes  = use_processes
+        self.count_queries  = count_queries
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        # Django's WSGI handler can't be pickled (e.g., to send it to a worker process that was spawned rather than
+        #   forked); the worker loads its own instead.
+        if isinstance(self.application, WSGIHandler):
+            state['application'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if self.application is None:
+            self.application = get_wsgi_application()
+
+    def run(self, flows):
+        """
+        Replays the flows and returns the resulting report.
+
+        :type flows: list[list[dict]]
+
+        :rtype: ReplayReport
+        """
+        report  = ReplayReport()
+        start   = time()
+
+        if self.use_processes:
+            # Don't let child processes inherit (and share) the parent's DB connections.
+            for conn in connections.all():
+                conn.close()
+
+            # The replayer is passed to each worker explicitly (rather than relying on the worker inheriting it), so
+            #   that this also works if workers are spawned instead of forked.
+            chunks  = [flows[i::self.concurrency] for i in range(self.concurrency)]
+            pool    = Pool(processes=self.concurrency, initializer=_init_process, initargs=(self,))
+            try:
+                for raw in pool.map(_run_in_process, chunks):
+                    report.merge(raw)
+            finally:
+                pool.close()
+                pool.join()
+
+        else:
+            queue = Queue()
+            for flow in flows:
+                queue.put(flow)
+
+            lock    = threading.Lock()
+            threads = [
+                threading.Thread(target=self._run_thread, args=(queue, report, lock))
+                    for _ in range(self.concurrency)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        report.elapsed = time() - start
+        return report
+
+    def replay_flow(self, flow, report):
+        """
+        Replays a single flow, carrying cookies between requests.
+
+        :type flow: list[dict]
+        :type report: ReplayReport
+        """
+        # Pre-seed the CSRF cookie so that the flow can POST without having to scrape a token from a form first.
+        csrf_token  = get_random_string(32)
+        cookies     = {settings.CSRF_COOKIE_NAME: csrf_token}
+
+        for entry in flow:
+            method  = entry.get('method', 'GET').upper()
+            path    = entry.get('path', '/')
+
+            environ = self.build_environ(method, path, entry.get('data') or {}, cookies, csrf_token)
+            status  = [None]
+            headers = []
+
+            def start_response(status_line, response_headers, exc_info=None):
+                status[0] = int(status_line.split(' ', 1)[0])
+                headers[:] = response_headers
+
+            # Force query logging for the duration of the request only; otherwise every query made afterwards (by
+            #   anything else in this process) would be logged too.
+            debug_cursors = {conn: conn.force_debug_cursor for conn in connections.all()} if self.count_queries else {}
+
+            for conn in debug_cursors:
+                conn.force_debug_cursor = True
+
+            try:
+                started     = time()
+                response    = self.application(environ, start_response)
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    if hasattr(response, 'close'):
+                        response.close()
+                latency     = time() - started
+
+                # Django clears the query log at the start of each request, so whatever is in there now belongs to this
+                #   request (up to the log's max length, anyway).
+                queries = sum(len(conn.queries_log) for conn in debug_cursors) if self.count_queries else None
+            finally:
+                for conn, previous in iteritems(debug_cursors):
+                    conn.force_debug_cursor = previous
+
+            report.add('{0} {1}'.format(method, environ['PATH_INFO']), latency, queries, status[0])
+
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    for morsel in http_cookies.SimpleCookie(str(value)).values():
+                        if morsel.value:
+                            cookies[morsel.key] = morsel.value
+                        else:
+                            cookies.pop(morsel.key, None)
+
+    @staticmethod
+    def build_environ(method, path, data, cookies, csrf_token):
+        """
+        Builds the WSGI environ for a replayed request.
+
+        :type method: unicode
+        :type path: unicode
+        :type data: dict
+        :type cookies: dict[unicode, unicode]
+        :type csrf_token: unicode
+
+        :rtype: dict
+        """
+        path, _, query_string = path.partition('?')
+
+        body = b''
+        if method in ('GET', 'HEAD', 'DELETE'):
+            if data:
+                query_string = '&'.join(filter(None, [query_string, urlencode(data, doseq=True)]))
+        else:
+            body = urlencode(data, doseq=True).encode('utf-8')
+
+        return {
+            'REQUEST_METHOD':       str(method),
+            'PATH_INFO':            str(path),
+            'QUERY_STRING':         str(query_string),
+            'SCRIPT_NAME':          str(''),
+            'SERVER_NAME':          str('localhost'),
+            'SERVER_PORT':          str('80'),
+            'SERVER_PROTOCOL':      str('HTTP/1.1'),
+            'REMOTE_ADDR':          str('127.0.0.1'),
+            'CONTENT_TYPE':         str('application/x-www-form-urlencoded'),
+            'CONTENT_LENGTH':       str(len(body)),
+            'HTTP_COOKIE':          str('; '.join('{0}={1}'.format(k, v) for k, v in iteritems(cookies))),
+            'HTTP_X_CSRFTOKEN':     str(csrf_token),
+            'wsgi.input':           BytesIO(body),
+            'wsgi.errors':          stderr,
+            'wsgi.version':         (1, 0),
+            'wsgi.url_scheme':      str('http'),
+            'wsgi.multithread':     True,
+            'wsgi.multiprocess':    True,
+            'wsgi.run_once':        False,
+        }
+
+    def _run_thread(self, queue, report, lock):
+        """
+        Replays flows from the queue until it is empty.
+
+        :type queue: Queue
+        :type report: ReplayReport
+        :type lock: threading.Lock
+        """
+        local_report = ReplayReport()
+
+        try:
+            while True:
+                try:
+                    flow = queue.get_nowait()
+                except Empty:
+                    break
+
+                self.replay_flow(flow, local_report)
+        finally:
+            for conn in connections.all():
+                conn.close()
+
+        with lock:
+            report.merge(local_report)
+
+
+_process_replayer = None
+""":type: RequestReplayer"""
+
+def _init_process(replayer):
+    """
+    Initializes a worker process.
+
+    :type replayer: RequestReplayer
+    """
+    global _process_replayer
+    _process_replayer = replayer
+
+
+def _run_in_process(flows):
+    """
+    Replays flows in a worker process.
+
+    :type flows: list[list[dict]]
+
+    :rtype: dict
+    """
+    report = ReplayReport()
+
+    for flow in flows:
+        _process_replayer.replay_flow(flow, report)
+
+    return report.to_raw()
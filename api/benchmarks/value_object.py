@@ -0,0 +1,476 @@
+# coding=utf-8
+from __future__ import absolute_import, division, unicode_literals
+
+import gc
+import json
+import platform
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from timeit import default_timer
+
+from pytz import utc
+from six import iteritems
+
+from api.test_value_object import ComplexTestValueObject, PartialVisibilityComplexTestValueObject, \
+    SimpleTestValueObject, TestAddressObject, TestApplicantObject, TestLoanObject, TypedTestValueObject
+from api.value_object import fields
+from api.value_object.base import BaseValueObject
+from api.value_objects import ApplicantObject
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 does not have tracemalloc; allocations will not be measured.
+    tracemalloc = None
+
+
+OPERATIONS = ('construct', 'hydrate', 'hydrate_json', 'loads_hydrate', 'dehydrate', 'update', 'get_public_values')
+"""Operations measured for each case, in the order they are reported."""
+
+
+class LargeCollectionObject(BaseValueObject):
+    """
+    Synthetic value object with large collections of primitives and dates.
+    """
+    simple  = fields.Collection()
+    dates   = fields.Collection(fields.Date)
+
+
+class LazyApplicantObject(BaseValueObject):
+    """
+    Same as `TestApplicantObject`, but using a lazy collection.
+    """
+    name        = fields.Primitive()
+    loan        = fields.ValueObject(TestLoanObject)
+    addresses   = fields.LazyCollection(TestAddressObject)
+
+
+class BenchmarkCase(object):
+    """
+    A value object type plus the (raw) values used to initialize it.
+    """
+    def __init__(self, name, vo_type, values, incoming=None, document=None, path=()):
+        """
+        :type name: unicode
+
+        :type vo_type: api.value_object.base.ValueObjectMeta
+
+        :type values: dict
+        :param values: Values used to construct the value object.
+
+        :type incoming: dict
+        :param incoming: Values used to construct the value object that is merged in when benchmarking `update`.
+            Defaults to `values`.
+
+        :type document: dict
+        :param document: Other values in the JSON document that the JSON operations decode (e.g., the rest of the
+            session data).
+
+        :type path: tuple[unicode]
+        :param path: Keys of the object in `document` that contains the dehydrated values (e.g., `('applicant',)`).
+        """
+        super(BenchmarkCase, self).__init__()
+
+        self.name       = name
+        self.vo_type    = vo_type
+        self.values     = values
+        self.incoming   = values if incoming is None else incoming
+        self.document   = document or {}
+        self.path       = tuple(path)
+
+    def get_operations(self):
+        """
+        Returns a callable for each operation, with all of its inputs prepared ahead of time.
+
+        :rtype: OrderedDict[unicode, () -> object]
+        """
+        vo_type     = self.vo_type
+        values      = self.values
+        obj         = vo_type(values)
+        dehydrated  = obj.dehydrate()
+        raw         = json.dumps(self._make_document(dehydrated))
+        path        = self.path
+        incoming    = vo_type(self.incoming)
+
+        def loads_hydrate():
+            data = json.loads(raw) or {}
+            for key in path:
+                data = data.get(key) or {}
+            return vo_type.hydrate(data)
+
+        return OrderedDict((
+            ('construct',           lambda: vo_type(values)),
+            ('hydrate',             lambda: vo_type.hydrate(dehydrated)),
+            # Both include decoding the JSON document; the single-pass decoder only pays off for large documents.
+            ('hydrate_json',        lambda: vo_type.hydrate_json(raw, path)),
+            ('loads_hydrate',       loads_hydrate),
+            ('dehydrate',           obj.dehydrate),
+            ('update',              lambda: obj.update(incoming)),
+            ('get_public_values',   obj.get_public_values),
+        ))
+
+
+    def _make_document(self, dehydrated):
+        """
+        Returns the JSON document that contains the dehydrated values.
+
+        :type dehydrated: dict
+
+        :rtype: dict
+        """
+        if not self.path:
+            return dehydrated
+
+        document    = json.loads(json.dumps(self.document))
+        container   = document
+
+        for key in self.path[:-1]:
+            container = container.setdefault(key, {})
+
+        container[self.path[-1]] = dehydrated
+        return document
+
+
+def get_cases(scale=1):
+    """
+    Returns the benchmark cases.
+
+    The small cases use the same value object shapes as `api.test_value_object`; the large cases are synthetic.
+
+    :type scale: int
+    :param scale: Multiplier for the size of the large cases.
+
+    :rtype: list[BenchmarkCase]
+    """
+    size = 1000 * scale
+
+    return [
+        BenchmarkCase('simple', SimpleTestValueObject, {
+            'name':             'Lancelot',
+            'age':              34,
+            'favoriteColor':    'blue',
+        }),
+
+        BenchmarkCase('typed', TypedTestValueObject, {
+            'bytes':    b'I\xc3\xb1t\xc3\xabrn\xc3\xa2ti\xc3\xb4n\xc3\xa0liz\xc3\xa6ti\xc3\xb8n',
+            'date':     date(2015, 9, 22),
+            'datetime': datetime(2015, 9, 22, 17, 58, 36, tzinfo=utc),
+            'decimal':  Decimal('2.6E-2'),
+        }),
+
+        BenchmarkCase('complex', ComplexTestValueObject, {
+            'simpleCollection': {'a': 'Apple', 'j': 'Jacks', 'c': 'Cinnamon-Toasted'},
+            'dateCollection':   {'TMP': date(1979, 12, 7), 'WOK': date(1982, 6, 4), 'S4S': date(1984, 6, 1)},
+        }),
+
+        BenchmarkCase(
+            'nested',
+            TestApplicantObject,
+
+            {
+                'name':         'Marcus',
+                'loan':         {'amount': 10000},
+                'addresses':    {
+                    'home': {'street': '740 Evergreen Terrace'},
+                    'work': {'street': '112½ Beacon Street'},
+                },
+            },
+
+            incoming = {
+                'loan':         {'amount': 12000},
+                'addresses':    {'branch': {'street': '12 Grimmauld Place'}},
+            },
+        ),
+
+        BenchmarkCase('partial_visibility', PartialVisibilityComplexTestValueObject, {
+            'publicCollection':     {'alpha': 1, 'bravo': 2, 'charlie': 3},
+            'privateCollection':    {'alpha': 1, 'bravo': 2, 'charlie': 3},
+            'partialCollection':    {'alpha': 1, 'bravo': 2, 'charlie': 3},
+            'publicNested':         {'public1': 'foo', 'public2': 'bar', 'private': 'baz'},
+            'privateNested':        {'public1': 'foo', 'public2': 'bar', 'private': 'baz'},
+            'partialNested':        {'public1': 'foo', 'public2': 'bar', 'private': 'baz'},
+        }),
+
+        # Same shape as the session data that exports, search results and parallel batches decode.
+        BenchmarkCase(
+            'session',
+            ApplicantObject,
+
+            {
+                'first_name':   'Marcus',
+                'last_name':    'Brody',
+                'gender':       'm',
+                'birthday':     date(1900, 8, 13),
+                'email':        'marcus.brody@marshall.edu',
+            },
+
+            document = {
+                '_auth_user_id':        '42',
+                '_auth_user_backend':   'django.contrib.auth.backends.ModelBackend',
+                '_auth_user_hash':      '2d5ea4bb8a6d4a3e1d5bd4f3f0e0b19b5c1d2a7f',
+                'step':                 3,
+                'visited':              ['/applicant', '/applicant/address', '/applicant/income'],
+            },
+
+            path = ('applicant',),
+        ),
+
+        BenchmarkCase('large_collection', LargeCollectionObject, {
+            'simple':   {'key{0}'.format(i): 'value {0}'.format(i) for i in range(size)},
+            'dates':    {'key{0}'.format(i): date(2000, 1, 1) + timedelta(days=i) for i in range(size)},
+        }),
+
+        BenchmarkCase(
+            'large_nested',
+            TestApplicantObject,
+
+            {
+                'name':         'Marcus',
+                'loan':         {'amount': 10000},
+                'addresses':    {'addr{0}'.format(i): {'street': '{0} Beacon Street'.format(i)} for i in range(size)},
+            },
+
+            incoming = {
+                # Only some of the addresses change.
+                'addresses':    {
+                    'addr{0}'.format(i): {'street': '{0} Elm Street'.format(i)}
+                        for i in range(0, size, 10)
+                },
+            },
+        ),
+
+        BenchmarkCase(
+            'large_lazy_nested',
+            LazyApplicantObject,
+
+            {
+                'name':         'Marcus',
+                'loan':         {'amount': 10000},
+                'addresses':    {'addr{0}'.format(i): {'street': '{0} Beacon Street'.format(i)} for i in range(size)},
+            },
+
+            incoming = {
+                # Only some of the addresses change.
+                'addresses':    {
+                    'addr{0}'.format(i): {'street': '{0} Elm Street'.format(i)}
+                        for i in range(0, size, 10)
+                },
+            },
+        ),
+    ]
+
+
+def measure_throughput(func, min_time=0.2, repeat=3):
+    """
+    Measures how many times per second `func` can be called.
+
+    The number of calls per round is calibrated so that each round takes at least `min_time` seconds; the best of
+        `repeat` rounds is reported, since slower rounds are (almost always) caused by outside interference.
+
+    :type func: () -> object
+    :type min_time: float
+    :type repeat: int
+
+    :rtype: float
+    """
+    number = 1
+    while True:
+        elapsed = _time_calls(func, number)
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < (min_time / 10) else 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _time_calls(func, number))
+
+    return number / best if best else float('inf')
+
+
+def measure_allocations(func, number=10):
+    """
+    Measures the memory allocated by `func` (requires tracemalloc).
+
+    :type func: () -> object
+    :type number: int
+
+    :rtype: dict|None
+    :return:
+        - peak_bytes:       Highest amount of memory in use at any point during a single call.
+        - retained_bytes:   Memory still held by the return value after the call.
+    """
+    if tracemalloc is None:
+        return None
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+
+    measurements = []
+
+    try:
+        for _ in range(number):
+            tracemalloc.clear_traces()
+            result = func()
+            measurements.append(tracemalloc.get_traced_memory())
+            del result
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    # Early calls can include one-off allocations (caches, interned strings, etc.); report the steady state.
+    return {
+        'peak_bytes':       min(peak for _, peak in measurements),
+        'retained_bytes':   min(current for current, _ in measurements),
+    }
+
+
+def run_benchmarks(cases, operations=OPERATIONS, min_time=0.2, repeat=3, measure_memory=True):
+    """
+    Runs the benchmarks and returns the results.
+
+    :type cases: list[BenchmarkCase]
+    :type operations: tuple[unicode]
+    :type min_time: float
+    :type repeat: int
+    :type measure_memory: bool
+
+    :rtype: dict
+    """
+    results = {}
+
+    for case in cases:
+        case_results = results[case.name] = {}
+
+        for operation, func in iteritems(case.get_operations()):
+            if operation not in operations:
+                continue
+
+            result = case_results[operation] = {
+                'ops_per_sec': measure_throughput(func, min_time, repeat),
+            }
+
+            if measure_memory:
+                result.update(measure_allocations(func) or {})
+
+    return {
+        'python':   platform.python_version(),
+        'results':  results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compares benchmark results against a baseline.
+
+    :type baseline: dict
+    :type current: dict
+    :param current: Both are return values from `run_benchmarks` (e.g., loaded from a baseline file).
+
+    :type threshold: float
+    :param threshold: Relative change that counts as a regression (0.1 = 10% slower or bigger).
+
+    :rtype: list[dict]
+    :return: One entry per measurement that exists in both, with `regression` set on the ones that got worse.
+    """
+    comparisons = []
+
+    for case, operations in sorted(iteritems(current['results'])):
+        for operation, measurements in sorted(iteritems(operations)):
+            try:
+                previous = baseline['results'][case][operation]
+            except KeyError:
+                continue
+
+            for metric, value in sorted(iteritems(measurements)):
+                old = previous.get(metric)
+                if not old:
+                    continue
+
+                change = (value - old) / old
+
+                comparisons.append({
+                    'case':         case,
+                    'operation':    operation,
+                    'metric':       metric,
+                    'baseline':     old,
+                    'current':      value,
+                    'change':       change,
+
+                    # More ops/sec is better; for everything else (bytes), less is better.
+                    'regression':   (change < -threshold) if metric == 'ops_per_sec' else (change > threshold),
+                })
+
+    return comparisons
+
+
+def format_results(current, comparisons=None):
+    """
+    Formats benchmark results as a human-readable table.
+
+    :type current: dict
+    :type comparisons: list[dict]|None
+
+    :rtype: unicode
+    """
+    changes = {
+        (c['case'], c['operation'], c['metric']): c
+            for c in (comparisons or [])
+    }
+
+    lines = [
+        '{case:<20} {operation:<18} {ops:>14} {peak:>12} {retained:>12}'.format(
+            case        = 'case',
+            operation   = 'operation',
+            ops         = 'ops/sec',
+            peak        = 'peak bytes',
+            retained    = 'retained',
+        ),
+    ]
+
+    def cell(case, operation, measurements, metric, fmt):
+        value = measurements.get(metric)
+        if value is None:
+            return '-'
+
+        text = fmt.format(value)
+
+        change = changes.get((case, operation, metric))
+        if change:
+            text += ' {0:+.0%}{1}'.format(change['change'], '!' if change['regression'] else '')
+
+        return text
+
+    for case, operations in sorted(iteritems(current['results'])):
+        for operation in OPERATIONS:
+            measurements = operations.get(operation)
+            if measurements is None:
+                continue
+
+            lines.append('{case:<20} {operation:<18} {ops:>14} {peak:>12} {retained:>12}'.format(
+                case        = case,
+                operation   = operation,
+                ops         = cell(case, operation, measurements, 'ops_per_sec', '{0:,.0f}'),
+                peak        = cell(case, operation, measurements, 'peak_bytes', '{0:,}'),
+                retained    = cell(case, operation, measurements, 'retained_bytes', '{0:,}'),
+            ))
+
+    return '\n'.join(lines)
+
+
+def _time_calls(func, number):
+    """
+    Returns the time it takes to call `func` `number` times, with the garbage collector disabled (same as `timeit`).
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        started = default_timer()
+        for _ in range(number):
+            func()
+        return default_timer() - started
+    finally:
+        if gc_was_enabled:
+            gc.enable()
@@ -0,0 +1,49 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from api.metrics import fragment_cache_requests
+
+
+class FragmentCache(LocMemCache):
+  """
+  Bounded in-process cache for rendered template fragments.
+
+  Behaves exactly like Django's local-memory cache (entries are culled once `MAX_ENTRIES` is reached), but also keeps
+    track of hits and misses so that we can tell whether the cache is pulling its weight.
+  """
+  def __init__(self, name, params):
+    super(FragmentCache, self).__init__(name, params)
+
+    self.hits   = 0
+    self.misses = 0
+
+  def get(self, key, default=None, version=None, acquire_lock=True):
+    # Use a sentinel so that cached values that happen to equal `default` are still counted as hits.
+    value = super(FragmentCache, self).get(key, _MISSING, version, acquire_lock)
+
+    if value is _MISSING:
+      self.misses += 1
+      fragment_cache_requests.inc(('miss',))
+      return default
+
+    self.hits += 1
+    fragment_cache_requests.inc(('hit',))
+    return value
+
+  def get_stats(self):
+    """
+    Returns hit/miss counts and the current number of entries.
+
+    :rtype: dict
+    """
+    return {
+      'hits':     self.hits,
+      'misses':   self.misses,
+      'entries':  len(self._cache),
+      'capacity': self._max_entries,
+    }
+
+
+_MISSING = object()
@@ -0,0 +1,232 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+from hashlib import sha1, sha256
+from io import open
+from time import time
+
+from six import iteritems, string_types
+from six.moves.queue import Empty, Full, Queue
+
+logger = logging.getLogger(__name__)
+
+
+def _scrub_mask(value):
+  # Keep the shape of the value (length, punctuation) so that it still exercises the same code paths when replayed.
+  return re.sub(r'\w', 'x', value, flags=re.UNICODE)
+
+def _scrub_hash(value):
+  return sha1(value.encode('utf-8')).hexdigest()[:16]
+
+def _scrub_year(value):
+  # E.g., birthdays: keep the year (so that the value remains a valid date), discard the rest.
+  match = re.match(r'^(\d{4})-\d{2}-\d{2}$', value)
+  return '{0}-01-01'.format(match.group(1)) if match else _scrub_mask(value)
+
+SCRUB_RULES = {
+  'keep': lambda value: value,
+  'mask': _scrub_mask,
+  'hash': _scrub_hash,
+  'year': _scrub_year,
+}
+"""
+Built-in scrubbing rules.  The special rule "drop" removes the field from the captured entry altogether.
+"""
+
+
+def scrub(data, rules, default_rule='mask'):
+  """
+  Removes personally-identifiable information from captured form fields.
+
+  :type data: dict[unicode, list[unicode]]
+  :param data: Form fields (e.g., from `QueryDict.lists()`).
+
+  :type rules: dict[unicode, unicode|callable]
+  :param rules: Scrubbing rule to apply to each field.  Can be the name of a built-in rule (see `SCRUB_RULES`),
+    "drop", or a callable that accepts and returns a unicode value.
+
+  :type default_rule: unicode|callable
+  :param default_rule: Rule to apply to fields that aren't listed in `rules`.
+
+  :rtype: dict[unicode, unicode|list[unicode]]
+  """
+  scrubbed = {}
+
+  for field, values in iteritems(data):
+    rule = rules.get(field, default_rule)
+
+    if rule == 'drop':
+      continue
+
+    if isinstance(rule, string_types):
+      rule = SCRUB_RULES[rule]
+
+    values = [rule(value) for value in values]
+    scrubbed[field] = values[0] if len(values) == 1 else values
+
+  return scrubbed
+
+
+def hash_session_key(session_key):
+  """
+  Returns a hash of a session key that can be used to group requests without revealing the session key itself.
+
+  :type session_key: unicode|None
+
+  :rtype: unicode|None
+  """
+  return None if session_key is None else sha256(session_key.encode('utf-8')).hexdigest()[:16]
+
+
+class CaptureLogWriter(object):
+  """
+  Appends entries to a JSONL file from a background thread.
+
+  Entries are passed to the thread via a bounded queue and written in batches; if the queue is full, entries are
+    dropped (and counted) rather than blocking the caller.
+  """
+  def __init__(self, path, queue_size=10000, batch_size=100, flush_interval=1.0):
+    """
+    :type path: unicode
+    :param path: Path to the JSONL file.  Entries are appended if it already exists.
+
+    :type queue_size: int
+    :param queue_size: Max number of entries waiting to be written.
+
+    :type batch_size: int
+    :param batch_size: Max number of entries to write at once.
+
+    :type flush_interval: float
+    :param flush_interval: Max number of seconds an entry may wait before it is written.
+    """
+    super(CaptureLogWriter, self).__init__()
+
+    self.path           = path
+    self.batch_size     = batch_size
+    self.flush_interval = flush_interval
+
+    self.queue    = Queue(maxsize=queue_size)
+    self.written  = 0
+    self.dropped  = 0
+
+    self._lock    = threading.Lock()
+    self._thread  = None
+    """:type: threading.Thread"""
+    self._pid     = None
+
+  def submit(self, entry):
+    """
+    Queues an entry to be written.  Never blocks.
+
+    :type entry: dict
+
+    :rtype: bool
+    :return: Whether the entry was queued (False if the queue is full).
+    """
+    self._ensure_started()
+
+    try:
+      self.queue.put_nowait(entry)
+    except Full:
+      self.dropped += 1
+      return False
+    else:
+      return True
+
+  def close(self, timeout=5.0):
+    """
+    Writes any queued entries and stops the background thread.
+
+    :type timeout: float
+    """
+    thread = self._thread
+    if thread is not None and thread.is_alive() and self._pid == os.getpid():
+      # Block here (unlike `submit`); we want the sentinel to get through.
+      self.queue.put(_STOP)
+      thread.join(timeout)
+
+    self._thread = None
+
+  def _ensure_started(self):
+    # Threads don't survive forking, so each worker process needs to start its own.  Also restart the thread if it
+    #   died for any other reason, so that entries don't pile up in the queue unwritten.
+    if self._is_running():
+      return
+
+    with self._lock:
+      if not self._is_running():
+        self._pid     = os.getpid()
+        self._thread  = threading.Thread(target=self._run, name='capture-log-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+  def _is_running(self):
+    return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+  def _run(self):
+    batch     = []
+    deadline  = None
+    stopping  = False
+
+    while not stopping:
+      try:
+        entry = self.queue.get(timeout=self.flush_interval if deadline is None else max(deadline - time(), 0))
+      except Empty:
+        entry = None
+      else:
+        if entry is _STOP:
+          stopping = True
+        else:
+          batch.append(entry)
+          if deadline is None:
+            deadline = time() + self.flush_interval
+
+      if batch and (stopping or len(batch) >= self.batch_size or time() >= deadline):
+        try:
+          self._write(batch)
+        except Exception:
+          # E.g., the disk is full, or an entry can't be encoded.  Keep the thread alive for the next batch.
+          logger.exception('Failed to write %d entries to the capture log %s.', len(batch), self.path)
+          self.dropped += len(batch)
+
+        batch     = []
+        deadline  = None
+
+  def _write(self, batch):
+    """
+    :type batch: list[dict]
+    """
+    lines = ''.join(json.dumps(entry, sort_keys=True) + '\n' for entry in batch)
+
+    with open(self.path, 'a', encoding='utf-8') as f:
+      f.write(lines)
+
+    self.written += len(batch)
+
+
+_STOP = object()
+
+
+_writers = {}
+""":type: dict[unicode, CaptureLogWriter]"""
+
+def get_writer(path, **kwargs):
+  """
+  Returns the shared writer for a capture log (creating it if necessary).
+
+  :type path: unicode
+
+  :rtype: CaptureLogWriter
+  """
+  try:
+    return _writers[path]
+  except KeyError:
+    writer = _writers.setdefault(path, CaptureLogWriter(path, **kwargs))
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,181 @@
+# coding=utf-8
+from __future__ import absolute_import, division, unicode_literals
+
+import csv
+import json
+from time import time
+
+from django.db import router
+from six import PY2, text_type
+
+from api.models import Session
+from api.value_objects import ApplicantObject
+
+try:
+  import pyarrow
+  import pyarrow.parquet
+except ImportError:
+  # pyarrow is optional; without it, only CSV exports are available.
+  pyarrow = None
+
+
+class ApplicantExport(object):
+  """
+  Streams the public values of every applicant stored in sessions.
+
+  Sessions are read in chunks using keyset pagination (ordered by session key), so memory use is bounded by
+    `chunk_size` no matter how many sessions there are, and later chunks are as fast to fetch as earlier ones (unlike
+    OFFSET).  Only the raw JSON is fetched, and only the applicant values in it are hydrated.
+  """
+  def __init__(self, chunk_size=1000, using=None):
+    """
+    :type chunk_size: int
+    :param chunk_size: Number of sessions to fetch per query.
+
+    :type using: unicode
+    :param using: Database alias (defaults to the one sessions are read from).
+    """
+    super(ApplicantExport, self).__init__()
+
+    self.chunk_size = chunk_size
+    self.using      = using or router.db_for_read(Session)
+
+    self.exported = 0
+    self.started  = None
+
+  @staticmethod
+  def get_columns():
+    """
+    Returns the names of the exported columns.
+
+    :rtype: list[unicode]
+    """
+    return ['session_key'] + sorted(ApplicantObject({}).get_public_field_keys())
+
+  def iter_chunks(self):
+    """
+    Yields the exported rows, one chunk at a time.
+
+    :rtype: collections.Iterator[list[dict]]
+    """
+    for applicants in self.iter_applicants():
+      rows = []
+      for session_key, applicant in applicants:
+        row = applicant.get_public_values()
+        row['session_key'] = session_key.hex
+        rows.append(row)
+
+      yield rows
+
+  def iter_applicants(self):
+    """
+    Yields (session key, applicant) pairs for every session, one chunk at a time.
+
+    :rtype: collections.Iterator[list[(uuid.UUID, ApplicantObject)]]
+    """
+    self.started = time()
+
+    sessions  = Session.objects.using(self.using).order_by('session_key')
+    last_key  = None
+
+    while True:
+      chunk = sessions.filter(session_key__gt=last_key) if last_key is not None else sessions
+      chunk = list(chunk.values_list('session_key', 'session_data')[:self.chunk_size])
+      if not chunk:
+        break
+
+      last_key = chunk[-1][0]
+
+      self.exported += len(chunk)
+      # Session data is small enough that `json.loads` beats the single-pass decoder (`hydrate_json`) by about 3x;
+      #   see the `session` case of `manage.py benchmark_value_objects`.
+      yield [
+        (session_key, ApplicantObject.hydrate((json.loads(raw) or {}).get('applicant') or {}))
+          for session_key, raw in chunk
+      ]
+
+  def get_progress(self):
+    """
+    :rtype: dict
+    :return: Rows exported so far, elapsed seconds and rows per second.
+    """
+    elapsed = (time() - self.started) if self.started else 0.0
+
+    return {
+      'rows':         self.exported,
+      'elapsed':      elapsed,
+      'rows_per_sec': (self.exported / elapsed) if elapsed else 0.0,
+    }
+
+
+class CsvExportWriter(object):
+  """
+  Writes exported rows to a CSV file, as they are received.
+  """
+  def __init__(self, stream, columns):
+    """
+    :type stream: io.IOBase
+    :param stream: Text stream (binary on Python 2).
+
+    :type columns: list[unicode]
+    """
+    super(CsvExportWriter, self).__init__()
+
+    self.columns  = columns
+    self._writer  = csv.writer(stream)
+
+    self._writer.writerow(self._encode(columns))
+
+  def write(self, rows):
+    """
+    :type rows: list[dict]
+    """
+    self._writer.writerows(self._encode(row.get(column) for column in self.columns) for row in rows)
+
+  def close(self):
+    pass
+
+  @staticmethod
+  def _encode(values):
+    # The `csv` module in Python 2 only supports byte strings.
+    if PY2:
+      return [v.encode('utf-8') if isinstance(v, text_type) else v for v in values]
+
+    return list(values)
+
+
+class ParquetExportWriter(object):
+  """
+  Writes exported rows to a Parquet file, one row group per chunk (requires pyarrow).
+  """
+  def __init__(self, path, columns):
+    """
+    :type path: unicode
+    :type columns: list[unicode]
+    """
+    super(ParquetExportWriter, self).__init__()
+
+    if pyarrow is None:
+      raise ValueError('Parquet exports require pyarrow.')
+
+    self.columns  = columns
+    self._schema  = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+    self._writer  = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+  def write(self, rows):
+    """
+    :type rows: list[dict]
+    """
+    self._writer.write_table(pyarrow.Table.from_arrays(
+      [
+        pyarrow.array(
+          [None if row.get(column) is None else text_type(row[column]) for row in rows],
+          type = pyarrow.string(),
+        )
+          for column in self.columns
+      ],
+      schema = self._schema,
+    ))
+
+  def close(self):
+    self._writer.close()
@@ -9,7 +9,7 @@ from api.value_objects import ApplicantObject
 class ApplicantForm(forms.Form):
   first_name  = forms.CharField()
   last_name   = forms.CharField()
-  gender      = forms.ChoiceField(choices=(('m', 'Male'), ('f', 'Female')))
+  gender      = forms.ChoiceField(choices=ApplicantObject.fields['gender'].choices)
   birthday    = forms.DateField(label='Birthday (YYYY-MM-DD)')
   email       = forms.CharField()
 
@@ -0,0 +1,222 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from uuid import UUID
+
+from django.db import router, transaction
+from django.db.models import F
+
+from api import search
+from api.forms import ApplicantForm
+from api.models import Session
+
+
+class ApplicantIngest(object):
+  """
+  Streams applicant records from an NDJSON source into sessions.
+
+  Each line is a JSON object containing the same fields as `ApplicantForm`, plus an optional `session_key`.  Records
+    with a `session_key` are merged into that session (creating it if necessary); all other records create a new
+    session.
+
+  Valid records are buffered and written in batches, each batch in its own transaction, so memory use is bounded by
+    `batch_size` no matter how large the input is.
+  """
+  def __init__(self, batch_size=500):
+    """
+    :type batch_size: int
+    :param batch_size: Max number of records to write per transaction.
+    """
+    super(ApplicantIngest, self).__init__()
+
+    self.batch_size = batch_size
+
+    self.created  = 0
+    self.updated  = 0
+    self.failed   = 0
+
+  def ingest(self, lines):
+    """
+    Processes each line from an NDJSON source, yielding one result dict per non-blank line.
+
+    Invalid lines are reported in the results; they do not stop the stream.
+
+    Note that results are not necessarily yielded in line order:  errors are reported immediately, whereas valid lines
+      are reported once their batch has been written.
+
+    :type lines: collections.Iterable[unicode|bytes]
+
+    :rtype: collections.Iterator[dict]
+    """
+    batch = []
+
+    for line_number, line in enumerate(lines, start=1):
+      if isinstance(line, bytes):
+        line = line.decode('utf-8')
+
+      line = line.strip()
+      if not line:
+        continue
+
+      try:
+        session_key, applicant = self._parse_line(line)
+      except ValueError as e:
+        self.failed += 1
+        yield {'line': line_number, 'errors': e.args[0]}
+        continue
+
+      batch.append((line_number, session_key, applicant))
+
+      if len(batch) >= self.batch_size:
+        for result in self._write_batch(batch):
+          yield result
+        batch = []
+
+    if batch:
+      for result in self._write_batch(batch):
+        yield result
+
+  def get_summary(self):
+    """
+    Returns counts of the records processed so far.
+
+    :rtype: dict
+    """
+    return {
+      'created':  self.created,
+      'updated':  self.updated,
+      'failed':   self.failed,
+    }
+
+  @staticmethod
+  def _parse_line(line):
+    """
+    Parses and validates a single NDJSON line.
+
+    :type line: unicode
+
+    :rtype: (UUID|None, api.value_objects.ApplicantObject)
+
+    :raise ValueError: if the line is invalid; `args[0]` contains the errors, keyed by field name.
+    """
+    try:
+      record = json.loads(line)
+    except ValueError as e:
+      raise ValueError({'__all__': ['Invalid JSON: {0}'.format(e)]})
+
+    if not isinstance(record, dict):
+      raise ValueError({'__all__': ['Expected a JSON object.']})
+
+    session_key = record.get('session_key')
+    if session_key is not None:
+      try:
+        session_key = UUID(session_key)
+      except (AttributeError, TypeError, ValueError):
+        raise ValueError({'session_key': ['Invalid session key.']})
+
+    form = ApplicantForm(record)
+    if not form.is_valid():
+      raise ValueError({field: list(errors) for field, errors in form.errors.items()})
+
+    return session_key, form.cleaned_data
+
+  def _write_batch(self, batch):
+    """
+    Writes a batch of validated applicants to the database in a single transaction.
+
+    :type batch: list[(int, UUID|None, api.value_objects.ApplicantObject)]
+
+    :rtype: list[dict]
+    """
+    using     = router.db_for_write(Session)
+    keys      = {session_key for _, session_key, _ in batch if session_key}
+    results   = []
+
+    with transaction.atomic(using=using):
+      existing  = self._load_sessions(keys, using)
+      new       = {}
+      """:type: dict[UUID, Session]"""
+      changed   = {}
+      """:type: dict[UUID, Session]"""
+
+      for line_number, session_key, applicant in batch:
+        session = existing.get(session_key) or new.get(session_key)
+
+        if session is None:
+          session = Session(session_data={})
+          if session_key:
+            session.session_key = session_key
+
+          session.applicant_vo = applicant
+          new[session.session_key] = session
+          status = 'created'
+
+        else:
+          try:
+            merged = session.applicant_vo
+          except (TypeError, ValueError) as e:
+            # The stored applicant is invalid; don't let it stop the rest of the stream.
+            self.failed += 1
+            results.append({'line': line_number, 'errors': {'__all__': ['Invalid stored applicant: {0}'.format(e)]}})
+            continue
+
+          merged.update(applicant)
+          session.applicant_vo = merged
+
+          # Sessions created earlier in this batch will be saved by `bulk_create`.
+          if session.session_key in existing:
+            changed[session.session_key] = session
+          status = 'updated'
+
+        results.append({'line': line_number, 'session_key': session.session_key.hex, 'status': status})
+
+      for session in changed.values():
+        # Bumping the version makes concurrent session stores that loaded this session merge their changes into ours.
+        session.version = F('version') + 1
+        session.save(using=using, update_fields=('session_data', 'version') + Session.APPLICANT_COLUMNS)
+
+      if new:
+        Session.objects.using(using).bulk_create(new.values())
+
+      search.index_sessions(
+        {session.session_key: session.session_data.get('applicant') for session in changed.values()},
+        using = using,
+      )
+
+      search.index_sessions(
+        {session.session_key: session.session_data.get('applicant') for session in new.values()},
+        using   = using,
+        created = True,
+      )
+
+    for result in results:
+      if result.get('status') == 'created':
+        self.created += 1
+      elif result.get('status') == 'updated':
+        self.updated += 1
+
+    return results
+
+  @staticmethod
+  def _load_sessions(keys, using):
+    """
+    Loads the sessions that records will be merged into.
+
+    The session data is decoded with `json.loads`:  the `JSONField` decoder turns date strings into dates, which the
+      applicant value object can't hydrate.
+
+    :type keys: set[UUID]
+    :type using: unicode
+
+    :rtype: dict[UUID, Session]
+    """
+    if not keys:
+      return {}
+
+    stored = Session.objects.using(using).filter(session_key__in=list(keys)).values_list('session_key', 'session_data')
+
+    return {
+      session_key: Session(session_key=session_key, session_data=json.loads(raw))
+        for session_key, raw in stored
+    }
@@ -0,0 +1,277 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import threading
+from functools import wraps
+from time import time
+
+from six import iteritems
+
+try:
+  from contextvars import ContextVar
+except ImportError:
+  # Python < 3.7; per-request stats are tracked per thread instead.
+  ContextVar = None
+
+try:
+  import tracemalloc
+except ImportError:
+  # Python 2 does not have tracemalloc; allocations will not be tracked.
+  tracemalloc = None
+
+_enabled = False
+
+_process_stats = {}
+""":type: dict[unicode, list]"""
+_process_lock = threading.Lock()
+
+_local = threading.local()
+
+# Stats of the request that is being handled in the current context.  Unlike a thread-local, this follows a request
+#   across coroutines and threads (under ASGI, requests are interleaved on the event loop, and parts of each request run
+#   in a thread pool).
+_request_stats = ContextVar('instrumentation_request_stats', default=None) if ContextVar is not None else None
+
+_listeners = []
+""":type: list[callable]"""
+
+
+def enable():
+  """
+  Starts recording instrumented calls.
+  """
+  global _enabled
+  _enabled = True
+
+
+def disable():
+  """
+  Stops recording instrumented calls.  Stats collected so far are retained.
+  """
+  global _enabled
+  _enabled = False
+
+
+def is_enabled():
+  """
+  :rtype: bool
+  """
+  return _enabled
+
+
+def reset():
+  """
+  Clears the process-level stats.
+  """
+  with _process_lock:
+    _process_stats.clear()
+
+
+def add_listener(listener):
+  """
+  Registers a callable that will be invoked for every recorded call (while instrumentation is enabled).
+
+  :type listener: (unicode, float, int|None) -> None
+  :param listener: Accepts the name of the operation, its duration (seconds) and its payload size (bytes).
+  """
+  if listener not in _listeners:
+    _listeners.append(listener)
+
+
+def start_request(request):
+  """
+  Starts collecting stats for a request.
+
+  The stats are stored on the request; instrumented calls are attributed to it for the rest of the current context
+    (or thread, before Python 3.7).
+
+  :type request: django.http.HttpRequest
+  """
+  request._instrumentation_stats = {}
+  _set_request_stats(request._instrumentation_stats)
+
+
+def finish_request(request):
+  """
+  Stops collecting stats for a request and returns them.
+
+  :type request: django.http.HttpRequest
+
+  :rtype: dict[unicode, dict]
+  """
+  stats = getattr(request, '_instrumentation_stats', None)
+  request._instrumentation_stats = None
+
+  if stats is not None and _get_request_stats() is stats:
+    _set_request_stats(None)
+
+  return _format_stats(stats or {})
+
+
+def start_allocation_tracking():
+  """
+  Starts recording the memory allocated by each instrumented call in the current thread (requires tracemalloc to be
+    tracing, and instrumentation to be enabled).
+
+  :see: api.allocations.AllocationProfile
+  """
+  _local.allocations = {}
+
+
+def finish_allocation_tracking():
+  """
+  Stops recording allocations for the current thread and returns them.
+
+  :rtype: dict[unicode, dict]
+  :return: Number of calls and net bytes allocated (i.e., still allocated when each call returned, including its return
+    value), keyed by "<owner>.<operation>".  Inclusive of nested instrumented calls.
+  """
+  allocations = getattr(_local, 'allocations', None)
+  _local.allocations = None
+
+  return {
+    name: {'calls': calls, 'bytes': size}
+      for name, (calls, size) in iteritems(allocations or {})
+  }
+
+
+def get_process_stats():
+  """
+  Returns stats for every instrumented call made in this process so far.
+
+  :rtype: dict[unicode, dict]
+  """
+  with _process_lock:
+    return _format_stats(_process_stats)
+
+
+def json_size(value):
+  """
+  Returns the size of a value once serialized as JSON, which is a good approximation of how much data an operation had
+    to process.
+
+  :rtype: int|None
+  """
+  try:
+    return len(json.dumps(value, default=str))
+  except (TypeError, ValueError):
+    return None
+
+
+def result_size(args, kwargs, result):
+  """
+  Payload size function for `instrumented` that measures the return value.
+  """
+  return json_size(result)
+
+
+def argument_size(index):
+  """
+  Returns a payload size function for `instrumented` that measures a positional argument.
+
+  :type index: int
+  """
+  def size(args, kwargs, result):
+    return json_size(args[index]) if len(args) > index else None
+  return size
+
+
+def instrumented(operation, size=None):
+  """
+  Decorator that records the number of calls, cumulative time and payload size of a function or method.
+
+  Calls are recorded under "<owner>.<operation>", where the owner is the name of the class (or of the class of the
+    instance) that the method was invoked on.  Times are inclusive, i.e., they include time spent in nested
+    instrumented calls.
+
+  When instrumentation is disabled, the only overhead is an extra function call and a global lookup.
+
+  :type operation: unicode
+
+  :type size: (tuple, dict, object) -> int|None
+  :param size: Computes the payload size from the call's args, kwargs and return value.
+    Only invoked while instrumentation is enabled.
+  """
+  def decorator(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      if not _enabled:
+        return func(*args, **kwargs)
+
+      allocations = getattr(_local, 'allocations', None)
+      if allocations is not None:
+        allocated = tracemalloc.get_traced_memory()[0]
+
+      started = time()
+      result  = func(*args, **kwargs)
+      elapsed = time() - started
+
+      owner = args[0] if isinstance(args[0], type) else type(args[0])
+      name  = '{owner}.{operation}'.format(owner=owner.__name__, operation=operation)
+
+      if allocations is not None:
+        entry = allocations.setdefault(name, [0, 0])
+        entry[0] += 1
+        entry[1] += tracemalloc.get_traced_memory()[0] - allocated
+
+      _record(name, elapsed, None if size is None else size(args, kwargs, result))
+
+      return result
+    return wrapper
+  return decorator
+
+
+def _get_request_stats():
+  """
+  :rtype: dict|None
+  """
+  if _request_stats is not None:
+    return _request_stats.get()
+
+  return getattr(_local, 'request', None)
+
+
+def _set_request_stats(stats):
+  """
+  :type stats: dict|None
+  """
+  if _request_stats is not None:
+    _request_stats.set(stats)
+  else:
+    _local.request = stats
+
+
+def _record(name, elapsed, size):
+  """
+  :type name: unicode
+  :type elapsed: float
+  :type size: int|None
+  """
+  request_stats = _get_request_stats()
+  if request_stats is not None:
+    _add(request_stats, name, elapsed, size)
+
+  with _process_lock:
+    _add(_process_stats, name, elapsed, size)
+
+  for listener in _listeners:
+    listener(name, elapsed, size)
+
+
+def _add(stats, name, elapsed, size):
+  try:
+    entry = stats[name]
+  except KeyError:
+    entry = stats[name] = [0, 0.0, 0]
+
+  entry[0] += 1
+  entry[1] += elapsed
+  entry[2] += size or 0
+
+
+def _format_stats(stats):
+  return {
+    name: {'calls': calls, 'time': elapsed, 'bytes': size}
+      for name, (calls, elapsed, size) in iteritems(stats)
+  }
@@ -0,0 +1,60 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the WSGI and ASGI applications when serving many slow clients with a slow database, using the same '
+        'number of threads.  Requires Python 3.5+.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--clients', dest='clients', type=int, default=50,
+            help='Number of concurrent clients.')
+        parser.add_argument('-n', '--requests', dest='requests', type=int, default=5,
+            help='Number of requests per client (one POST, then GETs).')
+        parser.add_argument('-t', '--threads', dest='threads', type=int, default=10,
+            help='Number of threads available to each application.')
+        parser.add_argument('--client-latency', dest='client_latency', type=float, default=0.05,
+            help='Seconds each client takes to send a request, and again to receive the response.')
+        parser.add_argument('--db-latency', dest='db_latency', type=float, default=0.005,
+            help='Seconds added to each database query.')
+        parser.add_argument('--json', action='store_true', dest='as_json', default=False,
+            help='Output the reports as JSON.')
+
+    def handle(self, *args, **options):
+        if sys.version_info < (3, 5):
+            raise CommandError('The ASGI application requires Python 3.5+.')
+
+        # Import here so that the applications are only initialized when the command actually runs.
+        from api.benchmarks.concurrency import ConcurrencyBenchmark
+        from exercise_misbehaving_app.asgi import application as asgi_application
+        from exercise_misbehaving_app.wsgi import application as wsgi_application
+
+        benchmark = ConcurrencyBenchmark(
+            clients         = options['clients'],
+            requests        = options['requests'],
+            threads         = options['threads'],
+            client_latency  = options['client_latency'],
+            db_latency      = options['db_latency'],
+        )
+
+        reports = [
+            ('wsgi', benchmark.run_wsgi(wsgi_application)),
+            ('asgi', benchmark.run_asgi(asgi_application)),
+        ]
+
+        if options['as_json']:
+            self.stdout.write(json.dumps(
+                {name: report.get_summary() for name, report in reports},
+                indent      = 2,
+                sort_keys   = True,
+            ))
+        else:
+            for name, report in reports:
+                self.stdout.write('=== {0} ===\n{1}\n\n'.format(name.upper(), report.format_text()))
@@ -0,0 +1,91 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from io import open
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks.value_object import OPERATIONS, compare, format_results, get_cases, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the throughput and memory allocations of value object operations, optionally saving the results as a '
+        'baseline or comparing them against one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--case', action='append', dest='cases', default=[],
+            help='Only run the specified case (can be specified multiple times).')
+        parser.add_argument('-o', '--operation', action='append', dest='operations', default=[], choices=OPERATIONS,
+            help='Only measure the specified operation (can be specified multiple times).')
+        parser.add_argument('--scale', dest='scale', type=int, default=1,
+            help='Size multiplier for the large (synthetic) cases.')
+        parser.add_argument('--min-time', dest='min_time', type=float, default=0.2,
+            help='Min duration (seconds) of each timing round.')
+        parser.add_argument('--repeat', dest='repeat', type=int, default=3,
+            help='Number of timing rounds; the best one is reported.')
+        parser.add_argument('--no-memory', action='store_false', dest='measure_memory', default=True,
+            help='Do not measure allocations (requires tracemalloc).')
+        parser.add_argument('--save', dest='save',
+            help='Save the results to this baseline file.')
+        parser.add_argument('--compare', dest='compare',
+            help='Compare the results against this baseline file; exits with an error if any regressed.')
+        parser.add_argument('--threshold', dest='threshold', type=float, default=0.1,
+            help='Relative change that counts as a regression when comparing (default 0.1, i.e., 10%%).')
+        parser.add_argument('--json', action='store_true', dest='as_json', default=False,
+            help='Output the results as JSON.')
+
+    def handle(self, *args, **options):
+        cases = get_cases(options['scale'])
+
+        if options['cases']:
+            unknown = set(options['cases']) - {case.name for case in cases}
+            if unknown:
+                raise CommandError('Unknown case(s): {0}'.format(', '.join(sorted(unknown))))
+
+            cases = [case for case in cases if case.name in options['cases']]
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.loads(f.read())
+            except (IOError, ValueError) as e:
+                raise CommandError('Unable to load baseline {path}: {error}'.format(path=options['compare'], error=e))
+
+        results = run_benchmarks(
+            cases           = cases,
+            operations      = tuple(options['operations']) or OPERATIONS,
+            min_time        = options['min_time'],
+            repeat          = options['repeat'],
+            measure_memory  = options['measure_memory'],
+        )
+
+        comparisons = compare(baseline, results, options['threshold']) if baseline else None
+
+        if options['as_json']:
+            self.stdout.write(json.dumps(
+                dict(results, comparisons=comparisons) if baseline else results,
+                indent      = 2,
+                sort_keys   = True,
+            ))
+        else:
+            self.stdout.write(format_results(results, comparisons))
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as f:
+                f.write(json.dumps(results, indent=2, sort_keys=True))
+
+        if comparisons:
+            regressions = [c for c in comparisons if c['regression']]
+            if regressions:
+                raise CommandError('{count} measurement(s) regressed by more than {threshold:.0%}: {names}'.format(
+                    count       = len(regressions),
+                    threshold   = options['threshold'],
+                    names       = ', '.join(
+                        '{case}.{operation} ({metric})'.format(**c)
+                            for c in regressions
+                    ),
+                ))
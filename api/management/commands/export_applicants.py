@@ -0,0 +1,77 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from io import open
+
+from django.core.management.base import BaseCommand, CommandError
+from six import PY2
+
+from api.export import ApplicantExport, CsvExportWriter, ParquetExportWriter, pyarrow
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the public values of every applicant to a CSV or Parquet file, in constant memory.  '
+        'Progress is reported on stderr.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+            help='Path to write the export to ("-" to write CSV to stdout).')
+        parser.add_argument('--format', dest='format', choices=('csv', 'parquet'), default=None,
+            help='Output format (default:  based on the file extension).')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=1000,
+            help='Number of sessions to fetch and write at a time.')
+        parser.add_argument('--progress-interval', dest='progress_interval', type=int, default=100,
+            help='Report progress every N chunks (0 to disable).')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+
+        path    = options['path']
+        fmt     = options['format'] or ('parquet' if path.endswith('.parquet') else 'csv')
+
+        if fmt == 'parquet':
+            if pyarrow is None:
+                raise CommandError('Parquet exports require pyarrow (pip install pyarrow).')
+
+            if path == '-':
+                raise CommandError('Parquet exports must be written to a file.')
+
+        export  = ApplicantExport(chunk_size=options['chunk_size'])
+        columns = export.get_columns()
+
+        if fmt == 'parquet':
+            self._run(export, ParquetExportWriter(path, columns), options['progress_interval'])
+
+        elif path == '-':
+            self._run(export, CsvExportWriter(self.stdout, columns), options['progress_interval'])
+
+        else:
+            try:
+                stream = open(path, 'wb') if PY2 else open(path, 'w', encoding='utf-8', newline='')
+            except IOError as e:
+                raise CommandError('Unable to open {path}: {error}'.format(path=path, error=e))
+
+            with stream:
+                self._run(export, CsvExportWriter(stream, columns), options['progress_interval'])
+
+        self.stderr.write(json.dumps(export.get_progress(), sort_keys=True))
+
+    def _run(self, export, writer, progress_interval):
+        """
+        :type export: ApplicantExport
+        :type writer: CsvExportWriter|ParquetExportWriter
+        :type progress_interval: int
+        """
+        try:
+            for i, rows in enumerate(export.iter_chunks(), start=1):
+                writer.write(rows)
+
+                if progress_interval and (i % progress_interval == 0):
+                    progress = export.get_progress()
+                    self.stderr.write('Exported {rows:,} applicants ({rows_per_sec:,.0f}/s)...'.format(**progress))
+        finally:
+            writer.close()
@@ -0,0 +1,56 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import sys
+from io import open
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingest import ApplicantIngest
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams applicant records from an NDJSON file into sessions.  '
+        'Per-line errors are written to stderr as NDJSON; they do not stop the import.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+            help='Path to the NDJSON file to import ("-" to read from stdin).')
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=500,
+            help='Max number of records to write per transaction.')
+        parser.add_argument('--verbose-results', action='store_true', dest='verbose_results', default=False,
+            help='Also write a result line to stdout for each record that was imported successfully.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+
+        ingest = ApplicantIngest(batch_size=options['batch_size'])
+
+        if options['path'] == '-':
+            self._run(ingest, sys.stdin, options['verbose_results'])
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8')
+            except IOError as e:
+                raise CommandError('Unable to open {path}: {error}'.format(path=options['path'], error=e))
+
+            with stream:
+                self._run(ingest, stream, options['verbose_results'])
+
+        self.stdout.write(json.dumps(ingest.get_summary(), sort_keys=True))
+
+    def _run(self, ingest, stream, verbose_results):
+        """
+        :type ingest: ApplicantIngest
+        :type stream: collections.Iterable[unicode]
+        :type verbose_results: bool
+        """
+        for result in ingest.ingest(stream):
+            if 'errors' in result:
+                self.stderr.write(json.dumps(result, sort_keys=True))
+            elif verbose_results:
+                self.stdout.write(json.dumps(result, sort_keys=True))
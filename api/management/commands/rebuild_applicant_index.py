@@ -0,0 +1,53 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+
+from api.models import ApplicantTerm, Session
+from api.search import index_sessions
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the applicant search index from session data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=1000,
+            help='Number of sessions to index per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+
+        using = router.db_for_write(ApplicantTerm)
+
+        ApplicantTerm.objects.using(using).all().delete()
+
+        sessions    = Session.objects.using(using).order_by('session_key')
+        last_key    = None
+        indexed     = 0
+
+        while True:
+            batch = sessions.filter(session_key__gt=last_key) if last_key is not None else sessions
+
+            # Read the raw JSON; only the applicant values are needed.
+            batch = list(batch.values_list('session_key', 'session_data')[:options['batch_size']])
+            if not batch:
+                break
+
+            with transaction.atomic(using=using):
+                index_sessions(
+                    {key: (json.loads(raw) or {}).get('applicant') for key, raw in batch},
+                    using   = using,
+                    created = True,
+                )
+
+            indexed     += len(batch)
+            last_key    = batch[-1][0]
+
+            if options['verbosity'] > 1:
+                self.stderr.write('Indexed {0} sessions...'.format(indexed))
+
+        self.stdout.write('Indexed {0} sessions.'.format(indexed))
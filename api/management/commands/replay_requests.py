@@ -0,0 +1,59 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from io import open
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks.replay import RequestReplayer, load_flows
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays captured requests (JSONL) directly against the WSGI application and reports throughput, latency '
+        'percentiles and query counts per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+            help='Path to the JSONL file containing the requests to replay.')
+        parser.add_argument('-c', '--concurrency', dest='concurrency', type=int, default=1,
+            help='Number of flows to replay concurrently.')
+        parser.add_argument('--processes', action='store_true', dest='use_processes', default=False,
+            help='Use worker processes instead of threads.')
+        parser.add_argument('-n', '--repeat', dest='repeat', type=int, default=1,
+            help='Number of times to replay the file.')
+        parser.add_argument('--no-query-counts', action='store_false', dest='count_queries', default=True,
+            help='Do not count DB queries (removes a small amount of overhead from each query).')
+        parser.add_argument('--json', action='store_true', dest='as_json', default=False,
+            help='Output the report as JSON.')
+
+    def handle(self, *args, **options):
+        # Import here so that the application is only initialized when the command actually runs.
+        from exercise_misbehaving_app.wsgi import application
+
+        try:
+            with open(options['path'], encoding='utf-8') as f:
+                flows = load_flows(f)
+        except IOError as e:
+            raise CommandError('Unable to open {path}: {error}'.format(path=options['path'], error=e))
+        except ValueError as e:
+            raise CommandError('Invalid JSONL in {path}: {error}'.format(path=options['path'], error=e))
+
+        if not flows:
+            raise CommandError('{path} does not contain any requests.'.format(path=options['path']))
+
+        replayer = RequestReplayer(
+            application     = application,
+            concurrency     = options['concurrency'],
+            use_processes   = options['use_processes'],
+            count_queries   = options['count_queries'],
+        )
+
+        report = replayer.run(flows * max(options['repeat'], 1))
+
+        if options['as_json']:
+            self.stdout.write(json.dumps(report.get_summary(), indent=2, sort_keys=True))
+        else:
+            self.stdout.write(report.format_text())
@@ -0,0 +1,44 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import scoring
+from api.export import ApplicantExport
+
+
+class Command(BaseCommand):
+    help = (
+        'Evaluates eligibility rules for every applicant, and writes one NDJSON line per session to stdout.  '
+        'Install numpy for vectorized evaluation.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', dest='as_of', default=None,
+            help='Date to compute ages at, in YYYY-MM-DD format (default:  today).')
+        parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=10000,
+            help='Number of sessions to load and score at a time.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = datetime.strptime(options['as_of'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--as-of must be a date in YYYY-MM-DD format.')
+
+        export = ApplicantExport(chunk_size=options['chunk_size'])
+
+        for applicants in export.iter_applicants():
+            results = scoring.score(scoring.ApplicantColumns.from_applicants(applicants), as_of)
+
+            for row in scoring.iter_rows(results):
+                self.stdout.write(json.dumps(row, sort_keys=True))
+
+        self.stderr.write(json.dumps(export.get_progress(), sort_keys=True))
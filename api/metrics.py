@@ -0,0 +1,465 @@
+# coding=utf-8
+from __future__ import absolute_import, division, unicode_literals
+
+import atexit
+import json
+import os
+import threading
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_left
+from glob import glob
+from io import open
+from time import time
+
+from six import iteritems, with_metaclass
+
+from api import instrumentation
+
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+"""Default histogram buckets for durations (seconds)."""
+
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+"""Default histogram buckets for payload sizes (bytes)."""
+
+
+class Metric(with_metaclass(ABCMeta)):
+  """
+  Base functionality for metrics.
+
+  Each thread records values in its own shard, so recording a value never needs a lock; shards are only combined when
+    the metric is collected.  Shards of threads that have finished are folded into a single retired shard, so that
+    servers that recycle their threads don't accumulate shards (or lose the values recorded by old threads).
+  """
+  type = None
+  """:type: unicode"""
+
+  def __init__(self, name, documentation, labelnames=()):
+    """
+    :type name: unicode
+    :type documentation: unicode
+    :type labelnames: tuple[unicode]
+    """
+    super(Metric, self).__init__()
+
+    self.name           = name
+    self.documentation  = documentation
+    self.labelnames     = tuple(labelnames)
+
+    self._local   = threading.local()
+    self._shards  = {}
+    """:type: dict[threading.Thread, dict]"""
+    self._retired = {}
+    """:type: dict"""
+    self._lock    = threading.Lock()
+
+  def collect(self):
+    """
+    Combines the values from all threads.
+
+    :rtype: dict[tuple, object]
+    """
+    combined = {}
+
+    with self._lock:
+      self._retire_shards()
+      self.merge_into(combined, self._retired)
+      shards = list(self._shards.values())
+
+    for shard in shards:
+      # Copying the items is atomic, so the owning thread can keep writing while we do this.
+      for labels, value in list(shard.items()):
+        combined[labels] = self._combine(combined.get(labels), value)
+
+    return combined
+
+  def merge_into(self, combined, samples):
+    """
+    Merges collected samples (e.g., from another process) into `combined`.
+
+    :type combined: dict[tuple, object]
+    :type samples: dict[tuple, object]
+    """
+    for labels, value in iteritems(samples):
+      combined[labels] = self._combine(combined.get(labels), value)
+
+  def reset(self):
+    """
+    Discards all recorded values.
+    """
+    with self._lock:
+      for shard in self._shards.values():
+        shard.clear()
+
+      self._retired.clear()
+
+  def _shard(self):
+    """
+    Returns the current thread's shard.
+
+    :rtype: dict
+    """
+    try:
+      return self._local.shard
+    except AttributeError:
+      shard = self._local.shard = {}
+
+      with self._lock:
+        # New threads usually replace old ones, so this is a good time to clean up after them.
+        self._retire_shards()
+        self._shards[threading.current_thread()] = shard
+
+      return shard
+
+  def _retire_shards(self):
+    """
+    Folds the shards of threads that have finished into the retired shard.
+
+    The caller must hold the lock.
+    """
+    for thread in [thread for thread in self._shards if not thread.is_alive()]:
+      self.merge_into(self._retired, self._shards.pop(thread))
+
+  @abstractmethod
+  def _combine(self, existing, value):
+    """
+    Combines two values recorded for the same labels.
+
+    :param existing: None if there is no value yet.
+
+    :rtype: object
+    """
+    raise NotImplementedError('Not implemented in {cls}.'.format(cls=type(self).__name__))
+
+  @abstractmethod
+  def format_samples(self, samples):
+    """
+    Renders samples in the Prometheus text format.
+
+    :type samples: dict[tuple, object]
+
+    :rtype: list[unicode]
+    """
+    raise NotImplementedError('Not implemented in {cls}.'.format(cls=type(self).__name__))
+
+
+class Counter(Metric):
+  """
+  A value that only ever goes up.
+  """
+  type = 'counter'
+
+  def inc(self, labels=(), amount=1):
+    """
+    :type labels: tuple[unicode]
+    :param labels: Label values, in the same order as `labelnames`.
+
+    :type amount: float
+    """
+    shard = self._shard()
+    shard[labels] = shard.get(labels, 0) + amount
+
+  def _combine(self, existing, value):
+    return value if existing is None else existing + value
+
+  def format_samples(self, samples):
+    return [
+      '{name}{labels} {value}'.format(
+        name    = self.name,
+        labels  = _format_labels(self.labelnames, labels),
+        value   = _format_value(value),
+      )
+        for labels, value in sorted(iteritems(samples))
+    ]
+
+
+class Histogram(Metric):
+  """
+  Counts observations in buckets.
+  """
+  type = 'histogram'
+
+  def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+    """
+    :type buckets: tuple[float]
+    :param buckets: Upper bounds of the buckets (not including +Inf).
+    """
+    super(Histogram, self).__init__(name, documentation, labelnames)
+
+    self.buckets = tuple(sorted(buckets))
+
+  def observe(self, value, labels=()):
+    """
+    :type value: float
+
+    :type labels: tuple[unicode]
+    :param labels: Label values, in the same order as `labelnames`.
+    """
+    shard = self._shard()
+
+    try:
+      entry = shard[labels]
+    except KeyError:
+      # One count per bucket (plus +Inf), then sum and count.
+      entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0, 0]
+
+    entry[bisect_left(self.buckets, value)] += 1
+    entry[-2] += value
+    entry[-1] += 1
+
+  def _combine(self, existing, value):
+    return list(value) if existing is None else [a + b for a, b in zip(existing, value)]
+
+  def format_samples(self, samples):
+    lines = []
+
+    for labels, entry in sorted(iteritems(samples)):
+      cumulative = 0
+
+      for upper_bound, count in zip(self.buckets + ('+Inf',), entry):
+        cumulative += count
+
+        lines.append('{name}_bucket{labels} {value}'.format(
+          name    = self.name,
+          labels  = _format_labels(self.labelnames + ('le',), labels + (_format_value(upper_bound),)),
+          value   = cumulative,
+        ))
+
+      lines.append('{name}_sum{labels} {value}'.format(
+        name    = self.name,
+        labels  = _format_labels(self.labelnames, labels),
+        value   = _format_value(entry[-2]),
+      ))
+
+      lines.append('{name}_count{labels} {value}'.format(
+        name    = self.name,
+        labels  = _format_labels(self.labelnames, labels),
+        value   = entry[-1],
+      ))
+
+    return lines
+
+
+class Registry(object):
+  """
+  Collection of metrics that can be exported together.
+
+  In multi-process mode, each process periodically writes a snapshot of its metrics to a shared directory, and the
+    exported values are the sum of all snapshots.  This allows any worker of a pre-fork server to answer a scrape on
+    behalf of all of them.
+  """
+  def __init__(self):
+    super(Registry, self).__init__()
+
+    self.metrics = []
+    """:type: list[Metric]"""
+
+    self.multiprocess_dir = None
+    """:type: unicode"""
+    self.flush_interval   = 10.0
+    """:type: float"""
+
+    self._last_flush  = 0.0
+    self._flush_lock  = threading.Lock()
+
+    # Values recorded before forking (e.g., while warming up) belong to the parent, not to each of its children.
+    if hasattr(os, 'register_at_fork'):
+      os.register_at_fork(after_in_child=self.reset)
+
+  def register(self, metric):
+    """
+    :type metric: Metric
+
+    :rtype: Metric
+    """
+    self.metrics.append(metric)
+    return metric
+
+  def reset(self):
+    """
+    Discards the values recorded by all metrics in this process.
+    """
+    for metric in self.metrics:
+      metric.reset()
+
+    self._last_flush = 0.0
+
+  def configure_multiprocess(self, directory, flush_interval=10.0):
+    """
+    Enables multi-process mode.
+
+    :type directory: unicode
+    :param directory: Directory where each process writes its snapshot.  Must be shared by all worker processes, and
+      should be emptied when the server (re)starts.
+
+    :type flush_interval: float
+    :param flush_interval: Min number of seconds between snapshots.
+    """
+    if not self.multiprocess_dir:
+      atexit.register(self._write_final_snapshot)
+
+    self.multiprocess_dir = directory
+    self.flush_interval   = flush_interval
+
+  def maybe_write_snapshot(self):
+    """
+    Writes this process' snapshot if multi-process mode is on and the flush interval has elapsed.
+    """
+    if self.multiprocess_dir and (time() - self._last_flush) >= self.flush_interval:
+      # If another thread is already on it, don't wait around.
+      if self._flush_lock.acquire(False):
+        try:
+          self.write_snapshot()
+        finally:
+          self._flush_lock.release()
+
+  def write_snapshot(self):
+    """
+    Writes this process' metrics to the multi-process directory.
+    """
+    if not self.multiprocess_dir:
+      return
+
+    snapshot = {
+      metric.name: [[list(labels), value] for labels, value in iteritems(metric.collect())]
+        for metric in self.metrics
+    }
+
+    path  = os.path.join(self.multiprocess_dir, '{pid}.json'.format(pid=os.getpid()))
+    temp  = '{path}.tmp'.format(path=path)
+
+    # Write to a temp file first, so that scrapes never see partial snapshots.
+    with open(temp, 'w', encoding='utf-8') as f:
+      f.write(json.dumps(snapshot))
+    os.rename(temp, path)
+
+    self._last_flush = time()
+
+  def _write_final_snapshot(self):
+    """
+    Writes this process' snapshot on exit.
+    """
+    try:
+      self.write_snapshot()
+    except (IOError, OSError):
+      # The directory may already have been cleaned up (e.g., if the whole server is shutting down).
+      pass
+
+  def collect(self):
+    """
+    Returns the combined samples for each metric.
+
+    :rtype: list[(Metric, dict[tuple, object])]
+    """
+    if not self.multiprocess_dir:
+      return [(metric, metric.collect()) for metric in self.metrics]
+
+    # Make sure this process' values are up-to-date, then read everyone's.
+    self.write_snapshot()
+
+    by_name   = {metric.name: metric for metric in self.metrics}
+    combined  = {metric.name: {} for metric in self.metrics}
+
+    for path in glob(os.path.join(self.multiprocess_dir, '*.json')):
+      try:
+        with open(path, encoding='utf-8') as f:
+          snapshot = json.loads(f.read())
+      except (IOError, OSError, ValueError):
+        # The process may have been removing/replacing its snapshot.
+        continue
+
+      for name, samples in iteritems(snapshot):
+        if name in by_name:
+          by_name[name].merge_into(combined[name], {tuple(labels): value for labels, value in samples})
+
+    return [(metric, combined[metric.name]) for metric in self.metrics]
+
+  def render(self):
+    """
+    Renders all metrics in the Prometheus text exposition format.
+
+    :rtype: unicode
+    """
+    lines = []
+
+    for metric, samples in self.collect():
+      lines.append('# HELP {name} {doc}'.format(name=metric.name, doc=metric.documentation))
+      lines.append('# TYPE {name} {type}'.format(name=metric.name, type=metric.type))
+      lines.extend(metric.format_samples(samples))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _format_labels(names, values):
+  if not names:
+    return ''
+
+  return '{' + ','.join(
+    '{name}="{value}"'.format(
+      name  = name,
+      value = '{0}'.format(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'),
+    )
+      for name, value in zip(names, values)
+  ) + '}'
+
+
+def _format_value(value):
+  if isinstance(value, float):
+    return repr(value)
+  return '{0}'.format(value)
+
+
+REGISTRY = Registry()
+
+operation_duration = REGISTRY.register(Histogram(
+  'api_operation_duration_seconds',
+  'Time spent in value object and session operations.',
+  ('operation',),
+  DURATION_BUCKETS,
+))
+
+operation_payload = REGISTRY.register(Histogram(
+  'api_operation_payload_bytes',
+  'Size of the data processed by value object and session operations (JSON bytes).',
+  ('operation',),
+  SIZE_BUCKETS,
+))
+
+fragment_cache_requests = REGISTRY.register(Counter(
+  'api_fragment_cache_requests_total',
+  'Template fragment cache lookups.',
+  ('result',),
+))
+
+session_save_conflicts = REGISTRY.register(Counter(
+  'api_session_save_conflicts_total',
+  'Session saves that conflicted with a concurrent write (merged:  retried after merging; failed:  gave up).',
+  ('result',),
+))
+
+session_write_behind = REGISTRY.register(Counter(
+  'api_session_write_behind_total',
+  'Session saves absorbed by the write-behind buffer (buffered), and buffered sessions flushed (written) or discarded '
+  'after conflicts (failed).',
+  ('result',),
+))
+
+
+def record_operation(name, elapsed, size):
+  """
+  Instrumentation listener that feeds the operation metrics.
+
+  :see: api.instrumentation.add_listener
+  """
+  operation_duration.observe(elapsed, (name,))
+
+  if size is not None:
+    operation_payload.observe(size, (name,))
+
+
+def enable():
+  """
+  Starts collecting value object and session metrics.
+  """
+  instrumentation.add_listener(record_operation)
+  instrumentation.enable()
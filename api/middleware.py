@@ -0,0 +1,198 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import logging
+from random import random
+from time import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from api import allocations, instrumentation, metrics
+from api.capture import get_writer, hash_session_key, scrub
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCaptureMiddleware(object):
+  """
+  Samples requests and appends them to a JSONL log, in the format that `manage.py replay_requests` expects.
+
+  Configured via `settings.REQUEST_CAPTURE`; the middleware disables itself if no log path is configured.  Only requests
+    to the configured paths (exact matches) are captured.
+
+  :see: api.benchmarks.replay.load_flows
+  """
+  def __init__(self):
+    config = getattr(settings, 'REQUEST_CAPTURE', None) or {}
+
+    if not (config.get('LOG_PATH') and config.get('SAMPLE_RATE')):
+      raise MiddlewareNotUsed()
+
+    self.sample_rate  = float(config['SAMPLE_RATE'])
+    self.paths        = frozenset(config.get('PATHS') or ())
+    self.scrub_rules  = config.get('SCRUB_RULES') or {}
+    self.default_rule = config.get('DEFAULT_SCRUB_RULE', 'mask')
+
+    self.writer = get_writer(
+      config['LOG_PATH'],
+      queue_size      = config.get('QUEUE_SIZE', 10000),
+      batch_size      = config.get('BATCH_SIZE', 100),
+      flush_interval  = config.get('FLUSH_INTERVAL', 1.0),
+    )
+
+  def process_request(self, request):
+    # Paths must match exactly:  capturing reads `request.POST`, which would consume the body of endpoints that stream
+    #   it (e.g., `/applicant/bulk`).
+    if self.paths and request.path not in self.paths:
+      return None
+
+    if random() < self.sample_rate:
+      request._capture_started = time()
+
+    return None
+
+  def process_response(self, request, response):
+    started = getattr(request, '_capture_started', None)
+
+    if started is not None:
+      duration  = time() - started
+      params    = request.POST if request.method == 'POST' else request.GET
+
+      # If a new session was created for this request, it will have been saved by now.
+      session     = getattr(request, 'session', None)
+      session_key = session.session_key if session is not None else None
+
+      # Everything except scrubbing happens in the writer's thread.
+      self.writer.submit({
+        'time':     round(started, 3),
+        'method':   request.method,
+        'path':     request.path,
+        'data':     scrub(dict(params.lists()), self.scrub_rules, self.default_rule),
+        'session':  hash_session_key(session_key or request.COOKIES.get(settings.SESSION_COOKIE_NAME)),
+        'status':   response.status_code,
+        'duration': round(duration * 1000, 3),
+      })
+
+    return response
+
+
+class InstrumentationMiddleware(object):
+  """
+  Collects timing stats for value object and session operations during each request.
+
+  Enabled via `settings.INSTRUMENTATION_ENABLED`.  When `DEBUG` is on, the per-request summary is also added to the
+    response as an `X-Instrumentation` header.
+
+  :see: api.instrumentation
+  """
+  HEADER = 'X-Instrumentation'
+
+  def __init__(self):
+    if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+      raise MiddlewareNotUsed()
+
+    instrumentation.enable()
+
+  def process_request(self, request):
+    instrumentation.start_request(request)
+    return None
+
+  def process_response(self, request, response):
+    stats = instrumentation.finish_request(request)
+
+    if settings.DEBUG and stats:
+      response[self.HEADER] = ', '.join(
+        '{name}={calls};{time:.3f}ms;{bytes}B'.format(
+          name  = name,
+          calls = entry['calls'],
+          time  = entry['time'] * 1000,
+          bytes = entry['bytes'],
+        )
+          for name, entry in sorted(stats.items())
+      )
+
+    return response
+
+
+class MetricsMiddleware(object):
+  """
+  Collects metrics for the `/metrics` endpoint.
+
+  Enabled via `settings.METRICS_ENABLED`.  For pre-fork servers, set `settings.METRICS_MULTIPROCESS_DIR` so that each
+    worker periodically publishes its metrics for the others to include in their scrapes.
+
+  :see: api.metrics
+  """
+  def __init__(self):
+    if not getattr(settings, 'METRICS_ENABLED', False):
+      raise MiddlewareNotUsed()
+
+    metrics.enable()
+
+    directory = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+    if directory:
+      metrics.REGISTRY.configure_multiprocess(directory, getattr(settings, 'METRICS_FLUSH_INTERVAL', 10.0))
+
+  def process_response(self, request, response):
+    metrics.REGISTRY.maybe_write_snapshot()
+    return response
+
+
+class AllocationProfilingMiddleware(object):
+  """
+  Samples requests and reports the memory allocated while handling them, grouped by code site, value object field type
+    and value object operation.
+
+  Configured via `settings.ALLOCATION_PROFILING`; the middleware disables itself if the sample rate is 0 (or if
+    tracemalloc is not available).  Reports are appended to a JSONL file if `LOG_PATH` is set, or logged otherwise.
+
+  :see: api.allocations.AllocationProfile
+  """
+  def __init__(self):
+    config = getattr(settings, 'ALLOCATION_PROFILING', None) or {}
+
+    if not config.get('SAMPLE_RATE') or allocations.tracemalloc is None:
+      raise MiddlewareNotUsed()
+
+    self.sample_rate  = float(config['SAMPLE_RATE'])
+    self.paths        = tuple(config.get('PATHS') or ())
+    self.frames       = config.get('FRAMES', 10)
+    self.top          = config.get('TOP', 10)
+
+    self.writer = get_writer(config['LOG_PATH']) if config.get('LOG_PATH') else None
+
+    # Value object operations are only recorded while instrumentation is enabled.
+    instrumentation.enable()
+
+  def process_request(self, request):
+    if self.paths and not request.path.startswith(self.paths):
+      return None
+
+    if random() < self.sample_rate:
+      profile = allocations.AllocationProfile(
+        label   = '{0} {1}'.format(request.method, request.path),
+        frames  = self.frames,
+        top     = self.top,
+      )
+
+      request._allocation_profile = profile.__enter__()
+
+    return None
+
+  def process_response(self, request, response):
+    profile = getattr(request, '_allocation_profile', None)
+
+    if profile is not None:
+      request._allocation_profile = None
+      profile.__exit__(None, None, None)
+
+      report = dict(profile.report, time=round(time(), 3), status=response.status_code)
+
+      if self.writer is not None:
+        self.writer.submit(report)
+      else:
+        logger.info('Allocations: %s', json.dumps(report, sort_keys=True))
+
+    return response
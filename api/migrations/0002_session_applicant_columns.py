@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+from django.utils.dateparse import parse_date
+
+
+# Frozen copy of `api.models.get_applicant_columns` as of this migration, so that later changes to the normalization
+#   don't change what this migration does (later changes need their own migration).
+def get_applicant_columns(session_data):
+    applicant = (session_data or {}).get('applicant') or {}
+
+    birthday = applicant.get('birthday')
+    if not isinstance(birthday, date):
+        try:
+            birthday = parse_date(birthday or '')
+        except (TypeError, ValueError):
+            birthday = None
+
+    return {
+        'applicant_email':      normalize_text(applicant.get('email')),
+        'applicant_last_name':  normalize_text(applicant.get('last_name')),
+        'applicant_birthday':   birthday,
+    }
+
+
+def normalize_text(value):
+    return (value or '').strip().lower() or None
+
+
+def backfill_applicant_columns(apps, schema_editor):
+    """
+    Populates the applicant columns for existing sessions, in batches.
+
+    Each batch is written with a single UPDATE (one CASE per column).  Batches are kept small enough to stay under
+        SQLite's limit of 999 query parameters.
+    """
+    Session     = apps.get_model('api', 'Session')
+    sessions    = Session.objects.using(schema_editor.connection.alias)
+    batch_size  = 100
+    last_key    = None
+
+    output_fields = {
+        name: Session._meta.get_field(name)
+            for name in ('applicant_email', 'applicant_last_name', 'applicant_birthday')
+    }
+
+    while True:
+        batch = sessions.order_by('session_key').only('session_key', 'session_data')
+        if last_key is not None:
+            batch = batch.filter(session_key__gt=last_key)
+
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+
+        columns = [(session.session_key, get_applicant_columns(session.session_data)) for session in batch]
+
+        sessions.filter(session_key__in=[key for key, _ in columns]).update(**{
+            name: Case(
+                *[When(session_key=key, then=Value(values[name], output_field=field)) for key, values in columns],
+                output_field = field
+            )
+                for name, field in output_fields.items()
+        })
+
+        last_key = batch[-1].session_key
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='applicant_birthday',
+            field=models.DateField(null=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='applicant_email',
+            field=models.CharField(max_length=254, null=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='applicant_last_name',
+            field=models.CharField(max_length=255, null=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_applicant_columns, migrations.RunPython.noop),
+    ]
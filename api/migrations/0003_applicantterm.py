@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_session_applicant_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicantTerm',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('field', models.CharField(max_length=20)),
+                ('kind', models.CharField(max_length=1, choices=[('p', 'Prefix'), ('t', 'Trigram')])),
+                ('term', models.CharField(max_length=255, db_index=True)),
+                ('session', models.ForeignKey(related_name='applicant_terms', to='api.Session')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_session_version'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='applicantterm',
+            index_together=set([('kind', 'term')]),
+        ),
+        migrations.AlterField(
+            model_name='applicantterm',
+            name='term',
+            field=models.CharField(max_length=255),
+        ),
+    ]
@@ -1,18 +1,111 @@
 # coding=utf-8
 from __future__ import absolute_import, unicode_literals
 
+from datetime import date
 from uuid import uuid4
 
 from json_field import JSONField
 from django.db import models
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
 
 from api.value_objects import ApplicantObject
 
 
+def get_applicant_columns(session_data):
+  """
+  Extracts the values of the indexed applicant columns from session data.
+
+  Values are normalized (e.g., email addresses are lowercased) so that lookups can use the indexes; use the same
+    normalization for search terms.
+
+  :type session_data: dict|None
+
+  :rtype: dict
+  """
+  applicant = (session_data or {}).get('applicant') or {}
+
+  birthday = applicant.get('birthday')
+  if not isinstance(birthday, date):
+    try:
+      birthday = parse_date(birthday or '')
+    except (TypeError, ValueError):
+      birthday = None
+
+  return {
+    'applicant_email':      normalize_text(applicant.get('email')),
+    'applicant_last_name':  normalize_text(applicant.get('last_name')),
+    'applicant_birthday':   birthday,
+  }
+
+
+def normalize_text(value):
+  """
+  Normalizes a text value for indexed lookups.
+
+  :type value: unicode|None
+
+  :rtype: unicode|None
+  """
+  return (value or '').strip().lower() or None
+
+
+class SessionQuerySet(models.QuerySet):
+  def filter_applicant(self, email=None, last_name=None, birthday=None, last_name_prefix=False):
+    """
+    Finds sessions by applicant values, using the indexed applicant columns.
+
+    :type email: unicode
+    :type last_name: unicode
+    :type birthday: datetime.date
+
+    :type last_name_prefix: bool
+    :param last_name_prefix: Whether to match last names that start with `last_name`.
+
+    :rtype: SessionQuerySet
+    """
+    filters = {}
+
+    if email:
+      filters['applicant_email'] = normalize_text(email)
+
+    if last_name:
+      filters['applicant_last_name__startswith' if last_name_prefix else 'applicant_last_name'] = \
+        normalize_text(last_name)
+
+    if birthday:
+      filters['applicant_birthday'] = birthday
+
+    return self.filter(**filters)
+
+
 class Session(models.Model):
   session_key = models.UUIDField(primary_key=True, default=uuid4)
   session_data = JSONField()
 
+  # Copies of selected applicant values, so that sessions can be looked up without scanning `session_data`.
+  # These are kept in sync whenever the session is saved.
+  # :see: get_applicant_columns
+  applicant_email = models.CharField(max_length=254, null=True, db_index=True)
+  applicant_last_name = models.CharField(max_length=255, null=True, db_index=True)
+  applicant_birthday = models.DateField(null=True, db_index=True)
+
+  APPLICANT_COLUMNS = ('applicant_email', 'applicant_last_name', 'applicant_birthday')
+
+  # Incremented every time the session is written, so that concurrent writes can be detected without locking the row.
+  # :see: api.sessions.backends.custom_db.SessionStore.save
+  version = models.PositiveIntegerField(default=0)
+
+  objects = SessionQuerySet.as_manager()
+
+  def sync_applicant_columns(self):
+    """
+    Updates the indexed applicant columns from the session data.
+    """
+    for column, value in get_applicant_columns(self.session_data).items():
+      setattr(self, column, value)
+
   @property
   def applicant_vo(self):
     """
@@ -32,3 +125,39 @@ class Session(models.Model):
     :type applicant: ApplicantObject
     """
     self.session_data['applicant'] = applicant.dehydrate()
+    self.sync_applicant_columns()
+
+
+class ApplicantTerm(models.Model):
+  """
+  Search index entry for a session's applicant.
+
+  Each session has one "prefix" term per indexed value (the normalized value itself, for prefix matching) and one
+    "trigram" term per distinct trigram of each value (for fuzzy matching).
+
+  :see: api.search
+  """
+  PREFIX  = 'p'
+  TRIGRAM = 't'
+
+  session = models.ForeignKey(Session, related_name='applicant_terms', on_delete=models.CASCADE)
+  field = models.CharField(max_length=20)
+  kind = models.CharField(max_length=1, choices=((PREFIX, 'Prefix'), (TRIGRAM, 'Trigram')))
+  term = models.CharField(max_length=255)
+
+  class Meta:
+    # Every search filters by kind, then by term.
+    index_together = (('kind', 'term'),)
+
+
+@receiver(pre_save, sender=Session)
+def sync_applicant_columns(sender, instance, **kwargs):
+  """
+  Keeps the indexed applicant columns in sync with the session data whenever a session is saved (in the same query,
+    hence the same transaction).
+
+  Note:  If `update_fields` is provided, it must include `Session.APPLICANT_COLUMNS` for the columns to be saved.
+
+  :type instance: Session
+  """
+  instance.sync_applicant_columns()
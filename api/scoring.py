@@ -0,0 +1,202 @@
+# coding=utf-8
+"""
+Evaluates eligibility rules for many applicants at once.
+
+Applicants are converted to columns (one array per value, instead of one object per applicant), and each rule is a
+vectorized expression over those columns.  With numpy, dates are `datetime64[D]` arrays and choices are integer codes;
+without numpy, the same rules are evaluated over plain lists (correct, but much slower).
+"""
+from __future__ import absolute_import, division, unicode_literals
+
+from datetime import date
+
+from api.value_objects import ApplicantObject
+
+try:
+  import numpy
+except ImportError:
+  # numpy is required (see requirements.txt), but rules can still be evaluated over lists without it.
+  numpy = None
+
+
+REQUIRED_FIELDS = ('first_name', 'last_name', 'gender', 'birthday', 'email')
+"""Fields that must be filled in for an application to be complete."""
+
+MIN_AGE = 18
+"""Applicants must be at least this old (in years) to be eligible."""
+
+WEIGHTS = (
+  ('completeness',  50),
+  ('eligible',      50),
+)
+"""Contribution of each rule to the score (out of 100)."""
+
+
+class ApplicantColumns(object):
+  """
+  Applicant values stored by column.
+  """
+  def __init__(self, session_keys, birthday, gender, present):
+    """
+    :type session_keys: list[unicode]
+
+    :type birthday: numpy.ndarray|list[datetime.date|None]
+    :param birthday: `datetime64[D]` array (NaT if unknown), or list of dates.
+
+    :type gender: numpy.ndarray|list[int]
+    :param gender: Index of each value in the gender field's choices (-1 if unknown).
+
+    :type present: dict[unicode, numpy.ndarray|list[bool]]
+    :param present: Whether each required field is filled in.
+    """
+    super(ApplicantColumns, self).__init__()
+
+    self.session_keys = session_keys
+    self.birthday     = birthday
+    self.gender       = gender
+    self.present      = present
+
+  def __len__(self):
+    return len(self.session_keys)
+
+  @classmethod
+  def from_applicants(cls, applicants):
+    """
+    :type applicants: collections.Iterable[(uuid.UUID|unicode, ApplicantObject)]
+    :param applicants: (session key, applicant) pairs.
+
+    :rtype: ApplicantColumns
+    """
+    codes = {code: i for i, (code, _) in enumerate(ApplicantObject.fields['gender'].choices)}
+
+    session_keys  = []
+    birthday      = []
+    gender        = []
+    present       = {field: [] for field in REQUIRED_FIELDS}
+
+    for session_key, applicant in applicants:
+      session_keys.append(getattr(session_key, 'hex', session_key))
+      birthday.append(applicant.birthday)
+      gender.append(codes.get(applicant.gender, -1))
+
+      for field in REQUIRED_FIELDS:
+        present[field].append(getattr(applicant, field) not in (None, ''))
+
+    if numpy is not None:
+      # `None` becomes NaT.
+      birthday  = numpy.array(birthday, dtype='datetime64[D]')
+      gender    = numpy.array(gender, dtype=numpy.int8)
+      present   = {field: numpy.array(values, dtype=bool) for field, values in present.items()}
+
+    return cls(session_keys, birthday, gender, present)
+
+
+def get_age(columns, as_of):
+  """
+  Returns each applicant's age in whole years (-1 if the birthday is unknown).
+
+  :type columns: ApplicantColumns
+  :type as_of: datetime.date
+
+  :rtype: numpy.ndarray|list[int]
+  """
+  if numpy is None:
+    return [
+      -1 if birthday is None else
+        as_of.year - birthday.year - ((as_of.month, as_of.day) < (birthday.month, birthday.day))
+          for birthday in columns.birthday
+    ]
+
+  birthday  = columns.birthday
+  known     = ~numpy.isnat(birthday)
+
+  years   = birthday.astype('datetime64[Y]').astype(numpy.int64) + 1970
+  months  = birthday.astype('datetime64[M]').astype(numpy.int64) % 12 + 1
+  days    = (birthday - birthday.astype('datetime64[M]')).astype(numpy.int64) + 1
+
+  before_birthday = (months > as_of.month) | ((months == as_of.month) & (days > as_of.day))
+  age             = as_of.year - years - before_birthday
+
+  return numpy.where(known, age, -1)
+
+
+def get_completeness(columns):
+  """
+  Returns the fraction of required fields that each applicant has filled in.
+
+  :type columns: ApplicantColumns
+
+  :rtype: numpy.ndarray|list[float]
+  """
+  flags = [columns.present[field] for field in REQUIRED_FIELDS]
+
+  if numpy is None:
+    return [sum(values) / len(REQUIRED_FIELDS) for values in zip(*flags)]
+
+  return numpy.sum(flags, axis=0, dtype=numpy.float64) / len(REQUIRED_FIELDS)
+
+
+def get_eligible(age, completeness):
+  """
+  Returns whether each applicant is eligible:  old enough, and with a complete application.
+
+  :type age: numpy.ndarray|list[int]
+  :type completeness: numpy.ndarray|list[float]
+
+  :rtype: numpy.ndarray|list[bool]
+  """
+  if numpy is None:
+    return [(a >= MIN_AGE) and (c == 1) for a, c in zip(age, completeness)]
+
+  return (age >= MIN_AGE) & (completeness == 1)
+
+
+def score(columns, as_of=None):
+  """
+  Evaluates the rules for every applicant.
+
+  :type columns: ApplicantColumns
+
+  :type as_of: datetime.date
+  :param as_of: Date to compute ages at (defaults to today).
+
+  :rtype: dict
+  :return: One column per rule (`age`, `completeness`, `eligible`), plus `score` (0-100) and `session_key`.
+  """
+  age           = get_age(columns, as_of or date.today())
+  completeness  = get_completeness(columns)
+  eligible      = get_eligible(age, completeness)
+
+  results = {
+    'session_key':  columns.session_keys,
+    'age':          age,
+    'completeness': completeness,
+    'eligible':     eligible,
+  }
+
+  if numpy is None:
+    results['score'] = [
+      sum(weight * float(results[rule][i]) for rule, weight in WEIGHTS)
+        for i in range(len(columns))
+    ]
+  else:
+    results['score'] = numpy.zeros(len(columns))
+    for rule, weight in WEIGHTS:
+      results['score'] += weight * results[rule]
+
+  return results
+
+
+def iter_rows(results):
+  """
+  Converts column-wise results (from `score`) to one dict per session, with plain Python values.
+
+  :type results: dict
+
+  :rtype: collections.Iterator[dict]
+  """
+  columns = sorted(results)
+  values  = [results[column].tolist() if hasattr(results[column], 'tolist') else results[column] for column in columns]
+
+  for row in zip(*values):
+    yield dict(zip(columns, row))
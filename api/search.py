@@ -0,0 +1,237 @@
+# coding=utf-8
+"""
+Prefix and fuzzy search over applicants, using the `ApplicantTerm` index instead of scanning session data.
+
+The index is updated whenever a session's applicant values change (see `SessionStore.save` and `ApplicantIngest`), and
+can be rebuilt with `manage.py rebuild_applicant_index`.
+"""
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+from math import ceil
+
+from django.db import router
+from django.db.models import Count
+from django.utils.crypto import salted_hmac
+
+from api.models import ApplicantTerm, Session, normalize_text
+from api.value_objects import ApplicantObject
+
+INDEXED_FIELDS = ('first_name', 'last_name', 'email')
+"""Applicant fields that are indexed."""
+
+MAX_PAGE_SIZE = 100
+
+MIN_SIMILARITY = 0.5
+"""Fraction of the query's trigrams that a value must contain to be a fuzzy match."""
+
+MAX_FUZZY_TERMS = 10000
+"""Max number of index terms that are scored for a fuzzy search (see `_select_trigrams`)."""
+
+
+def trigrams(value):
+  """
+  Returns the trigrams of a (normalized) value, padded the same way as PostgreSQL's pg_trgm.
+
+  :type value: unicode
+
+  :rtype: set[unicode]
+  """
+  padded = '  {0} '.format(value)
+  return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def get_terms(applicant):
+  """
+  Returns the index terms for an applicant.
+
+  :type applicant: dict|None
+  :param applicant: Dehydrated applicant values.
+
+  :rtype: list[(unicode, unicode, unicode)]
+  :return: (field, kind, term) tuples.
+  """
+  applicant = applicant or {}
+  values    = {field: normalize_text(applicant.get(field)) for field in INDEXED_FIELDS}
+
+  # Also index the full name, so that e.g. "marcus bro" matches.
+  if values['first_name'] and values['last_name']:
+    values['name'] = '{0} {1}'.format(values['first_name'], values['last_name'])
+
+  terms       = []
+  max_length  = ApplicantTerm._meta.get_field('term').max_length
+
+  for field, value in sorted(values.items()):
+    if not value:
+      continue
+
+    terms.append((field, ApplicantTerm.PREFIX, value[:max_length]))
+    terms.extend((field, ApplicantTerm.TRIGRAM, gram) for gram in sorted(trigrams(value)))
+
+  return terms
+
+
+def index_sessions(applicants, using=None, created=False):
+  """
+  Replaces the index terms for sessions.
+
+  Should be called in the same transaction that saves the sessions.
+
+  :type applicants: dict[uuid.UUID|unicode, dict|None]
+  :param applicants: Dehydrated applicant values, keyed by session key.
+
+  :type using: unicode
+
+  :type created: bool
+  :param created: Whether the sessions were just created (so they can't have any index terms yet).
+  """
+  if not applicants:
+    return
+
+  using = using or router.db_for_write(ApplicantTerm)
+  terms = ApplicantTerm.objects.using(using)
+
+  if not created:
+    terms.filter(session_id__in=list(applicants)).delete()
+
+  new_terms = [
+    ApplicantTerm(session_id=session_key, field=field, kind=kind, term=term)
+      for session_key, applicant in applicants.items()
+      for field, kind, term in get_terms(applicant)
+  ]
+
+  if new_terms:
+    terms.bulk_create(new_terms)
+
+
+def search(query, fuzzy=False, page=1, page_size=20):
+  """
+  Finds applicants whose name or email matches a query.
+
+  :type query: unicode
+
+  :type fuzzy: bool
+  :param fuzzy: Whether to match values that are similar to the query (e.g., misspelled), instead of values that
+    start with it.
+
+  :type page: int
+  :param page: 1-based.
+
+  :type page_size: int
+
+  :rtype: dict
+  :return:
+    - results:    List of {id, score, applicant (public values)}, best matches first.  `id` identifies the session
+                    (see `get_result_id`) without exposing its key.
+    - page:       Current page.
+    - next_page:  Next page, or None if this is the last one.
+  """
+  query     = normalize_text(query)
+  page      = max(int(page), 1)
+  page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+
+  if not query:
+    return {'results': [], 'page': page, 'next_page': None}
+
+  if fuzzy:
+    grams   = _select_trigrams(trigrams(query))
+    terms   = ApplicantTerm.objects.filter(kind=ApplicantTerm.TRIGRAM, term__in=grams)
+    # Score is the number of distinct query trigrams that each session matched (in any field).
+    matches = terms.values('session').annotate(score=Count('term', distinct=True)) \
+      .filter(score__gte=int(ceil(len(grams) * MIN_SIMILARITY)))
+  else:
+    terms   = ApplicantTerm.objects.filter(kind=ApplicantTerm.PREFIX, term__startswith=query)
+    # Score is the number of fields that matched.
+    matches = terms.values('session').annotate(score=Count('field', distinct=True))
+
+  # Fetch one extra row to find out whether there is another page.
+  offset  = (page - 1) * page_size
+  rows    = list(matches.order_by('-score', 'session')[offset:offset + page_size + 1])
+
+  has_next  = len(rows) > page_size
+  rows      = rows[:page_size]
+
+  return {
+    'results':    _project(rows),
+    'page':       page,
+    'next_page':  (page + 1) if has_next else None,
+  }
+
+
+def get_result_id(session_key):
+  """
+  Returns the opaque ID that identifies a session in search results.
+
+  Session keys are credentials (anyone who has one can use the session), so they must never be exposed in results.
+
+  :type session_key: uuid.UUID
+
+  :rtype: unicode
+  """
+  return salted_hmac('api.search.result', session_key.hex).hexdigest()
+
+
+def _select_trigrams(grams):
+  """
+  Picks the query trigrams to score a fuzzy search with, so that at most `MAX_FUZZY_TERMS` index terms are scored.
+
+  Very common trigrams (e.g., the one for names starting with "m") can match a large part of the index; those are
+    dropped first, since they are also the least selective.  The rarest trigram is always kept, even if it is more
+    common than that.
+
+  :type grams: set[unicode]
+
+  :rtype: list[unicode]
+  """
+  counts = dict(
+    ApplicantTerm.objects.filter(kind=ApplicantTerm.TRIGRAM, term__in=sorted(grams))
+      .values_list('term')
+      .annotate(count=Count('id'))
+  )
+
+  selected  = []
+  total     = 0
+
+  for gram in sorted(grams, key=lambda g: (counts.get(g, 0), g)):
+    total += counts.get(gram, 0)
+
+    if selected and total > MAX_FUZZY_TERMS:
+      break
+
+    selected.append(gram)
+
+  return selected
+
+
+def _project(rows):
+  """
+  Loads the public applicant values for search results.
+
+  :type rows: list[dict]
+
+  :rtype: list[dict]
+  """
+  keys = [row['session'] for row in rows]
+
+  # Read the raw JSON so that only the applicant values are hydrated (the lazy `session_data` decoder would also turn
+  #   date strings into dates, which `hydrate` can't handle).
+  raw_data = dict(Session.objects.filter(session_key__in=keys).values_list('session_key', 'session_data'))
+
+  results = []
+
+  for row in rows:
+    raw = raw_data.get(row['session'])
+    if raw is None:
+      # The session was deleted in the meantime.
+      continue
+
+    # Session data is small enough that `json.loads` is faster than the single-pass decoder (`hydrate_json`).
+    applicant = ApplicantObject.hydrate((json.loads(raw) or {}).get('applicant') or {})
+
+    results.append({
+      'id':           get_result_id(row['session']),
+      'score':        row['score'],
+      'applicant':    applicant.get_public_values(),
+    })
+
+  return results
@@ -1,16 +1,34 @@
 # coding=utf-8
 from __future__ import absolute_import, unicode_literals
 
-from uuid import uuid4
+import json
+from copy import deepcopy
+from hashlib import sha1
+from uuid import UUID, uuid4
 
+from django.conf import settings
 from django.contrib.sessions.backends.base import CreateError
 from django.contrib.sessions.backends.db import SessionStore as DjangoSessionStore
-from django.db import router, IntegrityError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction, IntegrityError
+from django.db.models import F
 from django.db.transaction import savepoint, savepoint_rollback, savepoint_commit
 
-from api.models import Session
+from api.instrumentation import instrumented, json_size, result_size
+from api.metrics import session_save_conflicts
+from api.models import Session, get_applicant_columns
+from api.search import index_sessions
+from api.sessions.write_behind import get_buffer
 from api.value_objects import ApplicantObject
 
+_MISSING = object()
+
+
+class SessionConflict(Exception):
+    """
+    Raised when a session could not be saved because it kept being written to concurrently.
+    """
+
 
 class SessionStore(DjangoSessionStore):
     """
@@ -29,6 +47,84 @@ class SessionStore(DjangoSessionStore):
         self._exists = None
         """:type: bool"""
 
+        # Digest of the session data as it was loaded from the database, so that we can tell whether it has actually
+        #   changed (as opposed to just being marked as modified).
+        self._loaded_digest = None
+        """:type: unicode"""
+
+        # Version and values of the session as it was loaded from the database, so that concurrent writes can be
+        #   detected (and merged) without locking the row.  The values are a deep copy, so that nested values changed
+        #   in place are still seen as changed.
+        # :see: save
+        self._loaded_version = None
+        """:type: int"""
+        self._loaded_data = None
+        """:type: dict"""
+
+        # Applicants merged in by `update_applicant_vo` since the session was loaded, so that the merges can be
+        #   replayed on top of a concurrent write.
+        self._applicant_updates = []
+        """:type: list[ApplicantObject]"""
+
+        # Digest of the applicant values that the search index currently has for this session.
+        # :see: api.search
+        self._indexed_applicant_digest = None
+        """:type: unicode"""
+
+        # Number of DB queries this instance has performed.
+        self.db_queries = 0
+        """:type: int"""
+
+    @property
+    def touched_db(self):
+        """
+        Returns whether this session store has queried the database.
+
+        :rtype: bool
+        """
+        return self.db_queries > 0
+
+    @staticmethod
+    def is_valid_session_key(session_key):
+        """
+        Returns whether a session key is well-formed, i.e., whether it is worth looking up in the database.
+
+        :type session_key: unicode
+
+        :rtype: bool
+        """
+        try:
+            UUID(session_key)
+        except (AttributeError, TypeError, ValueError):
+            return False
+        else:
+            return True
+
+    def has_changes(self):
+        """
+        Returns whether the session data differs from what is stored in the database.
+
+        Unlike `modified`, this will return False if the session was written to, but its values didn't actually change
+            (e.g., the user submitted the same applicant details twice).
+
+        :rtype: bool
+        """
+        if not self.modified:
+            return False
+
+        try:
+            data = self._session_cache
+        except AttributeError:
+            # Session data never got loaded, so it can't have changed.
+            return False
+
+        if self._loaded_digest is None:
+            # We don't know what's in the database (if anything), so assume the worst unless the session is known not
+            #   to exist.
+            return bool(data) or (self.session_key is not None and self._exists is not False)
+
+        return self._digest(data) != self._loaded_digest
+
     def get_applicant_vo(self):
         """
         Returns a value object representation of the applicant.
@@ -40,33 +136,76 @@ class SessionStore(DjangoSessionStore):
         """
         return ApplicantObject.hydrate(self.get('applicant') or {})
 
+    def get_applicant_digest(self):
+        """
+        Returns a digest of the applicant data stored in the session, without hydrating it.
+
+        The digest changes whenever the stored applicant values change, so it can be used to key cached renderings of
+            the applicant.
+
+        :rtype: unicode
+        """
+        return self._digest(self.get('applicant'))
+
     def set_applicant_vo(self, applicant):
         """
         Stores applicant values in the session.
 
+        If the session is written to concurrently, these values replace the ones written by the other request.
+
         :type applicant: ApplicantObject
         """
-        self['applicant'] = applicant.dehydrate()
+        self['applicant']       = applicant.dehydrate()
+        self._applicant_updates = []
 
     def update_applicant_vo(self, applicant):
         """
         Hydrates the ApplicantObject stored in the session, updates its attributes from another ApplicantObject and
             stores the modified values back in the session.
 
+        If the session is written to concurrently, the update is applied to the values written by the other request.
+
         :type applicant: ApplicantObject
         """
         existing = self.get_applicant_vo()
         existing.update(applicant)
         self.set_applicant_vo(existing)
 
+        self._applicant_updates.append(applicant)
+
+    @instrumented('load', size=result_size)
     def load(self):
+        if not self.is_valid_session_key(self.session_key):
+            # Malformed keys can't possibly exist, so don't bother asking the DB.
+            self._session_key   = None
+            self._exists        = False
+            return {}
+
+        buffer  = get_buffer()
+        pending = buffer.get(self.session_key) if buffer is not None else None
+
+        if pending is not None:
+            # Changes made by earlier requests that haven't been written yet.
+            self._exists                    = True
+            self._loaded_version            = pending.loaded_version
+            self._loaded_data               = deepcopy(pending.data)
+            self._loaded_digest             = self._digest(pending.data)
+            self._indexed_applicant_digest  = pending.indexed_digest
+            return deepcopy(pending.data)
+
+        self.db_queries += 1
+
         try:
             session_obj = self.session_class.objects.get(session_key=self.session_key)
         except self.session_class.DoesNotExist:
             self._exists = False
             return {}
         else:
-            self._exists = True
+            self._exists                    = True
+            self._loaded_version            = session_obj.version
+            self._loaded_data               = deepcopy(session_obj.session_data)
+            self._loaded_digest             = self._digest(session_obj.session_data)
+            self._indexed_applicant_digest  = self._digest(session_obj.session_data.get('applicant'))
             return session_obj.session_data
 
     def exists(self, session_key=None):
@@ -83,29 +222,114 @@ class SessionStore(DjangoSessionStore):
         else:
             return self._check_exists(session_key)
 
+    @instrumented('save', size=lambda args, kwargs, result: json_size(getattr(args[0], '_session_cache', None)))
     def save(self, must_create=False):
-        obj = self.session_class(
-            session_data        = self._get_session(no_load=must_create),
-            session_key         = self._get_or_create_session_key(),
-        )
+        """
+        Saves the session.
 
-        using   = router.db_for_write(self.session_class, instance=obj)
-        sid     = savepoint(using=using)
+        If write-behind is enabled (`settings.SESSION_WRITE_BEHIND`), changes to existing sessions are buffered and
+            written later (see `api.sessions.write_behind`); new sessions are always written straight away.
 
-        try:
-            obj.save(force_insert=must_create, using=using)
-        except IntegrityError:
-            savepoint_rollback(sid, using=using)
+        :see: write_through
+        """
+        # Loading the session tells us whether it exists (and which version to expect).
+        self._get_session(no_load=must_create)
 
-            if must_create:
-                raise CreateError()
-            raise
+        buffer = get_buffer()
+
+        if buffer is not None and not must_create and self._exists and (self._loaded_version is not None):
+            self._saved(buffer.add(self))
         else:
-            savepoint_commit(sid, using=using)
+            self.write_through(must_create)
+
+    def write_through(self, must_create=False, recreate=True):
+        """
+        Writes the session to the database.
+
+        Sessions are not locked while they are in use.  Instead, the session is only updated if its version is still
+            the one that was loaded; if another request wrote to the session in the meantime, the session is re-loaded,
+            the changes made by this request are merged into it (see `_merge`), and the save is retried, up to
+            `settings.SESSION_SAVE_MAX_RETRIES` times.
+
+        :type recreate: bool
+        :param recreate: Whether to recreate the session if it was deleted in the meantime.  If False, the changes are
+            dropped instead.
+
+        :rtype: bool
+        :return: Whether the session was written (only False if it was deleted and `recreate` is False).
 
-            self._exists    = True
-            self.accessed   = True
-            self.modified   = False
+        :raise SessionConflict: if the session was still being written to concurrently after the last retry.
+        """
+        data = self._get_session(no_load=must_create)
+
+        # If we already know that the session doesn't exist, skip straight to the INSERT (otherwise Django will try an
+        #   UPDATE first).
+        force_insert = must_create or (self._session_key is None) or (self._exists is False)
+
+        session_key = self._get_or_create_session_key()
+        using       = router.db_for_write(self.session_class)
+        max_retries = getattr(settings, 'SESSION_SAVE_MAX_RETRIES', 3)
+        conflicts   = 0
+
+        while True:
+            # The search index is updated in the same transaction as the session.
+            with transaction.atomic(using=using):
+                if force_insert:
+                    saved = self._insert(session_key, data, using, must_create)
+                else:
+                    saved = self._update(session_key, data, using)
+
+                if saved:
+                    self._update_search_index(session_key, data.get('applicant'), using, created=force_insert)
+
+            if saved:
+                break
+
+            conflicts += 1
+            if conflicts > max_retries:
+                session_save_conflicts.inc(('failed',))
+                raise SessionConflict('Session {key} was modified concurrently {conflicts} times.'.format(
+                    key         = session_key,
+                    conflicts   = conflicts,
+                ))
+
+            stored = self._load_stored(session_key, using)
+
+            if stored is None and not recreate:
+                self._exists = False
+                return False
+
+            session_save_conflicts.inc(('merged',))
+
+            if stored is None:
+                # Someone deleted the session in the meantime; recreate it, same as we would have done if we had known
+                #   it was gone.
+                force_insert = True
+            else:
+                data = self._merge(stored.session_data, data)
+
+                self._loaded_version            = stored.version
+                self._loaded_data               = deepcopy(stored.session_data)
+                self._indexed_applicant_digest  = self._digest(stored.session_data.get('applicant'))
+                force_insert                    = False
+
+        self._saved(data)
+        return True
+
+    def _saved(self, data):
+        """
+        Updates the state of the session store after its data has been saved.
+
+        :type data: dict
+        :param data: Session values that were saved (including any values they were merged with).
+        """
+        self._session_cache     = data
+        self._exists            = True
+        self._loaded_data       = deepcopy(data)
+        self._loaded_digest     = self._digest(data)
+        self._applicant_updates = []
+        self.accessed           = True
+        self.modified           = False
 
     def delete(self, session_key=None):
         if session_key is None:
@@ -114,7 +338,13 @@ class SessionStore(DjangoSessionStore):
 
             session_key = self._session_key
 
-        self.session_class.objects.filter(session_key=session_key).delete()
+        if self.is_valid_session_key(session_key):
+            buffer = get_buffer()
+            if buffer is not None:
+                buffer.discard(session_key)
+
+            self.db_queries += 1
+            self.session_class.objects.filter(session_key=session_key).delete()
 
         if session_key == self._session_key:
             self._exists = False
@@ -132,4 +362,161 @@ class SessionStore(DjangoSessionStore):
 
         :rtype: bool
         """
-        return self.session_class.objects.filter(session_key=session_key).count() > 0
\ No newline at end of file
+        if not self.is_valid_session_key(session_key):
+            return False
+
+        self.db_queries += 1
+        return self.session_class.objects.filter(session_key=session_key).count() > 0
+
+    def _insert(self, session_key, data, using, must_create):
+        """
+        Inserts the session.
+
+        :type session_key: unicode
+        :type data: dict
+        :type using: unicode
+        :type must_create: bool
+
+        :rtype: bool
+        :return: False if a session with the same key already exists.
+        """
+        sid = savepoint(using=using)
+
+        try:
+            self.db_queries += 1
+            self.session_class(session_key=session_key, session_data=data).save(force_insert=True, using=using)
+        except IntegrityError:
+            savepoint_rollback(sid, using=using)
+
+            if must_create:
+                raise CreateError()
+
+            return False
+        else:
+            savepoint_commit(sid, using=using)
+
+        self._loaded_version = 0
+        return True
+
+    def _update(self, session_key, data, using):
+        """
+        Updates the session, provided that nobody else has written to it since it was loaded.
+
+        :type session_key: unicode
+        :type data: dict
+        :type using: unicode
+
+        :rtype: bool
+        :return: False if the session was written to (or deleted) since it was loaded.
+        """
+        sessions = self.session_class.objects.using(using).filter(session_key=session_key)
+
+        # If the session was never loaded, we don't know which version to expect (last write wins).
+        if self._loaded_version is not None:
+            sessions = sessions.filter(version=self._loaded_version)
+
+        self.db_queries += 1
+
+        # `update` does not send `pre_save`, so the applicant columns have to be synced here.
+        # :see: api.models.sync_applicant_columns
+        if not sessions.update(session_data=data, version=F('version') + 1, **get_applicant_columns(data)):
+            return False
+
+        if self._loaded_version is not None:
+            self._loaded_version += 1
+
+        return True
+
+    def _load_stored(self, session_key, using):
+        """
+        Loads the session as it is currently stored in the database, after a conflicting write.
+
+        :type session_key: unicode
+        :type using: unicode
+
+        :rtype: Session|None
+        """
+        self.db_queries += 1
+
+        try:
+            return self.session_class.objects.using(using).only('session_data', 'version').get(session_key=session_key)
+        except self.session_class.DoesNotExist:
+            return None
+
+    def _merge(self, stored, data):
+        """
+        Merges the changes that were made to the session since it was loaded into values that were written
+            concurrently.
+
+        Keys that were changed (or removed) since the session was loaded replace the stored values; all other keys
+            keep their stored values.  Updates made with `update_applicant_vo` are replayed on top of the stored
+            applicant, so that concurrent changes to different applicant fields are all kept.
+
+        :type stored: dict
+        :param stored: Session values currently stored in the database.
+
+        :type data: dict
+        :param data: Session values to save.
+
+        :rtype: dict
+        """
+        loaded = self._loaded_data or {}
+        merged = dict(stored)
+
+        for key in set(data) | set(loaded):
+            if key == 'applicant' and self._applicant_updates:
+                continue
+
+            value = data.get(key, _MISSING)
+
+            if value == loaded.get(key, _MISSING):
+                # Not changed by this request.
+                continue
+
+            if value is _MISSING:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+
+        if self._applicant_updates:
+            applicant = ApplicantObject.hydrate(stored.get('applicant') or {})
+
+            for update in self._applicant_updates:
+                applicant.update(update)
+
+            merged['applicant'] = applicant.dehydrate()
+
+        return merged
+
+    def _update_search_index(self, session_key, applicant, using, created):
+        """
+        Updates the search index if the applicant values have changed since they were last indexed.
+
+        :type session_key: uuid.UUID
+        :type applicant: dict|None
+        :type using: unicode
+        :type created: bool
+        """
+        digest = self._digest(applicant)
+
+        # New sessions without an applicant have nothing to index.
+        if (digest == self._indexed_applicant_digest) or (created and not applicant):
+            self._indexed_applicant_digest = digest
+            return
+
+        self.db_queries += 1
+        index_sessions({session_key: applicant}, using=using, created=created)
+
+        self._indexed_applicant_digest = digest
+
+    @staticmethod
+    def _digest(data):
+        """
+        Computes a digest of session values, suitable for detecting changes.
+
+        :type data: dict|None
+
+        :rtype: unicode
+        """
+        serialized = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=True)
+        return sha1(serialized.encode('utf-8')).hexdigest()
\ No newline at end of file
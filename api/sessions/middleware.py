@@ -0,0 +1,38 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """
+    Drop-in replacement for Django's `SessionMiddleware` that avoids touching the database unless it has to:
+
+        - Session cookies that can't possibly be valid are ignored (and removed from the client), instead of being
+          looked up in the database.
+        - Sessions are only saved if their data actually changed; requests that mark the session as modified without
+          changing anything (e.g., re-submitting the same applicant details) don't write anything.
+
+    Requests that don't send a session cookie and don't store anything in the session never load nor create a session.
+
+    Requires a session engine that implements `is_valid_session_key` and `has_changes`.
+
+    :see: api.sessions.backends.custom_db.SessionStore
+    """
+    def process_request(self, request):
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+        if session_key is not None and not self.SessionStore.is_valid_session_key(session_key):
+            session_key = None
+
+        request.session = self.SessionStore(session_key)
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+
+        if session is not None and session.modified and not session.has_changes():
+            # Nothing to write; Django's middleware would save the session regardless.
+            session.modified = False
+
+        return super(LazySessionMiddleware, self).process_response(request, response)
@@ -0,0 +1,561 @@
+# coding=utf-8
+"""
+Write-behind buffering for sessions.
+
+Clients that autosave send many small updates per second for the same session; with write-behind enabled, those saves
+are merged in memory and each session is written (at most) once per flush interval, so the number of database writes
+scales with the number of active sessions rather than the number of requests.
+
+:see: api.sessions.backends.custom_db.SessionStore.save
+"""
+from __future__ import absolute_import, unicode_literals
+
+import atexit
+import errno
+import json
+import logging
+import os
+import threading
+from glob import glob
+from io import open
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, router, transaction
+
+from api.metrics import session_write_behind
+from api.models import Session
+from api.value_objects import ApplicantObject
+
+logger = logging.getLogger(__name__)
+
+
+class PendingSave(object):
+    """
+    Changes to a session that have not been written to the database yet.
+    """
+    def __init__(self, session_key, data, loaded_version, loaded_data, indexed_digest):
+        """
+        :type session_key: unicode
+
+        :type data: dict
+        :param data: Session values to write.
+
+        :type loaded_version: int
+        :type loaded_data: dict
+        :param loaded_data: Version and values of the session in the database, before any of the buffered changes.
+
+        :type indexed_digest: unicode
+        :param indexed_digest: Digest of the applicant values that the search index has for the session.
+        """
+        super(PendingSave, self).__init__()
+
+        self.session_key    = session_key
+        self.data           = data
+        self.loaded_version = loaded_version
+        self.loaded_data    = loaded_data
+        self.indexed_digest = indexed_digest
+
+        # All the applicant updates made since the session was loaded, merged into a single update (if the session is
+        #   written to concurrently, this is replayed on top of the stored applicant).
+        self.applicant_update = None
+        """:type: ApplicantObject"""
+
+        # Whether the applicant was replaced (`set_applicant_vo`) rather than updated.
+        self.replaces_applicant = False
+
+    def add_applicant_updates(self, updates, replaced):
+        """
+        :type updates: list[ApplicantObject]
+        :type replaced: bool
+        """
+        if replaced or self.replaces_applicant:
+            self.replaces_applicant = True
+            self.applicant_update   = None
+            return
+
+        for update in updates:
+            if self.applicant_update is None:
+                self.applicant_update = ApplicantObject({})
+
+            # Same semantics as applying each update in turn:  later non-null values win.
+            self.applicant_update.update(update)
+
+    def follow(self, previous):
+        """
+        Combines the applicant updates of an earlier pending save (for the same session) with this one's, e.g., if
+            writing the earlier one failed.
+
+        :type previous: PendingSave
+        """
+        if self.replaces_applicant:
+            return
+
+        if previous.replaces_applicant:
+            self.replaces_applicant = True
+            self.applicant_update   = None
+            return
+
+        if previous.applicant_update is not None:
+            update = previous.applicant_update.copy()
+
+            if self.applicant_update is not None:
+                update.update(self.applicant_update)
+
+            self.applicant_update = update
+
+    def to_json(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'session_key':          self.session_key,
+            'data':                 self.data,
+            'loaded_version':       self.loaded_version,
+            'loaded_data':          self.loaded_data,
+            'indexed_digest':       self.indexed_digest,
+            'applicant_update':     None if self.applicant_update is None else self.applicant_update.dehydrate(),
+            'replaces_applicant':   self.replaces_applicant,
+        }
+
+    @classmethod
+    def from_json(cls, values):
+        """
+        :type values: dict
+
+        :rtype: PendingSave
+        """
+        pending = cls(
+            session_key     = values['session_key'],
+            data            = values['data'],
+            loaded_version  = values['loaded_version'],
+            loaded_data     = values['loaded_data'],
+            indexed_digest  = values['indexed_digest'],
+        )
+
+        if values['applicant_update'] is not None:
+            pending.applicant_update = ApplicantObject.hydrate(values['applicant_update'])
+
+        pending.replaces_applicant = values['replaces_applicant']
+        return pending
+
+
+class WriteBehindBuffer(object):
+    """
+    Buffers changes to existing sessions in memory and writes them to the database in batches, from a background
+        thread.
+
+    - Consecutive saves of the same session are merged (applicant updates with `BaseValueObject.update` semantics), so
+      each session is written once per flush.
+    - Requests served by this process see buffered changes straight away; other processes only see them once they have
+      been flushed.
+    - Writes use the same optimistic concurrency as regular saves, so changes are merged with concurrent writes made by
+      other processes.
+
+    Durability:  Buffered changes are written at the latest `flush_interval` seconds after they were made, or when the
+        process exits normally.  If the process crashes, they are lost, unless a journal is used:  every buffered save
+        is then appended to a per-process journal file (and optionally fsync'ed) before the request completes, and the
+        journals of processes that died are replayed when the buffer starts.
+
+    Journals are named after the process ID plus a random token, so that a new process that happens to get the PID of
+        one that crashed doesn't overwrite its journal (it recovers it instead).
+    """
+    def __init__(self, flush_interval=0.5, batch_size=100, max_pending=1000, journal_dir=None, fsync=False):
+        """
+        :type flush_interval: float|None
+        :param flush_interval: Max number of seconds a change may stay buffered.
+            If None, no background thread is started, and the buffer is only flushed by calling `flush` (or `close`).
+
+        :type batch_size: int
+        :param batch_size: Number of sessions written per transaction.
+
+        :type max_pending: int
+        :param max_pending: Number of buffered sessions that triggers a flush before the interval is up.
+
+        :type journal_dir: unicode
+        :param journal_dir: Directory for journal files (shared by all worker processes on the host).
+
+        :type fsync: bool
+        :param fsync: Whether to fsync the journal after every save (survives OS crashes, not just process crashes).
+        """
+        super(WriteBehindBuffer, self).__init__()
+
+        self.flush_interval = flush_interval
+        self.batch_size     = batch_size
+        self.max_pending    = max_pending
+        self.journal_dir    = journal_dir
+        self.fsync          = fsync
+
+        self._pending   = {}
+        """:type: dict[unicode, PendingSave]"""
+        self._flushing  = {}
+        """:type: dict[unicode, PendingSave]"""
+        # Sessions discarded since the current flush started, so that they are not written if they were already being
+        #   flushed.
+        self._discarded = set()
+        """:type: set[unicode]"""
+
+        self._lock          = threading.RLock()
+        self._flush_lock    = threading.Lock()
+        self._wake          = threading.Event()
+        self._stopping      = False
+        self._thread        = None
+        """:type: threading.Thread"""
+        self._journal       = None
+        self._pid           = None
+        self._token         = None
+
+    def get(self, session_key):
+        """
+        Returns the buffered changes for a session, if there are any.
+
+        :type session_key: unicode
+
+        :rtype: PendingSave|None
+        """
+        with self._lock:
+            return self._pending.get(session_key) or self._flushing.get(session_key)
+
+    def add(self, store):
+        """
+        Buffers the changes made to a session.
+
+        :type store: api.sessions.backends.custom_db.SessionStore
+        :param store: Must have loaded the session, which must exist.
+
+        :rtype: dict
+        :return: Session values after merging the changes into any buffered ones.
+        """
+        self._ensure_started()
+
+        data        = store._session_cache
+        session_key = store.session_key
+
+        # Applicant values that were changed without `update_applicant_vo` replace the buffered ones.
+        replaced = not store._applicant_updates and \
+            (data.get('applicant') != (store._loaded_data or {}).get('applicant'))
+
+        with self._lock:
+            # A save after `discard` means the session was (re)created in the meantime.
+            self._discarded.discard(session_key)
+
+            pending = self._pending.get(session_key)
+
+            if pending is None:
+                # If an earlier version of the session is being flushed, this carries on from it.
+                flushing = self._flushing.get(session_key)
+
+                if flushing is None:
+                    pending = PendingSave(
+                        session_key     = session_key,
+                        data            = dict(data),
+                        loaded_version  = store._loaded_version,
+                        loaded_data     = store._loaded_data,
+                        indexed_digest  = store._indexed_applicant_digest,
+                    )
+                else:
+                    pending = PendingSave(
+                        session_key     = session_key,
+                        data            = store._merge(flushing.data, data),
+                        loaded_version  = flushing.loaded_version,
+                        loaded_data     = flushing.loaded_data,
+                        indexed_digest  = flushing.indexed_digest,
+                    )
+
+                self._pending[session_key] = pending
+            else:
+                pending.data = store._merge(pending.data, data)
+
+            pending.add_applicant_updates(store._applicant_updates, replaced)
+
+            if self._journal is not None:
+                self._write_journal([pending], append=True)
+
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+
+            data = dict(pending.data)
+
+        session_write_behind.inc(('buffered',))
+        return data
+
+    def discard(self, session_key):
+        """
+        Discards the buffered changes for a session (e.g., because it has been deleted).
+
+        Changes that are already being flushed are discarded too, unless they have been written already.
+
+        :type session_key: unicode
+        """
+        with self._lock:
+            self._pending.pop(session_key, None)
+            self._discarded.add(session_key)
+
+    def flush(self):
+        """
+        Writes all buffered changes to the database.
+
+        :rtype: int
+        :return: Number of sessions written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._flushing, self._pending = self._pending, {}
+                self._discarded = set()
+
+            batch   = list(self._flushing.values())
+            written = 0
+
+            if not batch:
+                return 0
+
+            try:
+                for start in range(0, len(batch), self.batch_size):
+                    written += self._write_batch(batch[start:start + self.batch_size])
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+                    if self._journal is not None:
+                        self._write_journal(list(self._pending.values()), append=False)
+
+            return written
+
+    def close(self, timeout=5.0):
+        """
+        Stops the background thread and writes all buffered changes.
+
+        :type timeout: float
+        """
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self._stopping = True
+            self._wake.set()
+            thread.join(timeout)
+
+        self._thread    = None
+        self._stopping  = False
+
+        self.flush()
+
+    def _write_batch(self, batch):
+        """
+        Writes buffered changes in a single transaction.
+
+        If the transaction fails, the changes are put back in the buffer to be retried with the next flush.
+
+        Sessions that have been discarded, or deleted from the database, are skipped (never recreated).
+
+        :type batch: list[PendingSave]
+
+        :rtype: int
+        """
+        # The session store uses the buffer, so it can't be imported at the top of this module.
+        from api.sessions.backends.custom_db import SessionConflict, SessionStore
+
+        written = []
+
+        try:
+            with transaction.atomic(using=router.db_for_write(Session)):
+                for pending in batch:
+                    with self._lock:
+                        if pending.session_key in self._discarded:
+                            continue
+
+                    store = SessionStore(pending.session_key)
+
+                    store._session_cache            = dict(pending.data)
+                    store._exists                   = True
+                    store._loaded_version           = pending.loaded_version
+                    store._loaded_data              = pending.loaded_data
+                    store._indexed_applicant_digest = pending.indexed_digest
+                    store._applicant_updates        = [] if pending.applicant_update is None \
+                        else [pending.applicant_update]
+
+                    try:
+                        if store.write_through(recreate=False):
+                            written.append((pending, store))
+                    except SessionConflict:
+                        logger.warning('Discarding buffered changes to session %s.', pending.session_key, exc_info=True)
+                        session_write_behind.inc(('failed',))
+        except Exception:
+            logger.exception('Failed to write %d buffered session(s); will retry.', len(batch))
+            self._requeue(batch)
+            return 0
+
+        with self._lock:
+            for pending, store in written:
+                following = self._pending.get(pending.session_key)
+
+                # Changes buffered while this was being written carry on from what was written; if the write had to
+                #   be merged with a concurrent one, they still need to be merged from the original values.
+                if following is not None and following.loaded_version == pending.loaded_version and \
+                        store._loaded_data == pending.data:
+                    following.loaded_version    = store._loaded_version
+                    following.loaded_data       = store._loaded_data
+                    following.indexed_digest    = store._indexed_applicant_digest
+
+        session_write_behind.inc(('written',), len(written))
+        return len(written)
+
+    def _requeue(self, batch):
+        """
+        :type batch: list[PendingSave]
+        """
+        with self._lock:
+            for pending in batch:
+                if pending.session_key in self._discarded:
+                    continue
+
+                following = self._pending.get(pending.session_key)
+
+                if following is None:
+                    self._pending[pending.session_key] = pending
+                else:
+                    following.follow(pending)
+
+    def _ensure_started(self):
+        # Threads don't survive forking, so each worker process needs to start its own.
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # Anything buffered before forking belongs to the parent.
+            self._pending   = {}
+            self._flushing  = {}
+            self._pid       = os.getpid()
+            self._token     = uuid4().hex
+
+            if self.journal_dir:
+                self._open_journal()
+
+            if self.flush_interval is not None:
+                self._thread        = threading.Thread(target=self._run, name='session-write-behind')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush buffered sessions.')
+            finally:
+                close_old_connections()
+
+    def _open_journal(self):
+        """
+        Opens this process' journal, after taking over the journals of processes that died without flushing.
+        """
+        for path in glob(os.path.join(self.journal_dir, '*.jsonl')):
+            pid, _, token = os.path.splitext(os.path.basename(path))[0].partition('-')
+
+            try:
+                pid = int(pid)
+            except ValueError:
+                continue
+
+            if token in _journal_tokens:
+                # Belongs to another buffer in this process.
+                continue
+
+            # A journal with our own PID was left behind by an earlier process that had the same PID.
+            if pid != self._pid and _is_running(pid):
+                continue
+
+            # Renaming is atomic, so if several processes start at the same time, only one of them gets the journal.
+            claimed = '{path}.{token}'.format(path=path, token=self._token)
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        pending = PendingSave.from_json(json.loads(line))
+                        self._pending[pending.session_key] = pending
+
+            logger.info('Recovered buffered sessions from %s.', path)
+            os.remove(claimed)
+
+        _journal_tokens.add(self._token)
+
+        self._journal = os.path.join(self.journal_dir, '{pid}-{token}.jsonl'.format(pid=self._pid, token=self._token))
+        self._write_journal(list(self._pending.values()), append=False)
+
+    def _write_journal(self, entries, append):
+        """
+        :type entries: list[PendingSave]
+
+        :type append: bool
+        :param append: If False, the journal is replaced (atomically).
+        """
+        lines = ''.join(json.dumps(entry.to_json(), cls=DjangoJSONEncoder) + '\n' for entry in entries)
+        path  = self._journal if append else '{path}.tmp'.format(path=self._journal)
+
+        with open(path, 'a' if append else 'w', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        if not append:
+            os.rename(path, self._journal)
+
+
+def _is_running(pid):
+    """
+    :type pid: int
+
+    :rtype: bool
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM means the process exists, but belongs to someone else.
+        return e.errno == errno.EPERM
+    else:
+        return True
+
+
+_buffers = {}
+""":type: dict[tuple, WriteBehindBuffer]"""
+
+_journal_tokens = set()
+"""Tokens of the journals written by this process (:see: WriteBehindBuffer._open_journal)."""
+
+
+def get_buffer():
+    """
+    Returns the write-behind buffer configured by `settings.SESSION_WRITE_BEHIND`, or None if write-behind is disabled.
+
+    :rtype: WriteBehindBuffer|None
+    """
+    config = getattr(settings, 'SESSION_WRITE_BEHIND', None) or {}
+    if not config.get('ENABLED'):
+        return None
+
+    key = tuple(sorted(config.items()))
+
+    try:
+        return _buffers[key]
+    except KeyError:
+        buffer = _buffers.setdefault(key, WriteBehindBuffer(
+            flush_interval  = config.get('FLUSH_INTERVAL', 0.5),
+            batch_size      = config.get('BATCH_SIZE', 100),
+            max_pending     = config.get('MAX_PENDING', 1000),
+            journal_dir     = config.get('JOURNAL_DIR'),
+            fsync           = config.get('FSYNC', False),
+        ))
+
+        atexit.register(buffer.close)
+        return buffer
@@ -0,0 +1,108 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+from io import open
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import skipIf
+
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import allocations, instrumentation
+from api.capture import get_writer
+from api.test_value_object import TestApplicantObject
+
+
+@skipIf(allocations.tracemalloc is None, 'tracemalloc is not available.')
+class AllocationProfileTestCase(SimpleTestCase):
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        super(AllocationProfileTestCase, self).tearDown()
+
+    def test_report(self):
+        """
+        Allocations made inside the block are grouped by site, field type and value object operation.
+        """
+        instrumentation.enable()
+
+        values = {
+            'name':         'Marcus',
+            'loan':         {'amount': 10000},
+            'addresses':    {'addr{0}'.format(i): {'street': '{0} Beacon Street'.format(i)} for i in range(200)},
+        }
+
+        with allocations.AllocationProfile('hydrate', top=5) as profile:
+            applicant = TestApplicantObject.hydrate(values)
+
+        report = profile.report
+
+        self.assertEqual(report['label'], 'hydrate')
+        self.assertGreater(report['net_bytes'], 0)
+        self.assertLessEqual(len(report['top_sites']), 5)
+        self.assertIn('Collection', report['by_field_type'])
+        self.assertEqual(report['by_value_object']['TestApplicantObject.hydrate']['calls'], 1)
+        self.assertGreater(report['by_value_object']['TestApplicantObject.hydrate']['bytes'], 0)
+
+        # The report can be serialized as-is.
+        json.dumps(report)
+
+        del applicant
+
+    def test_tracing_stopped(self):
+        """
+        tracemalloc is only tracing while a profile is active (unless it was tracing already).
+        """
+        was_tracing = allocations.tracemalloc.is_tracing()
+
+        with allocations.AllocationProfile():
+            with allocations.AllocationProfile():
+                self.assertTrue(allocations.tracemalloc.is_tracing())
+
+            self.assertTrue(allocations.tracemalloc.is_tracing())
+
+        self.assertEqual(allocations.tracemalloc.is_tracing(), was_tracing)
+
+
+@skipIf(allocations.tracemalloc is None, 'tracemalloc is not available.')
+class AllocationProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        super(AllocationProfilingMiddlewareTestCase, self).setUp()
+
+        self.directory  = mkdtemp()
+        self.path       = os.path.join(self.directory, 'allocations.jsonl')
+
+        # Otherwise the applicant summary might not get rendered (and the applicant wouldn't be hydrated).
+        caches['template_fragments'].clear()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        rmtree(self.directory)
+        super(AllocationProfilingMiddlewareTestCase, self).tearDown()
+
+    def test_report(self):
+        """
+        Sampled requests are profiled, and the reports are written to the log.
+        """
+        with override_settings(ALLOCATION_PROFILING={
+            'SAMPLE_RATE':  1,
+            'PATHS':        ('/applicant',),
+            'LOG_PATH':     self.path,
+        }):
+            self.client.get(reverse('applicant'))
+
+        get_writer(self.path).close()
+
+        with open(self.path, encoding='utf-8') as f:
+            reports = [json.loads(line) for line in f]
+
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['label'], 'GET /applicant')
+        self.assertEqual(reports[0]['status'], 200)
+        self.assertIn('ApplicantObject.hydrate', reports[0]['by_value_object'])
+        self.assertFalse(allocations.tracemalloc.is_tracing())
@@ -0,0 +1,136 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import sys
+from unittest import skipIf
+
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from django.utils.crypto import get_random_string
+
+from api.models import Session
+
+
+@skipIf(sys.version_info < (3, 5), 'ASGI support requires Python 3.5+.')
+class ASGIHandlerTestCase(TransactionTestCase):
+    def setUp(self):
+        super(ASGIHandlerTestCase, self).setUp()
+
+        import asyncio
+        from api.asgi import get_asgi_application
+
+        self.loop           = asyncio.new_event_loop()
+        self.application    = get_asgi_application('exercise_misbehaving_app.asgi_urls')
+
+    def tearDown(self):
+        from api.asgi import shutdown_executor
+
+        shutdown_executor()
+        self.loop.close()
+
+        super(ASGIHandlerTestCase, self).tearDown()
+
+    def request(self, method, path, **kwargs):
+        from api.benchmarks.concurrency import asgi_request
+
+        return self.loop.run_until_complete(asgi_request(self.application, method, path, **kwargs))
+
+    def test_get(self):
+        """
+        Requests without a session cookie are served by the async view without creating a session.
+        """
+        status, headers, body = self.request('GET', '/applicant')
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'<form', body)
+
+        cookies = [v.decode('latin-1') for k, v in headers if k == b'Set-Cookie']
+        self.assertFalse(any(c.startswith(settings.SESSION_COOKIE_NAME + '=') for c in cookies))
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_post(self):
+        """
+        Submitting the form saves the session.
+        """
+        csrf_token = get_random_string(32)
+
+        status, headers, _ = self.request(
+            'POST',
+            '/applicant',
+
+            data = {
+                'first_name':   'Marcus',
+                'last_name':    'Brody',
+                'gender':       'm',
+                'birthday':     '1900-08-13',
+                'email':        'marcus.brody@marshall.edu',
+            },
+
+            cookies     = {settings.CSRF_COOKIE_NAME: csrf_token},
+            csrf_token  = csrf_token,
+        )
+
+        self.assertEqual(status, 200)
+
+        cookies = [v.decode('latin-1') for k, v in headers if k == b'Set-Cookie']
+        self.assertTrue(any(c.startswith(settings.SESSION_COOKIE_NAME + '=') for c in cookies))
+
+        session = Session.objects.get()
+        self.assertEqual(session.session_data['applicant']['first_name'], 'Marcus')
+
+    def test_csrf(self):
+        """
+        Middleware still applies to async views.
+        """
+        status, _, _ = self.request('POST', '/applicant', data={'first_name': 'Marcus'})
+        self.assertEqual(status, 403)
+
+    def test_not_found(self):
+        status, _, _ = self.request('GET', '/foobar')
+        self.assertEqual(status, 404)
+
+    @override_settings(BULK_APPLICANT_TOKENS={'marshall': 'fortune-and-glory'})
+    def test_streaming(self):
+        """
+        Sync views (including streaming responses) run in the thread pool.
+        """
+        record = json.dumps({
+            'first_name':   'Marcus',
+            'last_name':    'Brody',
+            'gender':       'm',
+            'birthday':     '1900-08-13',
+            'email':        'marcus.brody@marshall.edu',
+        })
+
+        # The bulk endpoint expects a raw body; send it in several chunks.
+        chunks = [record[:10].encode('utf-8'), record[10:].encode('utf-8'), b'\n']
+        messages = []
+
+        async def receive():
+            if chunks:
+                chunk = chunks.pop(0)
+                return {'type': 'http.request', 'body': chunk, 'more_body': bool(chunks)}
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type':         'http',
+            'method':       'POST',
+            'path':         '/applicant/bulk',
+            'query_string': b'',
+            'headers':      [
+                (b'content-type', b'application/x-ndjson'),
+                (b'authorization', b'Bearer fortune-and-glory'),
+            ],
+        }
+
+        self.loop.run_until_complete(self.application(scope, receive, send))
+
+        self.assertEqual(messages[0]['status'], 200)
+
+        lines = b''.join(m.get('body', b'') for m in messages[1:]).decode('utf-8').splitlines()
+        self.assertDictEqual(json.loads(lines[-1])['summary'], {'created': 1, 'updated': 0, 'failed': 0})
+        self.assertEqual(Session.objects.count(), 1)
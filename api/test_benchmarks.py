@@ -0,0 +1,166 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import pickle
+from io import StringIO
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from api.benchmarks.replay import ReplayReport, RequestReplayer, load_flows, percentile
+from api.benchmarks.value_object import OPERATIONS, compare, get_cases
+from exercise_misbehaving_app.wsgi import application
+
+
+class LoadFlowsTestCase(SimpleTestCase):
+    def test_group_by_session(self):
+        """
+        Requests that share a session are grouped into a single flow, in file order.
+        """
+        flows = load_flows([
+            json.dumps({'session': 'a', 'method': 'GET', 'path': '/applicant'}),
+            json.dumps({'session': 'b', 'method': 'GET', 'path': '/applicant'}),
+            '',
+            json.dumps({'session': 'a', 'method': 'POST', 'path': '/applicant', 'data': {'first_name': 'Marcus'}}),
+            json.dumps({'method': 'GET', 'path': '/applicant'}),
+        ])
+
+        self.assertEqual([len(flow) for flow in flows], [2, 1, 1])
+        self.assertEqual([entry['method'] for entry in flows[0]], ['GET', 'POST'])
+
+
+class ReplayReportTestCase(SimpleTestCase):
+    def test_percentile(self):
+        """
+        Percentiles use the nearest-rank method.
+        """
+        values = [float(i) for i in range(1, 101)]
+
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_merge(self):
+        """
+        Reports from multiple workers can be merged, including in their raw (picklable) form.
+        """
+        report = ReplayReport()
+        report.add('GET /applicant', 0.002, 1, 200)
+
+        other = ReplayReport()
+        other.add('GET /applicant', 0.004, 3, 200)
+        other.add('POST /applicant', 0.010, 4, 200)
+
+        report.merge(other.to_raw())
+        report.elapsed = 1.0
+
+        summary = report.get_summary()
+        self.assertEqual(summary['requests'], 3)
+        self.assertEqual(summary['throughput'], 3.0)
+        self.assertEqual(summary['endpoints']['GET /applicant']['queries'], 2)
+        self.assertDictEqual(summary['endpoints']['GET /applicant']['statuses'], {200: 2})
+
+
+class RequestReplayerTestCase(TransactionTestCase):
+    def test_replay(self):
+        """
+        Replaying requests directly against the WSGI application.
+        """
+        report = RequestReplayer(application, concurrency=2).run([
+            [{'method': 'GET', 'path': '/applicant'}],
+            [{'method': 'GET', 'path': '/applicant'}, {'method': 'GET', 'path': '/applicant?foo=bar'}],
+        ])
+
+        summary = report.get_summary()
+        self.assertEqual(summary['requests'], 3)
+
+        # Query strings are not part of the endpoint.
+        stats = summary['endpoints']['GET /applicant']
+        self.assertDictEqual(stats['statuses'], {200: 3})
+
+        # No session cookie, so the session is never loaded.
+        self.assertEqual(stats['queries'], 0)
+
+    def test_debug_cursor_restored(self):
+        """
+        Query logging is only forced while requests are being replayed.
+        """
+        RequestReplayer(application).replay_flow([{'method': 'GET', 'path': '/applicant'}], ReplayReport())
+
+        self.assertFalse(connection.force_debug_cursor)
+
+    def test_pickle(self):
+        """
+        Replayers can be sent to spawned worker processes, which load their own WSGI application.
+        """
+        replayer = pickle.loads(pickle.dumps(RequestReplayer(application, concurrency=2, count_queries=False)))
+
+        self.assertIsInstance(replayer.application, WSGIHandler)
+        self.assertEqual(replayer.concurrency, 2)
+        self.assertFalse(replayer.count_queries)
+
+
+class ValueObjectBenchmarkTestCase(SimpleTestCase):
+    def setUp(self):
+        super(ValueObjectBenchmarkTestCase, self).setUp()
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+        super(ValueObjectBenchmarkTestCase, self).tearDown()
+
+    def test_operations(self):
+        """
+        Every operation can be run for every case.
+        """
+        for case in get_cases():
+            operations = case.get_operations()
+            self.assertEqual(tuple(operations), OPERATIONS)
+
+            for operation, func in operations.items():
+                func()
+
+            # Dehydrated values can be hydrated back into an equivalent object.
+            dehydrated = operations['dehydrate']()
+            self.assertDictEqual(case.vo_type.hydrate(dehydrated).dehydrate(), dehydrated, case.name)
+
+    def test_compare(self):
+        """
+        Slower operations and bigger allocations count as regressions.
+        """
+        baseline = {'results': {'simple': {'construct': {'ops_per_sec': 1000.0, 'peak_bytes': 1000}}}}
+        current  = {'results': {'simple': {'construct': {'ops_per_sec': 950.0, 'peak_bytes': 1200}}}}
+
+        comparisons = {c['metric']: c for c in compare(baseline, current, threshold=0.1)}
+
+        self.assertFalse(comparisons['ops_per_sec']['regression'])
+        self.assertTrue(comparisons['peak_bytes']['regression'])
+
+        self.assertTrue(compare(baseline, current, threshold=0.01)[1]['regression'])
+
+    def test_command(self):
+        """
+        Saving a baseline, then comparing against it.
+        """
+        path    = os.path.join(self.directory, 'baseline.json')
+        options = {'cases': ['simple'], 'operations': ['construct'], 'min_time': 0.001, 'repeat': 1}
+
+        call_command('benchmark_value_objects', save=path, stdout=StringIO(), **options)
+
+        with open(path) as f:
+            baseline = json.load(f)
+        self.assertIn('ops_per_sec', baseline['results']['simple']['construct'])
+
+        # Make the baseline impossibly fast.
+        baseline['results']['simple']['construct']['ops_per_sec'] *= 1000
+        with open(path, 'w') as f:
+            json.dump(baseline, f)
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark_value_objects', compare=path, stdout=StringIO(), **options)
@@ -0,0 +1,201 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import logging
+import os
+from io import open
+from logging.handlers import BufferingHandler
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.capture import _STOP, CaptureLogWriter, get_writer, hash_session_key, logger, scrub
+
+
+class ScrubTestCase(SimpleTestCase):
+  def test_rules(self):
+      """
+      Each field is scrubbed according to its rule.
+      """
+      scrubbed = scrub(
+        {
+          'first_name':           ['Marcus'],
+          'email':                ['marcus.brody@marshall.edu'],
+          'birthday':             ['1900-08-13'],
+          'gender':               ['m'],
+          'csrfmiddlewaretoken':  ['abc123'],
+          'tags':                 ['foo', 'bar'],
+        },
+
+        rules = {
+          'birthday':             'year',
+          'gender':               'keep',
+          'csrfmiddlewaretoken':  'drop',
+          'tags':                 lambda value: value.upper(),
+        },
+      )
+
+      self.assertDictEqual(scrubbed, {
+        'first_name': 'xxxxxx',
+        'email':      'xxxxxx.xxxxx@xxxxxxxx.xxx',
+        'birthday':   '1900-01-01',
+        'gender':     'm',
+        'tags':       ['FOO', 'BAR'],
+      })
+
+  def test_hash_session_key(self):
+      """
+      Session keys are hashed consistently, so that captured requests can still be grouped by session.
+      """
+      self.assertEqual(hash_session_key('abc'), hash_session_key('abc'))
+      self.assertNotEqual(hash_session_key('abc'), hash_session_key('abd'))
+      self.assertIsNone(hash_session_key(None))
+
+
+class CaptureLogWriterTestCase(SimpleTestCase):
+  def setUp(self):
+      super(CaptureLogWriterTestCase, self).setUp()
+
+      self.directory = mkdtemp()
+      self.path = os.path.join(self.directory, 'requests.jsonl')
+
+  def tearDown(self):
+      rmtree(self.directory)
+
+      super(CaptureLogWriterTestCase, self).tearDown()
+
+  def test_write(self):
+      """
+      Entries are written from a background thread, and flushed when the writer is closed.
+      """
+      writer = CaptureLogWriter(self.path, batch_size=2, flush_interval=60)
+
+      for i in range(5):
+        self.assertTrue(writer.submit({'i': i}))
+
+      writer.close()
+
+      with open(self.path, encoding='utf-8') as f:
+        self.assertEqual([json.loads(line)['i'] for line in f], [0, 1, 2, 3, 4])
+
+      self.assertEqual(writer.written, 5)
+
+  def test_queue_full(self):
+      """
+      Entries are dropped rather than blocking when the queue is full.
+      """
+      writer = CaptureLogWriter(self.path, queue_size=1)
+
+      # Stop the writer from draining the queue.
+      writer._ensure_started = lambda: None
+
+      self.assertTrue(writer.submit({'i': 0}))
+      self.assertFalse(writer.submit({'i': 1}))
+      self.assertEqual(writer.dropped, 1)
+
+  def test_write_error(self):
+      """
+      A batch that can't be written is dropped (and counted), without stopping the background thread.
+      """
+      writer  = CaptureLogWriter(self.path, batch_size=1, flush_interval=60)
+      handler = BufferingHandler(10)
+
+      logger.addHandler(handler)
+      try:
+        self.assertTrue(writer.submit({'i': object()}))
+        self.assertTrue(writer.submit({'i': 1}))
+        writer.close()
+      finally:
+        logger.removeHandler(handler)
+
+      self.assertEqual([record.levelno for record in handler.buffer], [logging.ERROR])
+
+      with open(self.path, encoding='utf-8') as f:
+        self.assertEqual([json.loads(line)['i'] for line in f], [1])
+
+      self.assertEqual(writer.written, 1)
+      self.assertEqual(writer.dropped, 1)
+
+  def test_restart(self):
+      """
+      The background thread is restarted if it is no longer running.
+      """
+      writer = CaptureLogWriter(self.path, flush_interval=60)
+      writer._ensure_started()
+
+      # Stop the thread behind the writer's back.
+      thread = writer._thread
+      writer.queue.put(_STOP)
+      thread.join(5)
+      self.assertFalse(thread.is_alive())
+
+      self.assertTrue(writer.submit({'i': 0}))
+      self.assertIsNot(writer._thread, thread)
+      writer.close()
+
+      with open(self.path, encoding='utf-8') as f:
+        self.assertEqual([json.loads(line)['i'] for line in f], [0])
+
+
+class RequestCaptureMiddlewareTestCase(TestCase):
+  def setUp(self):
+      super(RequestCaptureMiddlewareTestCase, self).setUp()
+
+      self.directory = mkdtemp()
+      self.path = os.path.join(self.directory, 'requests.jsonl')
+
+  def tearDown(self):
+      rmtree(self.directory)
+
+      super(RequestCaptureMiddlewareTestCase, self).tearDown()
+
+  def test_capture(self):
+      """
+      Sampled requests are written to the capture log, with their form fields scrubbed.
+      """
+      with override_settings(REQUEST_CAPTURE={
+        'LOG_PATH':     self.path,
+        'SAMPLE_RATE':  1,
+        'PATHS':        ('/applicant',),
+        'SCRUB_RULES':  {'gender': 'keep'},
+      }):
+        self.client.get(reverse('applicant'), {'gender': 'f', 'first_name': 'Marion'})
+
+      get_writer(self.path).close()
+
+      with open(self.path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+
+      self.assertEqual(len(entries), 1)
+      self.assertEqual(entries[0]['method'], 'GET')
+      self.assertEqual(entries[0]['path'], '/applicant')
+      self.assertEqual(entries[0]['status'], 200)
+      self.assertDictEqual(entries[0]['data'], {'gender': 'f', 'first_name': 'xxxxxx'})
+      self.assertIn('duration', entries[0])
+
+  def test_exact_paths(self):
+      """
+      Only requests to the configured paths are captured; the bulk endpoint's body is left for the view to stream.
+      """
+      with override_settings(
+        REQUEST_CAPTURE       = {'LOG_PATH': self.path, 'SAMPLE_RATE': 1, 'PATHS': ('/applicant',)},
+        BULK_APPLICANT_TOKENS = {'marshall': 'fortune-and-glory'},
+      ):
+        response = self.client.post(
+          reverse('applicant-bulk'),
+          data                = 'first_name=Marion',
+          content_type        = 'application/x-www-form-urlencoded',
+          HTTP_AUTHORIZATION  = 'Bearer fortune-and-glory',
+        )
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+      get_writer(self.path).close()
+
+      self.assertFalse(os.path.exists(self.path))
+
+      # The line was read (and rejected) by the ingest, rather than swallowed by `request.POST`.
+      self.assertDictEqual(json.loads(lines[-1])['summary'], {'created': 0, 'updated': 0, 'failed': 1})
@@ -0,0 +1,88 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import csv
+import os
+from io import StringIO, open
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from six import PY2
+
+from api.export import ApplicantExport, pyarrow
+from api.ingest import ApplicantIngest
+from api.models import Session
+from api.test_ingest import make_record
+
+
+class ApplicantExportTestCase(TestCase):
+  def setUp(self):
+    super(ApplicantExportTestCase, self).setUp()
+
+    list(ApplicantIngest().ingest([make_record(first_name='Applicant {0}'.format(i)) for i in range(5)]))
+
+    # Sessions without an applicant are exported with empty values.
+    Session.objects.create(session_data={'foo': 'bar'})
+    Session.objects.create(session_data=None)
+
+    self.directory = mkdtemp()
+    self.addCleanup(rmtree, self.directory)
+
+  def test_chunks(self):
+    """
+    Rows are fetched in chunks, in session key order, with each session exported exactly once.
+    """
+    export = ApplicantExport(chunk_size=2)
+    chunks = list(export.iter_chunks())
+
+    self.assertEqual([len(c) for c in chunks], [2, 2, 2, 1])
+
+    keys = [row['session_key'] for chunk in chunks for row in chunk]
+    self.assertEqual(keys, sorted(s.session_key.hex for s in Session.objects.all()))
+
+    self.assertEqual(export.get_progress()['rows'], 7)
+
+    names = sorted(filter(None, (row['first_name'] for chunk in chunks for row in chunk)))
+    self.assertEqual(names, ['Applicant {0}'.format(i) for i in range(5)])
+
+  def test_csv(self):
+    path = os.path.join(self.directory, 'applicants.csv')
+
+    stderr = StringIO()
+    call_command('export_applicants', path, chunk_size=3, progress_interval=1, stderr=stderr)
+
+    self.assertIn('Exported 3 applicants', stderr.getvalue())
+
+    with open(path, 'rb' if PY2 else 'r', **({} if PY2 else {'encoding': 'utf-8', 'newline': ''})) as f:
+      rows = list(csv.reader(f))
+
+    self.assertEqual(rows[0], ApplicantExport.get_columns())
+    self.assertEqual(len(rows), 8)
+
+    applicant = dict(zip(rows[0], next(row for row in rows[1:] if row[rows[0].index('first_name')])))
+    self.assertEqual(applicant['birthday'], '1900-08-13')
+    self.assertEqual(applicant['email'], 'marcus.brody@marshall.edu')
+
+  def test_stdout(self):
+    stdout = StringIO()
+    call_command('export_applicants', '-', stdout=stdout, stderr=StringIO())
+
+    self.assertEqual(len(stdout.getvalue().splitlines()), 8)
+
+  @skipIf(pyarrow is None, 'pyarrow is not installed.')
+  def test_parquet(self):
+    path = os.path.join(self.directory, 'applicants.parquet')
+    call_command('export_applicants', path, chunk_size=3, stderr=StringIO())
+
+    table = pyarrow.parquet.read_table(path)
+    self.assertEqual(table.num_rows, 7)
+    self.assertEqual(table.column_names, ApplicantExport.get_columns())
+
+  @skipIf(pyarrow is not None, 'pyarrow is installed.')
+  def test_parquet_unavailable(self):
+    with self.assertRaises(CommandError):
+      call_command('export_applicants', os.path.join(self.directory, 'applicants.parquet'), stderr=StringIO())
@@ -0,0 +1,190 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from datetime import date
+from io import StringIO
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from api.ingest import ApplicantIngest
+from api.models import Session
+from api.value_objects import ApplicantObject
+
+
+def make_record(**overrides):
+  record = {
+    'first_name': 'Marcus',
+    'last_name':  'Brody',
+    'gender':     'm',
+    'birthday':   '1900-08-13',
+    'email':      'marcus.brody@marshall.edu',
+  }
+  record.update(overrides)
+  return json.dumps(record)
+
+
+class ApplicantIngestTestCase(TestCase):
+  def test_create_applicants(self):
+    """
+    Each valid record creates a new session.
+    """
+    ingest  = ApplicantIngest(batch_size=2)
+    results = list(ingest.ingest([
+      make_record(),
+      make_record(first_name='Marion', last_name='Ravenwood', gender='f'),
+      make_record(first_name='Sallah'),
+    ]))
+
+    self.assertEqual([r['status'] for r in results], ['created', 'created', 'created'])
+    self.assertEqual([r['line'] for r in results], [1, 2, 3])
+    self.assertDictEqual(ingest.get_summary(), {'created': 3, 'updated': 0, 'failed': 0})
+
+    self.assertEqual(Session.objects.count(), 3)
+
+    session = Session.objects.get(session_key=results[1]['session_key'])
+    self.assertEqual(session.session_data['applicant']['first_name'], 'Marion')
+
+  def test_invalid_lines(self):
+    """
+    Invalid lines are reported individually, without stopping the stream.
+    """
+    ingest  = ApplicantIngest()
+    results = list(ingest.ingest([
+      '{not json',
+      '',
+      make_record(gender='x'),
+      '[]',
+      make_record(session_key='foobar'),
+      make_record(),
+    ]))
+
+    self.assertEqual([r['line'] for r in results], [1, 3, 4, 5, 6])
+
+    self.assertIn('__all__', results[0]['errors'])
+    self.assertIn('gender', results[1]['errors'])
+    self.assertIn('__all__', results[2]['errors'])
+    self.assertIn('session_key', results[3]['errors'])
+    self.assertEqual(results[4]['status'], 'created')
+
+    self.assertDictEqual(ingest.get_summary(), {'created': 1, 'updated': 0, 'failed': 4})
+    self.assertEqual(Session.objects.count(), 1)
+
+  def test_session_key(self):
+    """
+    Records that specify a session key are stored in that session.
+    """
+    session_key = uuid4()
+
+    results = list(ApplicantIngest().ingest([
+      make_record(session_key=session_key.hex),
+      make_record(session_key=str(session_key), email='mbrody@marshall.edu'),
+    ]))
+
+    self.assertEqual([r['status'] for r in results], ['created', 'updated'])
+    self.assertEqual(Session.objects.count(), 1)
+
+    session = Session.objects.get(session_key=session_key)
+    self.assertEqual(session.session_data['applicant']['email'], 'mbrody@marshall.edu')
+
+
+  def test_stored_session(self):
+    """
+    Records can be merged into sessions that were stored by an earlier batch; stored applicants that can't be merged
+      into are reported without stopping the stream.
+    """
+    brody   = uuid4()
+    broken  = uuid4()
+
+    list(ApplicantIngest().ingest([make_record(session_key=brody.hex), make_record(session_key=broken.hex)]))
+    Session.objects.filter(session_key=broken).update(session_data={'applicant': {'birthday': 'yesterday'}})
+
+    ingest  = ApplicantIngest(batch_size=1)
+    results = list(ingest.ingest([
+      make_record(session_key=brody.hex, email='mbrody@marshall.edu'),
+      make_record(session_key=broken.hex),
+      make_record(first_name='Sallah'),
+    ]))
+
+    self.assertEqual([r['line'] for r in results], [1, 2, 3])
+    self.assertEqual(results[0]['status'], 'updated')
+    self.assertIn('__all__', results[1]['errors'])
+    self.assertEqual(results[2]['status'], 'created')
+    self.assertDictEqual(ingest.get_summary(), {'created': 1, 'updated': 1, 'failed': 1})
+
+    raw = Session.objects.filter(session_key=brody).values_list('session_data', flat=True).get()
+    self.assertEqual(ApplicantObject.hydrate(json.loads(raw)['applicant']), ApplicantObject({
+      'first_name': 'Marcus',
+      'last_name':  'Brody',
+      'gender':     'm',
+      'birthday':   date(1900, 8, 13),
+      'email':      'mbrody@marshall.edu',
+    }))
+
+@override_settings(BULK_APPLICANT_TOKENS={'marshall': 'fortune-and-glory'}, BULK_APPLICANT_MAX_BYTES=1024)
+class BulkApplicantTestCase(TestCase):
+  def post(self, data, token='fortune-and-glory'):
+    return self.client.post(
+      reverse('applicant-bulk'),
+      data                = data,
+      content_type        = 'application/x-ndjson',
+      HTTP_AUTHORIZATION  = 'Bearer {0}'.format(token) if token else '',
+    )
+
+  def test_post(self):
+    """
+    Posting NDJSON to the bulk endpoint streams back one result per line, followed by a summary.
+    """
+    response = self.post('\n'.join([make_record(), make_record(birthday='yesterday')]))
+    """:type: django.http.StreamingHttpResponse"""
+    self.assertEqual(response.status_code, 200)
+
+    lines = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+    self.assertEqual(len(lines), 3)
+
+    # Errors are reported immediately, whereas successful lines are reported when their batch is written.
+    results = sorted(lines[:2], key=lambda r: r['line'])
+    self.assertEqual(results[0]['status'], 'created')
+    self.assertIn('birthday', results[1]['errors'])
+
+    self.assertDictEqual(lines[2]['summary'], {'created': 1, 'updated': 0, 'failed': 1})
+
+  def test_unauthorized(self):
+    """
+    Requests without a valid partner token are rejected.
+    """
+    self.assertEqual(self.post(make_record(), token=None).status_code, 401)
+    self.assertEqual(self.post(make_record(), token='belloq').status_code, 401)
+    self.assertEqual(Session.objects.count(), 0)
+
+  def test_too_large(self):
+    """
+    Request bodies over the size limit are rejected before anything is ingested.
+    """
+    response = self.post('\n'.join([make_record()] * 20))
+
+    self.assertEqual(response.status_code, 413)
+    self.assertEqual(Session.objects.count(), 0)
+
+
+class IngestApplicantsCommandTestCase(TestCase):
+  def test_stdin(self):
+    """
+    The management command reports errors on stderr and a summary on stdout.
+    """
+    import sys
+
+    stdout, stderr = StringIO(), StringIO()
+    stdin, sys.stdin = sys.stdin, StringIO('\n'.join([make_record(), '{}']))
+
+    try:
+      call_command('ingest_applicants', '-', stdout=stdout, stderr=stderr)
+    finally:
+      sys.stdin = stdin
+
+    self.assertEqual(Session.objects.count(), 1)
+    self.assertDictEqual(json.loads(stdout.getvalue()), {'created': 1, 'updated': 0, 'failed': 1})
+    self.assertEqual(json.loads(stderr.getvalue())['line'], 2)
@@ -0,0 +1,128 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import sys
+from unittest import skipIf
+
+from django.core.cache import caches
+from django.core.urlresolvers import reverse
+from django.http import HttpRequest
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import instrumentation
+from api.middleware import InstrumentationMiddleware
+from api.test_value_object import SimpleTestValueObject
+
+
+class InstrumentationTestCase(SimpleTestCase):
+    def setUp(self):
+        super(InstrumentationTestCase, self).setUp()
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        super(InstrumentationTestCase, self).tearDown()
+
+    def test_disabled(self):
+        """
+        Nothing is recorded while instrumentation is disabled.
+        """
+        SimpleTestValueObject.hydrate({'name': 'Robin'}).dehydrate()
+
+        self.assertDictEqual(instrumentation.get_process_stats(), {})
+
+    def test_enabled(self):
+        """
+        Calls, time and payload sizes are recorded per value object class and operation.
+        """
+        instrumentation.enable()
+
+        obj = SimpleTestValueObject.hydrate({'name': 'Robin', 'age': 39, 'favoriteColor': 'yellow'})
+        obj.update(SimpleTestValueObject({'age': 40}))
+        obj.dehydrate()
+        obj.dehydrate()
+
+        stats = instrumentation.get_process_stats()
+
+        self.assertEqual(stats['SimpleTestValueObject.hydrate']['calls'], 1)
+        self.assertGreater(stats['SimpleTestValueObject.hydrate']['bytes'], 0)
+        self.assertEqual(stats['SimpleTestValueObject.update']['calls'], 1)
+        self.assertEqual(stats['SimpleTestValueObject.dehydrate']['calls'], 2)
+        self.assertNotIn('SimpleTestValueObject.get_public_values', stats)
+
+    def test_request_stats(self):
+        """
+        Per-request stats only include calls made since the request started.
+        """
+        instrumentation.enable()
+
+        SimpleTestValueObject.hydrate({})
+
+        request = HttpRequest()
+
+        instrumentation.start_request(request)
+        SimpleTestValueObject({}).get_public_values()
+        stats = instrumentation.finish_request(request)
+
+        self.assertListEqual(list(stats.keys()), ['SimpleTestValueObject.get_public_values'])
+        self.assertEqual(instrumentation.get_process_stats()['SimpleTestValueObject.hydrate']['calls'], 1)
+
+    @skipIf(sys.version_info < (3, 7), 'Requires contextvars (Python 3.7+).')
+    def test_interleaved_requests(self):
+        """
+        Stats are kept per request, even if requests are interleaved on an event loop and finished in another thread
+            (as they are by the ASGI handler).
+        """
+        import asyncio
+        from api.asgi import run_blocking, shutdown_executor
+
+        instrumentation.enable()
+
+        async def handle(calls):
+            request = HttpRequest()
+            instrumentation.start_request(request)
+
+            for _ in range(calls):
+                await asyncio.sleep(0)
+                SimpleTestValueObject({}).get_public_values()
+
+            await run_blocking(SimpleTestValueObject.hydrate, {})
+            return await run_blocking(instrumentation.finish_request, request)
+
+        async def main():
+            # Each request gets its own task, same as under an ASGI server.
+            return await asyncio.gather(handle(1), handle(3))
+
+        loop = asyncio.new_event_loop()
+        try:
+            first, second = loop.run_until_complete(main())
+        finally:
+            shutdown_executor()
+            loop.close()
+
+        self.assertEqual(first['SimpleTestValueObject.get_public_values']['calls'], 1)
+        self.assertEqual(second['SimpleTestValueObject.get_public_values']['calls'], 3)
+        self.assertEqual(second['SimpleTestValueObject.hydrate']['calls'], 1)
+
+
+class InstrumentationMiddlewareTestCase(TestCase):
+    def setUp(self):
+        super(InstrumentationMiddlewareTestCase, self).setUp()
+
+        # Otherwise the applicant summary might not get rendered (and the applicant wouldn't be hydrated).
+        caches['template_fragments'].clear()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        super(InstrumentationMiddlewareTestCase, self).tearDown()
+
+    @override_settings(INSTRUMENTATION_ENABLED=True, DEBUG=True)
+    def test_response_header(self):
+        """
+        In DEBUG mode, the per-request summary is added to the response.
+        """
+        response = self.client.get(reverse('applicant'))
+
+        self.assertIn('ApplicantObject.hydrate=1;', response[InstrumentationMiddleware.HEADER])
@@ -0,0 +1,165 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import threading
+from io import open
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from django.core.urlresolvers import reverse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import instrumentation
+from api.metrics import Counter, Histogram, Registry
+
+
+class MetricsTestCase(SimpleTestCase):
+    def test_counter(self):
+        """
+        Counters are rendered in the Prometheus text format.
+        """
+        registry    = Registry()
+        counter     = registry.register(Counter('requests_total', 'Requests.', ('result',)))
+
+        counter.inc(('hit',))
+        counter.inc(('hit',), 2)
+        counter.inc(('miss',))
+
+        self.assertEqual(
+            registry.render(),
+
+            '# HELP requests_total Requests.\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{result="hit"} 3\n'
+            'requests_total{result="miss"} 1\n',
+        )
+
+    def test_histogram(self):
+        """
+        Histogram buckets are cumulative and include +Inf.
+        """
+        registry    = Registry()
+        histogram   = registry.register(Histogram('size_bytes', 'Sizes.', ('op',), buckets=(10, 100)))
+
+        histogram.observe(5, ('load',))
+        histogram.observe(10, ('load',))
+        histogram.observe(50, ('load',))
+        histogram.observe(500, ('load',))
+
+        self.assertEqual(
+            registry.render(),
+
+            '# HELP size_bytes Sizes.\n'
+            '# TYPE size_bytes histogram\n'
+            'size_bytes_bucket{op="load",le="10"} 2\n'
+            'size_bytes_bucket{op="load",le="100"} 3\n'
+            'size_bytes_bucket{op="load",le="+Inf"} 4\n'
+            'size_bytes_sum{op="load"} 565\n'
+            'size_bytes_count{op="load"} 4\n',
+        )
+
+    def test_label_escaping(self):
+        """
+        Label values are escaped.
+        """
+        counter = Counter('c', 'C.', ('name',))
+        counter.inc(('say "hi"\\\n',))
+
+        self.assertEqual(counter.format_samples(counter.collect()), ['c{name="say \\"hi\\"\\\\\\n"} 1'])
+
+    def test_threads(self):
+        """
+        Each thread records values separately; they are combined when collected.
+        """
+        counter = Counter('c', 'C.')
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertDictEqual(counter.collect(), {(): 4000})
+
+    def test_finished_threads(self):
+        """
+        The shards of finished threads are retired, without losing their values.
+        """
+        histogram = Histogram('h', 'H.', buckets=(1,))
+
+        for _ in range(10):
+            thread = threading.Thread(target=histogram.observe, args=(2,))
+            thread.start()
+            thread.join()
+
+        histogram.observe(0)
+
+        self.assertEqual(len(histogram._shards), 1)
+        self.assertDictEqual(histogram.collect(), {(): [1, 10, 20, 11]})
+
+        # Collecting again doesn't count the retired values twice.
+        self.assertDictEqual(histogram.collect(), {(): [1, 10, 20, 11]})
+
+
+class MultiprocessMetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        super(MultiprocessMetricsTestCase, self).setUp()
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+        super(MultiprocessMetricsTestCase, self).tearDown()
+
+    def test_combine_processes(self):
+        """
+        In multi-process mode, metrics from every process' snapshot are combined.
+        """
+        registry    = Registry()
+        counter     = registry.register(Counter('c', 'C.', ('result',)))
+        registry.configure_multiprocess(self.directory)
+
+        counter.inc(('hit',), 2)
+
+        # Simulate a snapshot written by another worker.
+        with open(os.path.join(self.directory, '0.json'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'c': [[['hit'], 3], [['miss'], 1]], 'unknown': []}))
+
+        registry_samples = dict(registry.collect())
+        self.assertDictEqual(registry_samples[counter], {('hit',): 5, ('miss',): 1})
+
+
+class MetricsViewTestCase(TestCase):
+    def tearDown(self):
+        instrumentation.disable()
+        super(MetricsViewTestCase, self).tearDown()
+
+    def test_disabled(self):
+        """
+        The endpoint does not exist unless metrics are enabled.
+        """
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_enabled(self):
+        """
+        Session and value object operations are exported.
+        """
+        session = self.client.session
+        session['foo'] = 'bar'
+        session.save()
+
+        self.client.get(reverse('applicant'))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        content = response.content.decode('utf-8')
+        self.assertIn('api_operation_duration_seconds_count{operation="SessionStore.load"}', content)
+        self.assertIn('api_fragment_cache_requests_total', content)
@@ -0,0 +1,100 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from datetime import date
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from api import scoring
+from api.ingest import ApplicantIngest
+from api.test_ingest import make_record
+from api.value_objects import ApplicantObject
+
+
+class ScoringTestCase(SimpleTestCase):
+  """
+  Rules evaluated over plain lists (without numpy).
+  """
+  numpy = None
+
+  def setUp(self):
+    super(ScoringTestCase, self).setUp()
+    self._numpy, scoring.numpy = scoring.numpy, self.numpy
+
+  def tearDown(self):
+    scoring.numpy = self._numpy
+    super(ScoringTestCase, self).tearDown()
+
+  def make_columns(self, *applicants):
+    return scoring.ApplicantColumns.from_applicants(
+      ('key{0}'.format(i), ApplicantObject(values)) for i, values in enumerate(applicants)
+    )
+
+  def test_age(self):
+    columns = self.make_columns(
+      {'birthday': date(2000, 3, 1)},
+      {'birthday': date(2000, 2, 29)},
+      {'birthday': date(1999, 12, 31)},
+      {},
+    )
+
+    self.assertEqual(list(scoring.get_age(columns, date(2018, 2, 28))), [17, 17, 18, -1])
+    self.assertEqual(list(scoring.get_age(columns, date(2018, 3, 1))), [18, 18, 18, -1])
+
+  def test_score(self):
+    complete = {
+      'first_name': 'Marcus',
+      'last_name':  'Brody',
+      'gender':     'm',
+      'birthday':   date(1900, 8, 13),
+      'email':      'marcus.brody@marshall.edu',
+    }
+
+    columns = self.make_columns(
+      complete,
+      dict(complete, birthday=date(2010, 1, 1)),
+      dict(complete, email='', gender=None),
+      {},
+    )
+
+    rows = list(scoring.iter_rows(scoring.score(columns, as_of=date(2018, 1, 1))))
+
+    self.assertEqual([r['session_key'] for r in rows], ['key0', 'key1', 'key2', 'key3'])
+    self.assertEqual([r['eligible'] for r in rows], [True, False, False, False])
+    self.assertEqual([r['completeness'] for r in rows], [1.0, 1.0, 0.6, 0.0])
+    self.assertEqual([r['score'] for r in rows], [100.0, 50.0, 30.0, 0.0])
+
+  def test_empty(self):
+    self.assertEqual(list(scoring.iter_rows(scoring.score(self.make_columns()))), [])
+
+
+@skipIf(scoring.numpy is None, 'numpy is not installed.')
+class NumpyScoringTestCase(ScoringTestCase):
+  """
+  Same rules, evaluated as vectorized numpy expressions.
+  """
+  numpy = scoring.numpy
+
+  def test_vectorized(self):
+    columns = self.make_columns({'birthday': date(2000, 3, 1), 'gender': 'f'}, {})
+    results = scoring.score(columns, as_of=date(2018, 3, 1))
+
+    self.assertEqual(columns.birthday.dtype, self.numpy.dtype('datetime64[D]'))
+
+    for rule in ('age', 'completeness', 'eligible', 'score'):
+      self.assertIsInstance(results[rule], self.numpy.ndarray)
+
+
+class ScoreApplicantsCommandTestCase(TestCase):
+  def test_command(self):
+    list(ApplicantIngest().ingest([make_record(), make_record(birthday='2010-01-01')]))
+
+    stdout = StringIO()
+    call_command('score_applicants', as_of='2018-01-01', stdout=stdout, stderr=StringIO())
+
+    rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    self.assertEqual(sorted(r['score'] for r in rows), [50.0, 100.0])
@@ -0,0 +1,162 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+from io import StringIO
+from uuid import UUID
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api import search
+from api.ingest import ApplicantIngest
+from api.models import ApplicantTerm, Session
+from api.sessions.backends.custom_db import SessionStore
+from api.test_ingest import make_record
+from api.value_objects import ApplicantObject
+
+
+class ApplicantSearchTestCase(TestCase):
+  def setUp(self):
+    super(ApplicantSearchTestCase, self).setUp()
+
+    results = list(ApplicantIngest().ingest([
+      make_record(),
+      make_record(first_name='Marion', last_name='Ravenwood', gender='f', email='marion@ravenwood.np'),
+      make_record(first_name='Marcus', last_name='Brodie', email='brodie@example.com'),
+    ]))
+
+    self.brody, self.marion, self.brodie = [r['session_key'] for r in results]
+
+    # Results identify sessions by an opaque ID.
+    self.ids = {search.get_result_id(UUID(r['session_key'])): r['session_key'] for r in results}
+
+  def keys(self, query, **kwargs):
+    return [self.ids[r['id']] for r in search.search(query, **kwargs)['results']]
+
+  def test_prefix(self):
+    """
+    Values that start with the query match, ranked by the number of fields that matched.
+    """
+    # Brodie's email matches too.
+    self.assertEqual(self.keys('BROD'), [self.brodie, self.brody])
+    self.assertEqual(self.keys('marcus.brody@'), [self.brody])
+    self.assertEqual(set(self.keys('marcus brod')), {self.brody, self.brodie})
+    self.assertEqual(self.keys('ravenwood marion'), [])
+    self.assertEqual(self.keys('indiana'), [])
+    self.assertEqual(self.keys('  '), [])
+
+  def test_fuzzy(self):
+    """
+    Fuzzy matching finds values that are similar to the query.
+    """
+    self.assertEqual(self.keys('ravenwod', fuzzy=True), [self.marion])
+    self.assertEqual(set(self.keys('brodey', fuzzy=True)), {self.brody, self.brodie})
+    self.assertEqual(self.keys('ravenwod'), [])
+
+  def test_fuzzy_limit(self):
+    """
+    The most common query trigrams are not scored if there would be too many index terms to score.
+    """
+    max_terms, search.MAX_FUZZY_TERMS = search.MAX_FUZZY_TERMS, 5
+
+    try:
+      # "on " is only in Marion's first name and full name (2 terms); the next rarest ones ("ari", "ion", etc.) are in
+      #   her email as well (3 terms), so only one more fits.
+      self.assertEqual(search._select_trigrams(search.trigrams('marion')), ['on ', 'ari'])
+      self.assertEqual(self.keys('marion', fuzzy=True), [self.marion])
+    finally:
+      search.MAX_FUZZY_TERMS = max_terms
+
+  def test_projection(self):
+    """
+    Results contain the applicants' public values.
+    """
+    result = search.search('ravenwood')['results'][0]
+
+    self.assertEqual(self.ids[result['id']], self.marion)
+    self.assertNotIn(self.marion, json.dumps(result))
+    self.assertEqual(result['applicant'], ApplicantObject.hydrate({
+      'first_name': 'Marion',
+      'last_name':  'Ravenwood',
+      'gender':     'f',
+      'birthday':   '1900-08-13',
+      'email':      'marion@ravenwood.np',
+    }).get_public_values())
+
+  def test_pagination(self):
+    first   = search.search('mar', page_size=2)
+    second  = search.search('mar', page=first['next_page'], page_size=2)
+
+    self.assertEqual(len(first['results']), 2)
+    self.assertEqual(len(second['results']), 1)
+    self.assertIsNone(second['next_page'])
+
+    self.assertEqual(
+      len({r['id'] for r in first['results'] + second['results']}),
+      3,
+    )
+
+  def test_session_store(self):
+    """
+    The index is updated when the applicant values in a session change.
+    """
+    store = SessionStore(self.brody)
+    store.set_applicant_vo(ApplicantObject({'last_name': 'Jones', 'email': 'indy@marshall.edu'}))
+    store.save()
+
+    self.assertEqual(self.keys('jones'), [self.brody])
+    self.assertNotIn(self.brody, self.keys('brody'))
+
+    # Saving other session values does not touch the index.
+    store = SessionStore(self.brody)
+    store['foo'] = 'bar'
+    store.load()
+
+    with CaptureQueriesContext(connection) as queries:
+      store.save()
+
+    statements = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+    self.assertEqual(len(statements), 1)
+    self.assertIn('UPDATE', statements[0])
+
+    # Deleting the session removes it from the index.
+    store.delete()
+    self.assertEqual(self.keys('jones'), [])
+
+  def test_rebuild(self):
+    ApplicantTerm.objects.all().delete()
+    Session.objects.filter(session_key=self.marion).update(session_data={'applicant': {'last_name': 'Jones'}})
+
+    stdout = StringIO()
+    call_command('rebuild_applicant_index', batch_size=2, stdout=stdout)
+
+    self.assertIn('Indexed 3 sessions.', stdout.getvalue())
+    self.assertEqual(self.keys('jones'), [self.marion])
+    self.assertEqual(self.keys('brod'), [self.brodie, self.brody])
+
+  def test_view(self):
+    """
+    Only staff users can search.
+    """
+    url = reverse('applicant-search')
+
+    self.assertEqual(self.client.get(url, {'q': 'brody'}).status_code, 403)
+
+    user = User.objects.create_user('sallah', password='cairo')
+    self.client.login(username='sallah', password='cairo')
+    self.assertEqual(self.client.get(url, {'q': 'brody'}).status_code, 403)
+
+    User.objects.filter(pk=user.pk).update(is_staff=True)
+
+    response = self.client.get(url, {'q': 'ravenwod', 'fuzzy': '1'})
+    self.assertEqual(response.status_code, 200)
+
+    results = json.loads(response.content.decode('utf-8'))['results']
+    self.assertEqual([self.ids[r['id']] for r in results], [self.marion])
+
+    self.assertEqual(self.client.get(url, {'q': 'brody', 'page': 'x'}).status_code, 400)
@@ -0,0 +1,336 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from datetime import date
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.metrics import session_save_conflicts
+from api.models import Session
+from api.sessions.backends.custom_db import SessionConflict, SessionStore
+from api.value_objects import ApplicantObject
+
+
+class SessionStoreTestCase(TestCase):
+    """
+    Tests for the custom session store.
+    """
+    def test_invalid_session_key(self):
+        """
+        Malformed session keys are never looked up in the database.
+        """
+        store = SessionStore('not-a-uuid')
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(store.get('applicant'))
+            self.assertFalse(store.exists())
+
+        self.assertIsNone(store.session_key)
+        self.assertFalse(store.touched_db)
+
+    def test_touched_db(self):
+        """
+        The store keeps track of whether it has queried the database.
+        """
+        store = SessionStore()
+        store.get('applicant')
+        self.assertFalse(store.touched_db)
+
+        store['foo'] = 'bar'
+        store.save()
+        self.assertTrue(store.touched_db)
+
+        store = SessionStore(store.session_key)
+        self.assertEqual(store['foo'], 'bar')
+        self.assertEqual(store.db_queries, 1)
+
+    def test_has_changes(self):
+        """
+        Writing the same values back to the session does not count as a change.
+        """
+        store = SessionStore()
+        store['foo'] = 'bar'
+        self.assertTrue(store.has_changes())
+        store.save()
+
+        store = SessionStore(store.session_key)
+        store['foo'] = 'bar'
+        self.assertTrue(store.modified)
+        self.assertFalse(store.has_changes())
+
+        store['foo'] = 'baz'
+        self.assertTrue(store.has_changes())
+
+    def test_save_new_session(self):
+        """
+        Saving a session that is known not to exist performs a single INSERT.
+        """
+        store = SessionStore()
+        store['foo'] = 'bar'
+
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+
+        statements = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('INSERT', statements[0])
+
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class ApplicantColumnsTestCase(TestCase):
+    """
+    Indexed copies of applicant values, for looking up sessions.
+    """
+    def save_applicant(self, **values):
+        store = SessionStore()
+        store.set_applicant_vo(ApplicantObject(values))
+        store.save()
+        return store.session_key
+
+    def test_save(self):
+        """
+        The columns are updated whenever the session is saved.
+        """
+        store = SessionStore()
+        store.set_applicant_vo(ApplicantObject({
+            'last_name':    'Brody',
+            'birthday':     date(1900, 8, 13),
+            'email':        ' Marcus.Brody@Marshall.edu',
+        }))
+        store.save()
+
+        session = Session.objects.get()
+        self.assertEqual(session.applicant_email, 'marcus.brody@marshall.edu')
+        self.assertEqual(session.applicant_last_name, 'brody')
+        self.assertEqual(session.applicant_birthday, date(1900, 8, 13))
+
+        store['applicant'] = {}
+        store.save()
+
+        session = Session.objects.get()
+        self.assertIsNone(session.applicant_email)
+        self.assertIsNone(session.applicant_last_name)
+        self.assertIsNone(session.applicant_birthday)
+
+    def test_filter_applicant(self):
+        """
+        Sessions can be found by applicant values, using the same normalization.
+        """
+        brody = self.save_applicant(last_name='Brody', email='marcus.brody@marshall.edu', birthday=date(1900, 8, 13))
+        self.save_applicant(last_name='Brodie', email='brodie@example.com', birthday=date(1900, 8, 13))
+        self.save_applicant(last_name='Jones', email='indy@marshall.edu')
+
+        def keys(**kwargs):
+            return {s.session_key.hex for s in Session.objects.filter_applicant(**kwargs)}
+
+        self.assertEqual(keys(email='Marcus.Brody@Marshall.edu'), {brody})
+        self.assertEqual(keys(last_name='BRODY'), {brody})
+        self.assertEqual(len(keys(last_name='brod', last_name_prefix=True)), 2)
+        self.assertEqual(len(keys(birthday=date(1900, 8, 13))), 2)
+        self.assertEqual(keys(last_name='brody', birthday=date(1900, 8, 13)), {brody})
+
+    def test_backfill(self):
+        """
+        The migration populates the columns for existing sessions.
+        """
+        key = self.save_applicant(last_name='Brody', email='marcus.brody@marshall.edu')
+        other = self.save_applicant(last_name='Jones', birthday=date(1899, 7, 1))
+        Session.objects.update(applicant_email=None, applicant_last_name=None, applicant_birthday=None)
+
+        migration = import_module('api.migrations.0002_session_applicant_columns')
+
+        class SchemaEditor(object):
+            connection = connection
+
+        # Select the batch, update it, then find that there are no more sessions.
+        with self.assertNumQueries(3):
+            migration.backfill_applicant_columns(apps, SchemaEditor())
+
+        session = Session.objects.get(session_key=key)
+        self.assertEqual(session.applicant_email, 'marcus.brody@marshall.edu')
+        self.assertEqual(session.applicant_last_name, 'brody')
+        self.assertIsNone(session.applicant_birthday)
+
+        session = Session.objects.get(session_key=other)
+        self.assertIsNone(session.applicant_email)
+        self.assertEqual(session.applicant_last_name, 'jones')
+        self.assertEqual(session.applicant_birthday, date(1899, 7, 1))
+
+
+class ConcurrentSaveTestCase(TestCase):
+    """
+    Sessions that are written to by concurrent requests.
+    """
+    def setUp(self):
+        super(ConcurrentSaveTestCase, self).setUp()
+        session_save_conflicts.reset()
+
+        store = SessionStore()
+        store.set_applicant_vo(ApplicantObject({'first_name': 'Marcus', 'last_name': 'Brody'}))
+        store['step'] = 1
+        store.save()
+
+        self.session_key = store.session_key
+
+    def test_version(self):
+        """
+        Every save increments the version.
+        """
+        store = SessionStore(self.session_key)
+        store['step'] = 2
+        store.save()
+
+        self.assertEqual(Session.objects.get().version, 1)
+
+        store['step'] = 3
+        store.save()
+
+        self.assertEqual(Session.objects.get().version, 2)
+
+    def test_merge(self):
+        """
+        If the session was saved since it was loaded, changes are merged into the stored values instead of replacing
+            them.
+        """
+        first   = SessionStore(self.session_key)
+        second  = SessionStore(self.session_key)
+
+        first.update_applicant_vo(ApplicantObject({'email': 'marcus.brody@marshall.edu'}))
+        second.update_applicant_vo(ApplicantObject({'first_name': 'Marcus Aurelius'}))
+        second['step'] = 2
+
+        first.save()
+        second.save()
+
+        session = Session.objects.get()
+
+        self.assertEqual(session.version, 2)
+        self.assertEqual(session.session_data['step'], 2)
+        self.assertEqual(session.applicant_vo, ApplicantObject({
+            'first_name':   'Marcus Aurelius',
+            'last_name':    'Brody',
+            'email':        'marcus.brody@marshall.edu',
+        }))
+        self.assertEqual(session.applicant_email, 'marcus.brody@marshall.edu')
+
+        # The store carries on from the merged values.
+        self.assertEqual(second.get_applicant_vo().email, 'marcus.brody@marshall.edu')
+        self.assertDictEqual(session_save_conflicts.collect(), {('merged',): 1})
+
+    def test_unchanged_keys(self):
+        """
+        Keys that were not changed since the session was loaded keep their stored values.
+        """
+        first   = SessionStore(self.session_key)
+        second  = SessionStore(self.session_key)
+
+        first['step'] = 2
+        first.save()
+
+        second['foo'] = 'bar'
+        second.save()
+
+        session_data = Session.objects.get().session_data
+        self.assertEqual(session_data['step'], 2)
+        self.assertEqual(session_data['foo'], 'bar')
+
+    def test_nested_changes(self):
+        """
+        Nested values that were changed in place are saved, even if the session was written to in the meantime.
+        """
+        store = SessionStore(self.session_key)
+        store['prefs'] = {'theme': 'light'}
+        store.save()
+
+        first   = SessionStore(self.session_key)
+        second  = SessionStore(self.session_key)
+
+        first['prefs']['theme'] = 'dark'
+        first.modified = True
+
+        second['step'] = 2
+        second.save()
+
+        first.save()
+
+        session_data = Session.objects.get().session_data
+        self.assertEqual(session_data['prefs'], {'theme': 'dark'})
+        self.assertEqual(session_data['step'], 2)
+
+    def test_retries_exhausted(self):
+        """
+        The save gives up if the session keeps being written to.
+        """
+        store = SessionStore(self.session_key)
+        store['step'] = 2
+        store.load()
+
+        Session.objects.update(version=5)
+
+        with override_settings(SESSION_SAVE_MAX_RETRIES=0), self.assertRaises(SessionConflict):
+            store.save()
+
+        self.assertEqual(Session.objects.get().session_data['step'], 1)
+        self.assertDictEqual(session_save_conflicts.collect(), {('failed',): 1})
+
+    def test_deleted(self):
+        """
+        If the session was deleted since it was loaded, it is recreated.
+        """
+        store = SessionStore(self.session_key)
+        store['step'] = 2
+        store.load()
+
+        Session.objects.all().delete()
+        store.save()
+
+        self.assertEqual(Session.objects.get().session_data['step'], 2)
+
+
+class LazySessionMiddlewareTestCase(TestCase):
+    """
+    Tests for the lazy session middleware.
+    """
+    def test_no_cookie(self):
+        """
+        Requests without a session cookie that don't write to the session never touch the database.
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('applicant'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_invalid_cookie(self):
+        """
+        Session cookies that can't possibly be valid are discarded without querying the database.
+        """
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'garbage'
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('applicant'))
+
+        self.assertEqual(response.status_code, 200)
+
+        # The client is told to delete the cookie.
+        self.assertEqual(response.cookies[settings.SESSION_COOKIE_NAME].value, '')
+
+    def test_read_only_request(self):
+        """
+        Requests that only read from the session load it once, and do not save it.
+        """
+        session = self.client.session
+        session['foo'] = 'bar'
+        session.save()
+
+        # Load once, but don't save.
+        with self.assertNumQueries(1):
+            self.client.get(reverse('applicant'))
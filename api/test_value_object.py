@@ -1,13 +1,22 @@
 # coding=utf-8
 from __future__ import absolute_import, unicode_literals
 
+import gc
+import json
+import os
 from datetime import date, datetime
 from decimal import Decimal
+from io import BytesIO
+from shutil import rmtree
+from tempfile import mkdtemp
 from django.test import TestCase
 
 from pytz import utc
 from api.value_object import fields
-from api.value_object.base import BaseValueObject
+from api.value_object.base import BaseValueObject, ValueObjectMeta
+from api.value_object.blobs import BlobReference, FileSystemBlobStore
+from api.value_object.interning import InterningPool
+from api.value_object.parallel import ParallelBatch
 
 
 class SimpleTestValueObject(BaseValueObject):
@@ -998,4 +1007,709 @@ class FieldVisibilityTestCase(TestCase):
         self.assertDictEqual(
             obj.get_public_values('public_collection', 'public_nested', 'private_collection'),
             {},
-        )
\ No newline at end of file
+        )
+
+class TestLazyApplicantObject(BaseValueObject):
+    name        = fields.Primitive()
+    addresses   = fields.LazyCollection(TestAddressObject)
+    """:type: api.value_object.fields.LazyCollectionValue"""
+    dates       = fields.LazyCollection(fields.Date, public={'TMP', 'WOK'})
+    """:type: api.value_object.fields.LazyCollectionValue"""
+
+class LazyCollectionTestCase(TestCase):
+    """
+    Collections whose items are only hydrated when accessed.
+    """
+    def setUp(self):
+        super(LazyCollectionTestCase, self).setUp()
+
+        self.dehydrated = {
+            'name': 'Marcus',
+
+            'addresses': {
+                'home':     {'street': '740 Evergreen Terrace'},
+                'work':     {'street': '112½ Beacon Street'},
+                'branch':   {'street': '12 Grimmauld Place'},
+            },
+
+            'dates': {
+                'TMP':  '1979-12-07',
+                'WOK':  '1982-06-04',
+                'S4S':  '1984-06-01',
+            },
+        }
+
+    def test_hydrate(self):
+        """
+        Items are hydrated one at a time, as they are accessed.
+        """
+        obj = TestLazyApplicantObject.hydrate(self.dehydrated)
+
+        self.assertIsInstance(obj.addresses, fields.LazyCollectionValue)
+        self.assertEqual(obj.addresses.hydrated_count, 0)
+
+        # Checking keys does not hydrate anything.
+        self.assertEqual(len(obj.addresses), 3)
+        self.assertIn('home', obj.addresses)
+        self.assertNotIn('foo', obj.addresses)
+        self.assertEqual(sorted(obj.addresses), ['branch', 'home', 'work'])
+        self.assertEqual(obj.addresses.hydrated_count, 0)
+
+        self.assertIsInstance(obj.addresses['home'], TestAddressObject)
+        self.assertEqual(obj.addresses['home'].street, '740 Evergreen Terrace')
+        self.assertIs(obj.addresses['home'], obj.addresses['home'])
+        self.assertEqual(obj.addresses.hydrated_count, 1)
+
+        self.assertEqual(obj.dates['TMP'], date(1979, 12, 7))
+
+        with self.assertRaises(KeyError):
+            # noinspection PyStatementEffect
+            obj.addresses['foo']
+
+    def test_window(self):
+        """
+        Slicing a collection only hydrates the items in the slice.
+        """
+        obj = TestLazyApplicantObject.hydrate(self.dehydrated)
+
+        keys    = list(obj.addresses)
+        window  = obj.addresses.window(1, 2)
+
+        self.assertEqual([k for k, _ in window], keys[1:2])
+        self.assertIsInstance(window[0][1], TestAddressObject)
+        self.assertEqual(obj.addresses.hydrated_count, 1)
+
+    def test_dehydrate(self):
+        """
+        Only the items that were accessed are dehydrated again.
+        """
+        obj = TestLazyApplicantObject.hydrate(self.dehydrated)
+        obj.addresses['home'].update(TestAddressObject({'street': '742 Evergreen Terrace'}))
+        obj.addresses['new'] = TestAddressObject({'street': '221B Baker Street'})
+        del obj.addresses['branch']
+
+        dehydrated = obj.dehydrate()
+
+        self.assertDictEqual(dehydrated['addresses'], {
+            'home': {'street': '742 Evergreen Terrace'},
+            'work': {'street': '112½ Beacon Street'},
+            'new':  {'street': '221B Baker Street'},
+        })
+
+        # Untouched items are copied over as-is.
+        self.assertIs(dehydrated['addresses']['work'], self.dehydrated['addresses']['work'])
+
+        self.assertDictEqual(dehydrated['dates'], self.dehydrated['dates'])
+
+    def test_construct(self):
+        """
+        Lazy collections can also be initialized from hydrated values.
+        """
+        obj = TestLazyApplicantObject({
+            'name':         'Marcus',
+            'addresses':    {'home': {'street': '740 Evergreen Terrace'}},
+            'dates':        None,
+        })
+
+        self.assertIsInstance(obj.addresses['home'], TestAddressObject)
+        self.assertEqual(len(obj.dates), 0)
+
+        self.assertDictEqual(obj.dehydrate(), {
+            'name':         'Marcus',
+            'addresses':    {'home': {'street': '740 Evergreen Terrace'}},
+            'dates':        {},
+        })
+
+    def test_update(self):
+        """
+        Merging only hydrates the items that are being merged.
+        """
+        obj = TestLazyApplicantObject.hydrate(self.dehydrated)
+
+        obj.update(TestLazyApplicantObject({
+            'addresses': {
+                'work':     {'street': '221B Baker Street'},
+                'branch':   {'street': None},
+            },
+        }))
+
+        self.assertEqual(obj.addresses.hydrated_count, 2)
+        self.assertEqual(obj.addresses['work'].street, '221B Baker Street')
+        self.assertEqual(obj.addresses['branch'].street, '12 Grimmauld Place')
+        self.assertEqual(obj.addresses['home'].street, '740 Evergreen Terrace')
+
+    def test_public_values(self):
+        """
+        Generating public values does not keep hydrated items around.
+        """
+        obj = TestLazyApplicantObject.hydrate(self.dehydrated)
+
+        self.assertDictEqual(obj.get_public_values(), {
+            'name': 'Marcus',
+
+            'addresses': {
+                'home':     {'street': '740 Evergreen Terrace'},
+                'work':     {'street': '112½ Beacon Street'},
+                'branch':   {'street': '12 Grimmauld Place'},
+            },
+
+            'dates': {
+                'TMP':  '1979-12-07',
+                'WOK':  '1982-06-04',
+            },
+        })
+
+        self.assertEqual(obj.addresses.hydrated_count, 0)
+        self.assertEqual(obj.dates.hydrated_count, 0)
+
+
+class SinglePassDecoderTestCase(TestCase):
+    """
+    Hydrating value objects directly from JSON.
+    """
+    def setUp(self):
+        super(SinglePassDecoderTestCase, self).setUp()
+
+        self.dehydrated = {
+            'name': 'Marcus',
+            'loan': {
+                'amount':   10000,
+            },
+
+            'addresses': {
+                'home':     {
+                    'street':   '740 Evergreen Terrace',
+                },
+
+                'work':     {
+                    'street':   '112½ Beacon Street',
+                },
+            },
+        }
+
+    def test_hydrate_json(self):
+        """
+        Decoding JSON gives the same result as decoding it into a dict and then hydrating.
+        """
+        raw = json.dumps(self.dehydrated)
+
+        obj = TestApplicantObject.hydrate_json(raw)
+
+        self.assertIsInstance(obj, TestApplicantObject)
+        self.assertIsInstance(obj.loan, TestLoanObject)
+        self.assertIsInstance(obj.addresses['home'], TestAddressObject)
+        self.assertDictEqual(obj.dehydrate(), TestApplicantObject.hydrate(json.loads(raw)).dehydrate())
+
+    def test_typed_fields(self):
+        """
+        Leaf values are hydrated by their fields.
+        """
+        obj = ComplexTestValueObject.hydrate_json(
+            '{"simpleCollection": {"a": "Apple"}, "dateCollection": {"TMP": "1979-12-07"}}',
+        )
+
+        self.assertDictEqual(obj.simple, {'a': 'Apple'})
+        self.assertDictEqual(obj.dates, {'TMP': date(1979, 12, 7)})
+
+    def test_unknown_keys(self):
+        """
+        Keys that are not declared as fields are skipped.
+        """
+        obj = TestApplicantObject.hydrate_json(
+            '{"extra": {"a": [1, {"b": "}\\\\\\"]{"}], "c": null}, "name": "Marcus", "more": "\\"}", '
+            '"loan": {"amount": 10000, "rate": 1.5e-2}, "last": true}',
+        )
+
+        self.assertEqual(obj.name, 'Marcus')
+        self.assertEqual(obj.loan.amount, 10000)
+
+        # Missing fields are hydrated from null, same as with `hydrate`.
+        self.assertDictEqual(obj.addresses, {})
+
+    def test_path(self):
+        """
+        Decoding a value object nested inside a larger document.
+        """
+        raw = json.dumps({'_auth_user_id': 1, 'applicant': self.dehydrated, 'zzz': [1, 2]})
+
+        obj = TestApplicantObject.hydrate_json(raw, path=('applicant',))
+        self.assertEqual(obj.addresses['work'].street, '112½ Beacon Street')
+
+        # Missing or null values are treated like empty dicts.
+        for raw in ('{}', '{"applicant": null}', 'null'):
+            obj = TestApplicantObject.hydrate_json(raw, path=('applicant',))
+            self.assertIsNone(obj.name)
+            self.assertIsInstance(obj.loan, TestLoanObject)
+
+    def test_sources(self):
+        """
+        JSON can be provided as text, bytes, buffers or file-like objects.
+        """
+        raw = json.dumps(self.dehydrated).encode('utf-8')
+
+        for data in (raw.decode('utf-8'), raw, bytearray(raw), memoryview(raw), BytesIO(raw)):
+            self.assertEqual(TestApplicantObject.hydrate_json(data).name, 'Marcus')
+
+    def test_ndjson(self):
+        """
+        Decoding one value object per line.
+        """
+        from api.value_object.single_pass import get_decoder
+
+        lines = BytesIO(b'{"name": "Marcus"}\n\n{"name": "Indiana"}\n')
+
+        self.assertEqual(
+            [obj.name for obj in get_decoder(TestApplicantObject).iter_decode(lines)],
+            ['Marcus', 'Indiana'],
+        )
+
+    def test_lazy_collection(self):
+        """
+        Lazy collection items are left dehydrated.
+        """
+        obj = TestLazyApplicantObject.hydrate_json(
+            '{"name": "Marcus", "addresses": {"home": {"street": "740 Evergreen Terrace"}}}',
+        )
+
+        self.assertEqual(obj.addresses.hydrated_count, 0)
+        self.assertEqual(obj.addresses['home'].street, '740 Evergreen Terrace')
+
+    def test_invalid(self):
+        """
+        Invalid JSON raises a ValueError, same as `json.loads`.
+        """
+        for raw in ('', '[]', '{"name": "Marcus"', '{"name" "Marcus"}', '{"name": "Marcus",}', '{} []', '{"x": }'):
+            with self.assertRaises(ValueError, msg=raw):
+                TestApplicantObject.hydrate_json(raw)
+
+    def test_invalid_skipped_values(self):
+        """
+        Skipped values are never decoded, but they are still validated against the JSON grammar.
+        """
+        for raw in (
+            '{"zzz": garbage, "name": "Marcus"}',
+            '{"loan": {"amount": 10000, "junk": nul}}',
+            '{"x": truex}',
+            '{"x": True}',
+            '{"x": NaN}',
+            '{"x": -}',
+            '{"x": 01}',
+            '{"x": 1.}',
+            '{"x": .5}',
+            '{"x": 1e}',
+            '{"x": 12abc}',
+        ):
+            with self.assertRaises(ValueError, msg=raw):
+                TestApplicantObject.hydrate_json(raw)
+
+        # Valid scalars are still skipped.
+        obj = TestApplicantObject.hydrate_json('{"a": -0.5E+3, "b": 0, "c": false, "d": null, "name": "Marcus"}')
+        self.assertEqual(obj.name, 'Marcus')
+
+
+class TestFixedPointLoanObject(BaseValueObject):
+    amount  = fields.FixedPoint(scale=2)
+    rate    = fields.FixedPoint(scale=4, public=False)
+
+class FixedPointTestCase(TestCase):
+    """
+    Decimal amounts stored as scaled integers.
+    """
+    def test_construct(self):
+        """
+        Amounts (including integers) are converted to units, unless they are explicitly given in units.
+        """
+        obj = TestFixedPointLoanObject({
+            'amount':   Decimal('1234.56'),
+            'rate':     '0.0525',
+        })
+
+        self.assertEqual(obj.amount, 123456)
+        self.assertEqual(obj.rate, 525)
+
+        self.assertEqual(TestFixedPointLoanObject({'amount': 1234}).amount, 123400)
+        self.assertEqual(TestFixedPointLoanObject({'amount': fields.Units(123456)}).amount, 123456)
+        self.assertEqual(TestFixedPointLoanObject({'amount': 0.1}).amount, 10)
+        self.assertIsNone(TestFixedPointLoanObject({}).amount)
+
+        # Extra decimal places are rounded.
+        self.assertEqual(TestFixedPointLoanObject({'amount': Decimal('0.125')}).amount, 12)
+        self.assertEqual(TestFixedPointLoanObject({'amount': Decimal('0.135')}).amount, 14)
+
+    def test_dehydrate(self):
+        """
+        Amounts are dehydrated as integers, and only converted to decimals in public values.
+        """
+        obj = TestFixedPointLoanObject({
+            'amount':   Decimal('-1234.5'),
+            'rate':     Decimal('0.0525'),
+        })
+
+        self.assertDictEqual(obj.dehydrate(), {'amount': -123450, 'rate': 525})
+        self.assertDictEqual(obj.get_public_values(), {'amount': '-1234.50'})
+
+        self.assertEqual(TestFixedPointLoanObject.hydrate(obj.dehydrate()).amount, -123450)
+        self.assertEqual(TestFixedPointLoanObject.hydrate_json(json.dumps(obj.dehydrate())).amount, -123450)
+        self.assertEqual(obj.copy(), obj)
+
+    def test_aggregate(self):
+        """
+        Aggregating amounts without converting each one to a decimal.
+        """
+        field   = TestFixedPointLoanObject.fields['amount']
+        values  = [123456, None, 100, -50]
+
+        self.assertDictEqual(field.aggregate(values), {
+            'count':    3,
+            'sum':      Decimal('1235.06'),
+            'min':      Decimal('-0.50'),
+            'max':      Decimal('1234.56'),
+        })
+
+        self.assertDictEqual(field.aggregate(field.to_array([v for v in values if v is not None])), {
+            'count':    3,
+            'sum':      Decimal('1235.06'),
+            'min':      Decimal('-0.50'),
+            'max':      Decimal('1234.56'),
+        })
+
+        self.assertDictEqual(field.aggregate([]), {'count': 0, 'sum': Decimal('0.00'), 'min': None, 'max': None})
+
+
+class BinaryTestCase(TestCase):
+    """
+    Binary payloads, optionally kept in a blob store.
+    """
+    def setUp(self):
+        super(BinaryTestCase, self).setUp()
+
+        self.directory = mkdtemp()
+        self.addCleanup(rmtree, self.directory)
+
+        self.store = FileSystemBlobStore(self.directory)
+
+        self.vo_type = ValueObjectMeta(str('TestDocumentObject'), (BaseValueObject,), {
+            'name':         fields.Primitive(),
+            'thumbnail':    fields.Binary(),
+            'scan':         fields.Binary(store=lambda: self.store, spill_threshold=16, public=False),
+        })
+
+    def test_construct(self):
+        """
+        Bytes-like values are stored without copying them.
+        """
+        buf = bytearray(b'\x89PNG\r\n')
+        obj = self.vo_type({'thumbnail': buf, 'scan': memoryview(buf)})
+
+        self.assertIs(obj.thumbnail, buf)
+        self.assertIsInstance(obj.scan, memoryview)
+
+        with self.assertRaises(TypeError):
+            self.vo_type({'thumbnail': 'not bytes'})
+
+    def test_round_trip(self):
+        """
+        Small payloads are encoded in the dehydrated values.
+        """
+        payload = bytes(bytearray(range(256)))
+        obj     = self.vo_type({'thumbnail': payload, 'scan': b'small'})
+
+        dehydrated = json.loads(json.dumps(obj.dehydrate()))
+        self.assertNotIsInstance(dehydrated['scan'], dict)
+
+        hydrated = self.vo_type.hydrate(dehydrated)
+        self.assertEqual(hydrated.thumbnail, payload)
+        self.assertEqual(hydrated.scan, b'small')
+        self.assertEqual(self.vo_type.hydrate_json(json.dumps(dehydrated)).thumbnail, payload)
+
+        self.assertIsNone(self.vo_type.hydrate({}).thumbnail)
+
+    def test_public_values(self):
+        """
+        Public values use standard base64.
+        """
+        obj = self.vo_type({'thumbnail': b'\x00\xff', 'scan': b'secret'})
+        self.assertDictEqual(obj.get_public_values(), {'name': None, 'thumbnail': 'AP8='})
+
+    def test_spill(self):
+        """
+        Large payloads are moved to the blob store; only a reference is kept in the dehydrated values.
+        """
+        payload = memoryview(b'0123456789' * 10)
+        obj     = self.vo_type({'scan': payload})
+
+        dehydrated = obj.dehydrate()
+        self.assertDictEqual(dehydrated['scan'], {'blob': dehydrated['scan']['blob'], 'size': 100})
+
+        hydrated = self.vo_type.hydrate(dehydrated)
+        self.assertIsInstance(hydrated.scan, BlobReference)
+        self.assertEqual(len(hydrated.scan), 100)
+        self.assertEqual(hydrated.scan.read(), payload.tobytes())
+
+        # References are dehydrated as-is; the payload is not loaded or stored again.
+        self.assertDictEqual(hydrated.dehydrate()['scan'], dehydrated['scan'])
+
+        # Identical payloads are only stored once.
+        self.assertEqual(self.vo_type({'scan': payload.tobytes()}).dehydrate()['scan'], dehydrated['scan'])
+
+    def test_invalid_key(self):
+        """
+        Blob references must contain a valid key.
+        """
+        hydrated = self.vo_type.hydrate({'scan': {'blob': '../../etc/passwd', 'size': 100}})
+
+        with self.assertRaises(ValueError):
+            hydrated.scan.read()
+
+    def test_collect_garbage(self):
+        """
+        Blobs that are no longer referenced are deleted, unless they were stored recently.
+        """
+        kept    = self.store.put(b'kept')
+        orphan  = self.store.put(b'orphan')
+
+        self.assertEqual(self.store.collect_garbage({kept}), 0)
+        self.assertEqual(self.store.collect_garbage({kept}, min_age=-1), 1)
+
+        self.assertTrue(os.path.exists(self.store.get_path(kept)))
+        self.assertFalse(os.path.exists(self.store.get_path(orphan)))
+
+
+class TestChoiceObject(BaseValueObject):
+    size = fields.Choice((('s', 'Small'), ('m', 'Medium'), ('l', 'Large')))
+
+class ChoiceTestCase(TestCase):
+    """
+    Fields restricted to a fixed set of codes.
+    """
+    def test_construct(self):
+        """
+        Values are replaced with the field's canonical instance of each code.
+        """
+        code = ''.join(['s'])
+        obj  = TestChoiceObject({'size': code})
+
+        self.assertEqual(obj.size, 's')
+        self.assertIs(obj.size, TestChoiceObject({'size': 's'}).size)
+        self.assertIsNone(TestChoiceObject({}).size)
+
+        with self.assertRaises(ValueError):
+            TestChoiceObject({'size': 'xl'})
+
+    def test_round_trip(self):
+        """
+        Codes are dehydrated as-is; unknown codes are dropped when hydrating.
+        """
+        obj = TestChoiceObject({'size': 'm'})
+
+        self.assertDictEqual(obj.dehydrate(), {'size': 'm'})
+        self.assertDictEqual(obj.get_public_values(), {'size': 'm'})
+        self.assertIs(TestChoiceObject.hydrate(json.loads('{"size": "m"}')).size, obj.size)
+        self.assertIs(TestChoiceObject.hydrate_json('{"size": "m"}').size, obj.size)
+
+        self.assertIsNone(TestChoiceObject.hydrate({'size': 'xl'}).size)
+
+    def test_choices(self):
+        """
+        Choices and labels are exposed (e.g., for forms).
+        """
+        field = TestChoiceObject.fields['size']
+
+        self.assertEqual(field.choices, (('s', 'Small'), ('m', 'Medium'), ('l', 'Large')))
+        self.assertEqual(field.get_label('l'), 'Large')
+
+
+class EqualityTestCase(TestCase):
+    """
+    Structural equality and hashing.
+    """
+    values = {
+        'name':         'Marcus',
+        'loan':         {'amount': 10000},
+        'addresses':    {'home': {'street': '740 Evergreen Terrace'}},
+    }
+
+    def test_equality(self):
+        """
+        Value objects of the same type with equal values are equal.
+        """
+        obj = TestApplicantObject(self.values)
+
+        self.assertEqual(obj, TestApplicantObject(self.values))
+        self.assertEqual(obj, TestApplicantObject.hydrate(obj.dehydrate()))
+        self.assertFalse(obj != TestApplicantObject(self.values))
+
+        self.assertNotEqual(obj, TestApplicantObject(dict(self.values, name='Indiana')))
+        self.assertNotEqual(obj, TestApplicantObject(dict(self.values, addresses={})))
+        self.assertNotEqual(TestLoanObject({'amount': 1}), TestAddressObject({'street': 1}))
+        self.assertNotEqual(obj, obj.dehydrate())
+
+    def test_hash(self):
+        """
+        Equal value objects have equal hashes, so they can be used as dict keys and in sets.
+        """
+        obj = TestApplicantObject(self.values)
+
+        self.assertEqual(hash(obj), hash(TestApplicantObject(self.values)))
+        self.assertEqual(len({obj, TestApplicantObject(self.values), TestApplicantObject({})}), 2)
+
+        # Unhashable values are hashed structurally.
+        self.assertEqual(
+            hash(SimpleTestValueObject({'name': ['Marcus', {'x': 1}]})),
+            hash(SimpleTestValueObject({'name': ['Marcus', {'x': 1}]})),
+        )
+
+    def test_update_invalidates_hash(self):
+        """
+        The hash is cached until the value object is updated.
+        """
+        obj     = TestApplicantObject(self.values)
+        before  = hash(obj)
+
+        obj.update(TestApplicantObject({'loan': {'amount': 12000}}))
+
+        self.assertNotEqual(hash(obj), before)
+        self.assertEqual(hash(obj), hash(TestApplicantObject(dict(self.values, loan={'amount': 12000}))))
+        self.assertEqual(obj, TestApplicantObject(dict(self.values, loan={'amount': 12000})))
+
+    def test_lazy_collections(self):
+        """
+        Lazy collections are compared without hydrating their items.
+        """
+        dehydrated  = TestLazyApplicantObject(self.values).dehydrate()
+        a           = TestLazyApplicantObject.hydrate(dehydrated)
+        b           = TestLazyApplicantObject.hydrate(dehydrated)
+
+        self.assertEqual(a, b)
+        self.assertEqual(a.addresses.hydrated_count, 0)
+
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(hash(a), hash(TestLazyApplicantObject(self.values)))
+        self.assertEqual(a.addresses.hydrated_count, 0)
+
+        b.addresses['work'] = TestAddressObject({'street': '112½ Beacon Street'})
+        self.assertNotEqual(a, b)
+
+
+class InterningTestCase(TestCase):
+    """
+    Sharing identical nested value objects between value objects.
+    """
+    def make_rows(self, count):
+        return [
+            {
+                'name':         'Applicant {0}'.format(i),
+                'loan':         {'amount': 10000},
+                'addresses':    {'home': {'street': '{0} Beacon Street'.format(i % 2)}},
+            }
+                for i in range(count)
+        ]
+
+    def test_hydrate(self):
+        """
+        Identical nested value objects are hydrated into the same (frozen) instance.
+        """
+        pool        = InterningPool()
+        applicants  = [TestApplicantObject.hydrate(row, pool=pool) for row in self.make_rows(10)]
+
+        self.assertEqual(len({id(a.loan) for a in applicants}), 1)
+        self.assertEqual(len({id(a.addresses['home']) for a in applicants}), 2)
+        self.assertTrue(applicants[0].loan.is_frozen)
+
+        # The top-level value objects are not shared nor frozen.
+        self.assertEqual(len({id(a) for a in applicants}), 10)
+        self.assertFalse(applicants[0].is_frozen)
+
+        self.assertEqual(pool.hits, 17)
+        self.assertEqual(len(pool), 3)
+
+        # Values are the same as without a pool.
+        self.assertEqual(applicants[3], TestApplicantObject.hydrate(self.make_rows(10)[3]))
+        self.assertEqual(
+            TestApplicantObject.hydrate_json(json.dumps(self.make_rows(1)[0]), pool=pool).loan,
+            applicants[0].loan,
+        )
+
+    def test_update(self):
+        """
+        Updating a value object copies shared nested value objects instead of changing them for everyone.
+        """
+        pool    = InterningPool()
+        a, b    = [TestApplicantObject.hydrate(row, pool=pool) for row in self.make_rows(2)]
+        shared  = a.loan
+
+        a.update(TestApplicantObject({'loan': {'amount': 12000}}))
+
+        self.assertEqual(a.loan.amount, 12000)
+        self.assertFalse(a.loan.is_frozen)
+        self.assertIs(b.loan, shared)
+        self.assertEqual(shared.amount, 10000)
+
+        with self.assertRaises(TypeError):
+            shared.update(TestLoanObject({'amount': 1}))
+
+    def test_bounded(self):
+        """
+        The pool stops tracking new values when it is full, and releases values that are no longer used.
+        """
+        pool        = InterningPool(max_size=2)
+        applicants  = [TestApplicantObject.hydrate(row, pool=pool) for row in self.make_rows(4)]
+
+        self.assertEqual(len(pool), 2)
+        # The loan and the first address were added before the pool filled up; the second address was not.
+        self.assertIs(applicants[0].addresses['home'], applicants[2].addresses['home'])
+        self.assertIsNot(applicants[1].addresses['home'], applicants[3].addresses['home'])
+
+        del applicants
+        gc.collect()
+
+        self.assertEqual(len(pool), 0)
+
+
+def get_loan_amount(obj):
+    return obj.loan.amount
+
+class ParallelBatchTestCase(TestCase):
+    """
+    Processing batches of value objects in worker processes.
+    """
+    def make_items(self, count):
+        return [
+            {
+                'name':         'Applicant {0}'.format(i),
+                'loan':         {'amount': i},
+                'addresses':    {'home': {'street': '{0} Beacon Street'.format(i)}},
+            }
+                for i in range(count)
+        ]
+
+    def test_public_values(self):
+        """
+        Results are the same as processing each item in the current process, in the same order.
+        """
+        items   = self.make_items(25)
+        batch   = ParallelBatch(TestApplicantObject, workers=2, chunk_size=4, max_pending=2)
+
+        self.assertEqual(
+            list(batch.get_public_values(iter(items))),
+            [TestApplicantObject.hydrate(item).get_public_values() for item in items],
+        )
+
+        self.assertEqual(list(batch.dehydrate(items)), [TestApplicantObject(item).dehydrate() for item in items])
+        self.assertEqual(list(batch.map(get_loan_amount, items)), list(range(25)))
+
+    def test_raw_json(self):
+        """
+        Items can be JSON documents (e.g., raw session data), optionally with the values nested inside them.
+        """
+        items   = [json.dumps({'applicant': item}, indent=2) for item in self.make_items(5)]
+        batch   = ParallelBatch(TestApplicantObject, path=('applicant',), workers=0, chunk_size=2)
+
+        self.assertEqual(list(batch.map(get_loan_amount, items)), list(range(5)))
+        self.assertEqual(list(batch.map(get_loan_amount, [i.encode('utf-8') for i in items])), list(range(5)))
+
+        # Missing or null objects are hydrated as empty.
+        self.assertEqual(
+            list(batch.get_public_values(['{}', 'null', '{"applicant": null}'])),
+            [TestApplicantObject.hydrate({}).get_public_values()] * 3,
+        )
@@ -3,6 +3,7 @@ from __future__ import absolute_import, unicode_literals
 
 from datetime import date
 
+from django.core.cache import caches
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 
@@ -69,3 +70,43 @@ class ApplicantTestCase(TestCase):
       self.assertEqual(applicant.gender, 'f')
       self.assertEqual(applicant.birthday, date(1909, 3, 23))
       self.assertEqual(applicant.email, 'mravenwood1@aol.com')
+
+
+class ApplicantFragmentCacheTestCase(TestCase):
+  def setUp(self):
+      super(ApplicantFragmentCacheTestCase, self).setUp()
+
+      self.cache = caches['template_fragments']
+      """:type: api.cache.FragmentCache"""
+      self.cache.clear()
+      self.cache.hits = self.cache.misses = 0
+
+  def test_get_unchanged_session(self):
+      """
+      Repeated GET requests for an unchanged session reuse the rendered fragments.
+      """
+      first   = self.client.get(reverse('applicant'))
+      second  = self.client.get(reverse('applicant'))
+
+      self.assertEqual(first.content, second.content)
+
+      stats = self.cache.get_stats()
+      self.assertEqual(stats['misses'], 2)
+      self.assertEqual(stats['hits'], 2)
+
+  def test_digest_changes_with_applicant(self):
+      """
+      Changing the applicant data changes the digest used to key the summary fragment.
+      """
+      session = self.client.session
+      before  = session.get_applicant_digest()
+
+      session.set_applicant_vo(ApplicantObject({
+        'first_name': 'Marcus',
+        'last_name':  'Brody',
+        'gender':     'm',
+        'birthday':   date(1900, 8, 13),
+        'email':      'marcus.brody@marshall.edu',
+      }))
+
+      self.assertNotEqual(session.get_applicant_digest(), before)
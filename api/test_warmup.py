@@ -0,0 +1,37 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import gc
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from api.models import Session
+from exercise_misbehaving_app.warmup import warm_up
+from exercise_misbehaving_app.wsgi import application
+
+
+class WarmUpTestCase(TestCase):
+    def tearDown(self):
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+
+        caches['template_fragments'].clear()
+        super(WarmUpTestCase, self).tearDown()
+
+    def test_warm_up(self):
+        """
+        Warming up exercises each step without touching the database.
+        """
+        with self.assertNumQueries(0):
+            timings = warm_up(application, paths=['/applicant'])
+
+        self.assertEqual(
+            set(timings),
+            {'urls', 'templates', 'forms', 'value_objects', 'GET /applicant', 'close_connections', 'freeze'},
+        )
+
+        self.assertEqual(Session.objects.count(), 0)
+
+        if hasattr(gc, 'get_freeze_count'):
+            self.assertGreater(gc.get_freeze_count(), 0)
@@ -0,0 +1,160 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from api.metrics import session_write_behind
+from api.models import Session
+from api.sessions.backends.custom_db import SessionStore
+from api.sessions.write_behind import WriteBehindBuffer, get_buffer
+from api.value_objects import ApplicantObject
+
+
+class WriteBehindTestCase(TestCase):
+    """
+    Buffered session saves.
+    """
+    def setUp(self):
+        super(WriteBehindTestCase, self).setUp()
+        session_write_behind.reset()
+
+        self.directory = mkdtemp()
+
+        # Flushing is triggered manually (the test database is not visible to other threads).
+        self.settings = override_settings(SESSION_WRITE_BEHIND={
+            'ENABLED':          True,
+            'FLUSH_INTERVAL':   None,
+            'JOURNAL_DIR':      self.directory,
+        })
+        self.settings.enable()
+
+        store = SessionStore()
+        store.set_applicant_vo(ApplicantObject({'first_name': 'Marcus', 'last_name': 'Brody'}))
+        store.save()
+
+        self.session_key  = store.session_key
+        self.buffer       = get_buffer()
+
+    def tearDown(self):
+        self.buffer.close()
+        self.settings.disable()
+        rmtree(self.directory)
+
+        super(WriteBehindTestCase, self).tearDown()
+
+    def autosave(self, **values):
+        store = SessionStore(self.session_key)
+        store.update_applicant_vo(ApplicantObject(values))
+        store.save()
+        return store
+
+    def assert_recovered(self):
+        recovered = WriteBehindBuffer(flush_interval=None, journal_dir=self.directory)
+        recovered._ensure_started()
+
+        self.assertEqual(recovered.flush(), 1)
+        self.assertEqual(Session.objects.get().applicant_vo.email, 'marcus.brody@marshall.edu')
+        self.assertListEqual(os.listdir(self.directory), [os.path.basename(recovered._journal)])
+
+    def test_coalesce(self):
+        """
+        Successive saves are merged in memory and written once.
+        """
+        self.autosave(email='marcus@')
+        self.autosave(email='marcus.brody@marshall.edu')
+        store = self.autosave(gender='m')
+
+        # Later requests read the buffered values instead of querying the database.
+        self.assertEqual(store.db_queries, 0)
+        self.assertEqual(store.get_applicant_vo().email, 'marcus.brody@marshall.edu')
+        self.assertEqual(Session.objects.get().version, 0)
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        session = Session.objects.get()
+        self.assertEqual(session.version, 1)
+        self.assertEqual(session.applicant_vo, ApplicantObject({
+            'first_name':   'Marcus',
+            'last_name':    'Brody',
+            'gender':       'm',
+            'email':        'marcus.brody@marshall.edu',
+        }))
+        self.assertEqual(session.applicant_email, 'marcus.brody@marshall.edu')
+        self.assertDictEqual(session_write_behind.collect(), {('buffered',): 3, ('written',): 1})
+
+        # Nothing left to write.
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_concurrent_write(self):
+        """
+        Buffered changes are merged with changes that other processes wrote in the meantime.
+        """
+        self.autosave(email='marcus.brody@marshall.edu')
+
+        session = Session.objects.get()
+        session.session_data['applicant']['first_name'] = 'Marcus Aurelius'
+        Session.objects.update(session_data=session.session_data, version=F('version') + 1)
+
+        self.buffer.flush()
+
+        session = Session.objects.get()
+        self.assertEqual(session.version, 2)
+        self.assertEqual(session.applicant_vo.first_name, 'Marcus Aurelius')
+        self.assertEqual(session.applicant_vo.email, 'marcus.brody@marshall.edu')
+
+    def test_delete(self):
+        """
+        Buffered changes to a deleted session are discarded.
+        """
+        self.autosave(email='marcus.brody@marshall.edu')
+        SessionStore(self.session_key).delete()
+
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(Session.objects.exists())
+
+    def test_delete_while_flushing(self):
+        """
+        Buffered changes to a session that is deleted while they are being flushed are not written.
+        """
+        self.autosave(email='marcus.brody@marshall.edu')
+        pending = self.buffer.get(self.session_key)
+
+        SessionStore(self.session_key).delete()
+        self.assertEqual(self.buffer._write_batch([pending]), 0)
+
+        # Even without the tombstone, the session is not recreated.
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer._write_batch([pending]), 0)
+
+        self.assertFalse(Session.objects.exists())
+
+    def test_journal(self):
+        """
+        Buffered changes are recovered from the journal of a process that died without flushing them.
+        """
+        self.autosave(email='marcus.brody@marshall.edu')
+
+        # Pretend that the changes were buffered by a process that has since crashed.
+        os.rename(self.buffer._journal, os.path.join(self.directory, '99999999-0123456789abcdef.jsonl'))
+        self.buffer.discard(self.session_key)
+
+        self.assert_recovered()
+
+    def test_journal_reused_pid(self):
+        """
+        Journals are recovered even if the process that left them behind had the same PID as this one.
+        """
+        self.autosave(email='marcus.brody@marshall.edu')
+
+        os.rename(
+            self.buffer._journal,
+            os.path.join(self.directory, '{pid}-0123456789abcdef.jsonl'.format(pid=os.getpid())),
+        )
+        self.buffer.discard(self.session_key)
+
+        self.assert_recovered()
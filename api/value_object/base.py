@@ -3,6 +3,7 @@ from __future__ import absolute_import, unicode_literals, print_function
 
 from six import with_metaclass
 
+from api.instrumentation import argument_size, instrumented, result_size
 from api.value_object.fields import Field
 
 
@@ -39,15 +40,54 @@ class ValueObjectMeta(type):
 
         return super(ValueObjectMeta, mcs).__new__(mcs, name, bases, attrs)
 
-    def hydrate(cls, dehydrated):
+    @instrumented('hydrate', size=argument_size(1))
+    def hydrate(cls, dehydrated, pool=None):
         """
         Reconstructs a value object from dehydrated values.
 
         :type dehydrated: dict
 
+        :type pool: api.value_object.interning.InterningPool
+        :param pool: If provided, nested value objects are frozen and shared with other value objects hydrated using
+            the same pool.
+
         :rtype: BaseValueObject
         """
-        return cls(cls.hydrate_values(dehydrated or {}))
+        obj = cls(cls.hydrate_values(dehydrated or {}))
+
+        if pool is not None:
+            pool.intern_nested(obj)
+
+        return obj
+
+    @instrumented('hydrate_json')
+    def hydrate_json(cls, data, path=(), pool=None):
+        """
+        Reconstructs a value object directly from JSON, without decoding it into dicts first.
+
+        This only pays off for large documents; for small ones, `json.loads` + `hydrate` is about 3x faster.
+
+        :type data: unicode|bytes|bytearray|memoryview|io.IOBase
+        :param data: JSON document, or a file-like object to read it from.  Either way, the whole document is held in
+            memory; only the intermediate dicts are avoided.
+
+        :type path: tuple[unicode]
+        :param path: Keys of the (nested) object in the document that contains the dehydrated values.
+
+        :type pool: api.value_object.interning.InterningPool
+        :param pool: Same as for `hydrate`.
+
+        :rtype: BaseValueObject
+
+        :see: api.value_object.single_pass.SinglePassDecoder
+        """
+        from api.value_object.single_pass import get_decoder
+        obj = get_decoder(cls).decode(data, path)
+
+        if pool is not None:
+            pool.intern_nested(obj)
+
+        return obj
 
     def hydrate_values(cls, dehydrated):
         """
@@ -76,6 +116,12 @@ class BaseValueObject(with_metaclass(ValueObjectMeta)):
                 for name, field in self._fields.items()
         }
 
+        # Cached by `__hash__`, until the next `update`.
+        self._hash = None
+
+        # :see: freeze
+        self._frozen = False
+
     def __getattr__(self, attr):
         try:
             return self._values[attr]
@@ -85,17 +131,86 @@ class BaseValueObject(with_metaclass(ValueObjectMeta)):
                 attr    = attr,
             ))
 
+    def __eq__(self, other):
+        """
+        Value objects are equal if they are the same type and all of their (hydrated) values are equal.
+        """
+        if self is other:
+            return True
+
+        if type(other) is not type(self):
+            return NotImplemented
+
+        # If both hashes are already known, most unequal value objects can be told apart without comparing values.
+        if (self._hash is not None) and (other._hash is not None) and (self._hash != other._hash):
+            return False
+
+        return self._values == other._values
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        """
+        Returns a structural hash of the value object's values.
+
+        The hash is cached until the next `update`, and nested value objects reuse their own cached hashes.
+
+        Note:  Changing a nested value in place (e.g., updating a nested value object directly, or setting an item in a
+            collection) does not invalidate the cached hash; use `update` on the outermost value object instead.
+
+        Note also:  Like `hash`, the result is only consistent within a single process.
+        """
+        if self._hash is None:
+            self._hash = hash((type(self),) + tuple(
+                field.make_hash(self._values.get(name))
+                    for name, field in self._fields.items()
+            ))
+
+        return self._hash
+
+    @instrumented('update')
     def update(self, incoming):
         """
         Updates a value object from another value object of the same type.  Incoming null values will be ignored.
 
         :type incoming: BaseValueObject
         """
+        if self._frozen:
+            raise TypeError('{type} is frozen; update a copy instead.'.format(type=type(self).__name__))
+
         self._values.update({
             name: field.merge(self._values.get(name), incoming._values.get(name))
                 for name, field in self._fields.items()
         })
 
+        self._hash = None
+
+    @property
+    def is_frozen(self):
+        """
+        :rtype: bool
+        """
+        return self._frozen
+
+    def freeze(self):
+        """
+        Prevents the value object from being updated, so that it can be shared safely.
+
+        :see: api.value_object.interning.InterningPool
+        """
+        self._frozen = True
+
+    def copy(self):
+        """
+        Returns an (unfrozen) deep copy of the value object.
+
+        :rtype: BaseValueObject
+        """
+        return type(self).hydrate(self.dehydrate())
+
+    @instrumented('dehydrate', size=result_size)
     def dehydrate(self):
         """
         Serializes the value object into a form that can be stored in other contexts (e.g., cache, database, etc.).
@@ -112,6 +227,7 @@ class BaseValueObject(with_metaclass(ValueObjectMeta)):
                 for name, field in self._fields.items()
         }
 
+    @instrumented('get_public_values', size=result_size)
     def get_public_values(self, *fields):
         """
         Returns a dict containing the "public" version of the value object's values.
@@ -0,0 +1,180 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import os
+import re
+from hashlib import sha256
+from io import open
+from tempfile import NamedTemporaryFile
+from time import time
+
+_KEY = re.compile(r'[0-9a-f]{64}\Z')
+"""Blob keys are hex SHA-256 digests."""
+
+_SUBDIRECTORY = re.compile(r'[0-9a-f]{2}\Z')
+
+
+class BlobReference(object):
+    """
+    Reference to a binary payload that is kept in a blob store instead of in the value object's dehydrated data.
+
+    The payload is only loaded when it is read.
+
+    :see: api.value_object.fields.Binary
+    """
+    def __init__(self, store, key, size):
+        """
+        :type store: FileSystemBlobStore
+        :type key: unicode
+        :type size: int
+        """
+        super(BlobReference, self).__init__()
+
+        self.store  = store
+        self.key    = key
+        self.size   = size
+
+    def __eq__(self, other):
+        return isinstance(other, BlobReference) and (self.key == other.key)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '{type}({key!r}, size={size!r})'.format(type=type(self).__name__, key=self.key, size=self.size)
+
+    def open(self):
+        """
+        Opens the payload for reading.
+
+        :rtype: io.BufferedReader
+        """
+        return self.store.open(self.key)
+
+    def read(self):
+        """
+        Loads the payload.
+
+        :rtype: bytes
+        """
+        with self.open() as f:
+            return f.read()
+
+
+class FileSystemBlobStore(object):
+    """
+    Stores binary payloads as files, keyed by their SHA-256 digest (so storing the same payload twice is free).
+
+    Note:  Blobs are never deleted automatically, since the same blob may be referenced by any number of sessions.
+        Payloads are stored when a value object is dehydrated, i.e. before the data that references them is saved, so
+        a save that fails or is rolled back leaves an orphaned blob behind.  Use `collect_garbage` periodically to
+        remove them.
+    """
+    def __init__(self, directory):
+        """
+        :type directory: unicode
+        """
+        super(FileSystemBlobStore, self).__init__()
+
+        self.directory = directory
+
+    def put(self, data):
+        """
+        Stores a payload.
+
+        :type data: bytes|bytearray|memoryview
+
+        :rtype: unicode
+        :return: Key to retrieve the payload with.
+        """
+        key     = sha256(data).hexdigest()
+        path    = self.get_path(key)
+
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Already exists (possibly created by another process just now).
+                if not os.path.isdir(directory):
+                    raise
+
+            # Write to a temp file first, so that readers never see partial payloads.
+            with NamedTemporaryFile(dir=directory, delete=False) as f:
+                f.write(data)
+
+            os.rename(f.name, path)
+
+        return key
+
+    def open(self, key):
+        """
+        :type key: unicode
+
+        :rtype: io.BufferedReader
+        """
+        return open(self.get_path(key), 'rb')
+
+    def get_path(self, key):
+        """
+        :type key: unicode
+
+        :rtype: unicode
+
+        :raise ValueError: If the key is not a blob key (keys may come from untrusted dehydrated data, and must never
+            point outside of the store).
+        """
+        if not _KEY.match(key):
+            raise ValueError('Invalid blob key: {key!r}'.format(key=key))
+
+        # Spread files over subdirectories so that no directory gets too big.
+        return os.path.join(self.directory, key[:2], key)
+
+    def collect_garbage(self, referenced, min_age=3600):
+        """
+        Deletes blobs that are no longer referenced (e.g., orphaned by rolled back saves).
+
+        :type referenced: collections.Container[unicode]
+        :param referenced: Keys of all blobs that are still referenced (e.g., collected from every stored session).
+
+        :type min_age: int|float
+        :param min_age: Blobs (and leftover temp files) modified less than this many seconds ago are kept, since the
+            data referencing them may still be in the process of being saved.
+
+        :rtype: int
+        :return: Number of files deleted.
+        """
+        cutoff  = time() - min_age
+        deleted = 0
+
+        if not os.path.isdir(self.directory):
+            return deleted
+
+        for subdirectory in os.listdir(self.directory):
+            if not _SUBDIRECTORY.match(subdirectory):
+                continue
+
+            subdirectory = os.path.join(self.directory, subdirectory)
+
+            for name in os.listdir(subdirectory):
+                if name in referenced:
+                    continue
+
+                path = os.path.join(subdirectory, name)
+
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        deleted += 1
+                except OSError:
+                    # Already removed (e.g., by another process).
+                    pass
+
+        return deleted
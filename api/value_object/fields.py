@@ -2,12 +2,34 @@
 from __future__ import absolute_import, unicode_literals
 
 from abc import ABCMeta
-from collections import Container
+from array import array
+from base64 import b64decode, b64encode
+from collections import Container, Mapping, MutableMapping
 from datetime import datetime
-from decimal import Decimal as DecimalType
+from decimal import Decimal as DecimalType, ROUND_HALF_EVEN
+from itertools import islice
 
 from pytz import utc
-from six import with_metaclass
+from six import PY2, with_metaclass
+
+try:
+    from base64 import b85decode, b85encode
+except ImportError:
+    # Python 2 doesn't support base85; `Binary` falls back to base64.
+    b85decode = b85encode = None
+
+try:
+    import numpy
+except ImportError:
+    # numpy is optional; `FixedPoint.to_array` falls back to the `array` module.
+    numpy = None
+
+try:
+    array(str('q'))
+    _INT64_TYPECODE = str('q')
+except ValueError:
+    # Python 2 doesn't support long long arrays.
+    _INT64_TYPECODE = str('l')
 
 
 class Field(with_metaclass(ABCMeta)):
@@ -70,6 +92,50 @@ class Field(with_metaclass(ABCMeta)):
         """
         return self.dehydrate(value)
 
+    def make_hash(self, value):
+        """
+        Returns a hash of a field value, consistent with `==` (including for unhashable values such as dicts).
+
+        :see: applicant_journey.value_object.base.BaseValueObject#__hash__
+        """
+        try:
+            return hash(value)
+        except (TypeError, ValueError):
+            # ValueError:  `memoryview` objects over writable buffers are unhashable.
+            return hash(_freeze(value))
+
+    def intern(self, value, pool):
+        """
+        Returns the value to use in place of a field value, so that identical nested value objects can be shared.
+
+        :type pool: api.value_object.interning.InterningPool
+
+        :see: applicant_journey.value_object.interning.InterningPool#intern_nested
+        """
+        return value
+
+
+def _freeze(value):
+    """
+    Converts a (possibly nested) mutable value into an equivalent hashable one.
+    """
+    if isinstance(value, Mapping):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+
+    if isinstance(value, memoryview):
+        return value.tobytes()
+
+    if isinstance(value, bytearray):
+        return bytes(value)
+
+    return value
+
 
 class Primitive(Field):
     """
@@ -192,6 +258,249 @@ class Collection(Field):
                 if k in fields
         }
 
+    def make_hash(self, value):
+        """
+        :type value: dict
+        """
+        return hash(frozenset(
+            (k, self.sub_field.make_hash(v))
+                for k, v in (value or {}).items()
+        ))
+
+    def intern(self, value, pool):
+        """
+        :type value: dict
+        """
+        return {
+            k: self.sub_field.intern(v, pool)
+                for k, v in value.items()
+        }
+
+
+class LazyCollection(Collection):
+    """
+    A collection field whose items are only hydrated when they are accessed.
+
+    Use this instead of `Collection` for collections that can get very large, when most operations only touch a few of
+        the items.  The field's value is a `LazyCollectionValue` (a mutable mapping) rather than a dict.
+    """
+    def init(self, value):
+        """
+        :type value: dict|LazyCollectionValue
+        """
+        if isinstance(value, LazyCollectionValue):
+            return value
+
+        collection = LazyCollectionValue(self.sub_field)
+
+        if value is not None:
+            for k, v in value.items():
+                collection[k] = self.sub_field.init(v)
+
+        return collection
+
+    def merge(self, existing, incoming):
+        # Only the items in `incoming` need to be hydrated.
+        merged = self.init(existing)
+
+        if incoming is not None:
+            for k in incoming:
+                merged[k] = self.sub_field.merge(merged.get(k), incoming[k])
+
+        return merged
+
+    def hydrate(self, value):
+        """
+        :type value: dict
+        """
+        # The items are hydrated later, if and when they are accessed.
+        return LazyCollectionValue(self.sub_field, value)
+
+    def dehydrate(self, value):
+        """
+        :type value: LazyCollectionValue
+        """
+        if value is None:
+            return {}
+
+        return self.init(value).dehydrate()
+
+    def make_public_value(self, value):
+        """
+        :type value: LazyCollectionValue
+        """
+        if value is None:
+            return {}
+
+        value   = self.init(value)
+        fields  = set(self.public if isinstance(self.public, set) else value.keys())
+
+        return {
+            k: self.sub_field.make_public_value(v)
+                for k, v in value.iteritems_transient()
+                if k in fields
+        }
+
+    def make_hash(self, value):
+        """
+        :type value: LazyCollectionValue
+        """
+        if value is None:
+            return hash(frozenset())
+
+        return hash(frozenset(
+            (k, self.sub_field.make_hash(v))
+                for k, v in self.init(value).iteritems_transient()
+        ))
+
+    def intern(self, value, pool):
+        # Items are only hydrated when they are accessed, so there is nothing to share yet.
+        return value
+
+
+class LazyCollectionValue(MutableMapping):
+    """
+    Value of a `LazyCollection` field.
+
+    Keeps the dehydrated items it was loaded from, and hydrates each one the first time it is accessed.  When the value
+        is dehydrated, only the items that were accessed (and hence might have been modified) are dehydrated again; all
+        other items are copied over as-is.
+    """
+    def __init__(self, sub_field, dehydrated=None):
+        """
+        :type sub_field: Field
+
+        :type dehydrated: dict
+        :param dehydrated: Dehydrated items.
+        """
+        super(LazyCollectionValue, self).__init__()
+
+        self.sub_field = sub_field
+
+        self._dehydrated    = dehydrated or {}
+        """:type: dict"""
+        self._hydrated      = {}
+        """:type: dict"""
+        self._deleted       = set()
+        """:type: set"""
+
+    def __getitem__(self, key):
+        try:
+            return self._hydrated[key]
+        except KeyError:
+            if key in self._deleted or key not in self._dehydrated:
+                raise
+
+        value = self._hydrated[key] = self._hydrate_item(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._hydrated[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        self._hydrated.pop(key, None)
+        self._deleted.add(key)
+
+    def __contains__(self, key):
+        # Overridden so that checking for a key does not hydrate the item.
+        return (key in self._hydrated) or ((key in self._dehydrated) and (key not in self._deleted))
+
+    def __iter__(self):
+        for key in self._dehydrated:
+            if key not in self._deleted:
+                yield key
+
+        for key in self._hydrated:
+            if key not in self._dehydrated:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+
+        if isinstance(other, LazyCollectionValue) and not (self._hydrated or self._deleted or other._hydrated
+                                                           or other._deleted):
+            # Neither side has been touched; identical dehydrated items are equal without hydrating anything.
+            if self._dehydrated == other._dehydrated:
+                return True
+
+        if len(self) != len(other):
+            return False
+
+        # Compare without keeping the items that weren't already hydrated.
+        other_items = other.iteritems_transient() if isinstance(other, LazyCollectionValue) else other.items()
+        return dict(self.iteritems_transient()) == dict(other_items)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{type}({keys!r})'.format(type=type(self).__name__, keys=list(self))
+
+    @property
+    def hydrated_count(self):
+        """
+        Returns the number of items that have been hydrated (or set) so far.
+
+        :rtype: int
+        """
+        return len(self._hydrated)
+
+    def window(self, start, stop=None):
+        """
+        Returns a slice of the collection's items, hydrating only those items.
+
+        Items are in the same order as when iterating over the collection.
+
+        :type start: int
+        :type stop: int|None
+
+        :rtype: list[(object, object)]
+        """
+        return [(key, self[key]) for key in islice(self, start, stop)]
+
+    def iteritems_transient(self):
+        """
+        Iterates over the collection's items without keeping the items that weren't already hydrated.
+
+        Use this to read every item (e.g., to build a report) without hydrating the entire collection into memory.
+
+        :rtype: collections.Iterator[(object, object)]
+        """
+        for key in self:
+            try:
+                yield key, self._hydrated[key]
+            except KeyError:
+                yield key, self._hydrate_item(key)
+
+    def dehydrate(self):
+        """
+        :rtype: dict
+        """
+        dehydrated = {
+            k: v
+                for k, v in self._dehydrated.items()
+                if k not in self._deleted
+        }
+
+        for k, v in self._hydrated.items():
+            dehydrated[k] = self.sub_field.dehydrate(v)
+
+        return dehydrated
+
+    def _hydrate_item(self, key):
+        return self.sub_field.init(self.sub_field.hydrate(self._dehydrated[key]))
+
 
 class ValueObject(Field):
     """
@@ -241,6 +550,11 @@ class ValueObject(Field):
             return incoming
 
         if incoming is not None:
+            # Frozen value objects may be shared with other value objects; copy before modifying.
+            # :see: api.value_object.interning.InterningPool
+            if existing.is_frozen:
+                existing = existing.copy()
+
             existing.update(incoming)
 
         return existing
@@ -272,6 +586,13 @@ class ValueObject(Field):
 
         return None if value is None else value.get_public_values(*fields)
 
+    def intern(self, value, pool):
+        """
+        :type value: applicant_journey.value_object.base.BaseValueObject
+        :type pool: api.value_object.interning.InterningPool
+        """
+        return pool.intern(value)
+
 
 class Bytes(Field):
     """
@@ -292,6 +613,184 @@ class Bytes(Field):
         return None if value is None else value.decode(self.encoding)
 
 
+class Binary(Field):
+    """
+    A field that stores arbitrary binary data (e.g., uploaded documents).
+
+    Values can be `bytes`, `bytearray` or `memoryview` objects; they are stored as-is (no copies), and dehydrated using
+        base85 (base64 on Python 2), which is the most compact encoding that can be stored in JSON.
+
+    Optionally, payloads larger than `spill_threshold` bytes are moved to a blob store when dehydrated, so that only a
+        small reference is kept in the dehydrated data.  After hydrating, such values are `BlobReference` objects that
+        only load the payload when it is read.  Payloads are stored as soon as they are dehydrated, even if the
+        dehydrated data is never saved (see `FileSystemBlobStore.collect_garbage`).
+    """
+    def __init__(self, key=None, public=True, store=None, spill_threshold=None):
+        """
+        :type key: unicode
+        :type public: bool
+
+        :type store: api.value_object.blobs.FileSystemBlobStore|() -> api.value_object.blobs.FileSystemBlobStore
+        :param store: Blob store for large payloads (or a callable that returns one, if it can't be created yet when
+            the field is declared).
+
+        :type spill_threshold: int
+        :param spill_threshold: Payloads larger than this many bytes are moved to `store`.
+        """
+        super(Binary, self).__init__(key, public)
+
+        self._store             = store
+        self.spill_threshold    = spill_threshold
+
+    @property
+    def store(self):
+        """
+        :rtype: api.value_object.blobs.FileSystemBlobStore|None
+        """
+        if callable(self._store):
+            self._store = self._store()
+
+        return self._store
+
+    def init(self, value):
+        from api.value_object.blobs import BlobReference
+
+        if value is None or isinstance(value, (bytes, bytearray, memoryview, BlobReference)):
+            return value
+
+        raise TypeError('{field} expects bytes, bytearray or memoryview, got {type}.'.format(
+            field   = type(self).__name__,
+            type    = type(value).__name__,
+        ))
+
+    def hydrate(self, value):
+        if value is None:
+            return None
+
+        if isinstance(value, dict):
+            from api.value_object.blobs import BlobReference
+            return BlobReference(self.store, value['blob'], value['size'])
+
+        encoding, _, encoded = value.partition(':')
+
+        if encoding == 'b85':
+            if b85decode is None:
+                raise ValueError('base85-encoded values are not supported on this version of Python.')
+            return b85decode(encoded)
+
+        if encoding == 'b64':
+            return b64decode(encoded)
+
+        raise ValueError('Unrecognized binary encoding: {0!r}'.format(encoding))
+
+    def dehydrate(self, value):
+        from api.value_object.blobs import BlobReference
+
+        if value is None:
+            return None
+
+        if isinstance(value, BlobReference):
+            return {'blob': value.key, 'size': value.size}
+
+        if PY2 and isinstance(value, memoryview):
+            value = value.tobytes()
+
+        if (self.spill_threshold is not None) and (self.store is not None):
+            size = _nbytes(value)
+
+            if size > self.spill_threshold:
+                return {'blob': self.store.put(value), 'size': size}
+
+        if b85encode is not None:
+            return 'b85:' + b85encode(value).decode('ascii')
+
+        return 'b64:' + b64encode(value).decode('ascii')
+
+    def make_public_value(self, value):
+        """
+        Public values use standard base64, which API clients are more likely to support.
+
+        Payloads kept in a blob store are not included (only their size).
+        """
+        from api.value_object.blobs import BlobReference
+
+        if value is None:
+            return None
+
+        if isinstance(value, BlobReference):
+            return {'size': value.size}
+
+        if PY2 and isinstance(value, memoryview):
+            value = value.tobytes()
+
+        return b64encode(value).decode('ascii')
+
+
+def _nbytes(value):
+    """
+    Returns the size of a bytes-like object, in bytes.
+    """
+    if isinstance(value, memoryview):
+        return value.nbytes
+
+    return len(value)
+
+
+class Choice(Field):
+    """
+    A field whose value must be one of a fixed set of codes (e.g., `'m'` / `'f'`).
+
+    Values are replaced with the field's own instance of each code, so all hydrated value objects share the same few
+        objects (instead of each carrying its own copy), and values can be compared by identity.
+
+    Codes are dehydrated as-is; labels are only used for display (e.g., by forms).
+    """
+    def __init__(self, choices, key=None, public=True):
+        """
+        :type choices: collections.Iterable[(unicode, unicode)]
+        :param choices: (code, label) pairs, in the same format as Django's `choices`.
+
+        :type key: unicode
+        :type public: bool
+        """
+        super(Choice, self).__init__(key, public)
+
+        self.choices = tuple((code, label) for code, label in choices)
+        """:type: tuple[(unicode, unicode)]"""
+
+        self.labels = dict(self.choices)
+        """:type: dict[unicode, unicode]"""
+
+        self._canonical = {code: code for code, _ in self.choices}
+
+    def init(self, value):
+        if value is None:
+            return None
+
+        try:
+            return self._canonical[value]
+        except (KeyError, TypeError):
+            raise ValueError('{value!r} is not a valid choice; expected one of {codes!r}.'.format(
+                value   = value,
+                codes   = [code for code, _ in self.choices],
+            ))
+
+    def hydrate(self, value):
+        # Codes that are no longer valid (e.g., a choice was removed after the value was stored) are dropped, so that
+        #   old sessions can still be loaded.
+        return None if value is None else self._canonical.get(value)
+
+    def get_label(self, value):
+        """
+        Returns the human-readable label for a code.
+
+        :type value: unicode
+
+        :rtype: unicode|None
+        """
+        return self.labels.get(value)
+
+
 class Date(Field):
     """
     A field that contains a date object.
@@ -345,3 +844,157 @@ class Decimal(Field):
     def make_public_value(self, value):
         # :see: importer.core.filters.simple.Unicode#_apply
         return None if value is None else format(value, 'f')
+
+
+class Units(object):
+    """
+    Wraps a value that is already a number of `FixedPoint` units, so that it is not mistaken for an amount.
+
+    E.g., with `scale=2`, `Units(123456)` and `Decimal('1234.56')` initialize the same value, whereas `123456` is
+        treated as an amount (and initializes `12345600`).
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        """
+        :type value: int
+        """
+        super(Units, self).__init__()
+
+        self.value = int(value)
+
+    def __repr__(self):
+        return '{type}({value!r})'.format(type=type(self).__name__, value=self.value)
+
+
+class FixedPoint(Field):
+    """
+    A field that stores a decimal amount as an integer number of units of `10 ** -scale`.
+
+    E.g., with `scale=2`, `Decimal('1234.56')` (or `1234.56`, or `Units(123456)`) is stored as `123456`.
+
+    Amounts stay ints everywhere except at the API boundary:  they are dehydrated as JSON integers (no string
+        formatting), and can be summed and compared without creating any `decimal.Decimal` objects.  Only public values
+        (and `to_decimal`) are converted back to decimals.
+    """
+    def __init__(self, scale=2, key=None, public=True, rounding=ROUND_HALF_EVEN):
+        """
+        :type scale: int
+        :param scale: Number of decimal places.
+
+        :type key: unicode
+        :type public: bool
+
+        :type rounding: unicode
+        :param rounding: How to round incoming amounts that have more decimal places than `scale` (see `decimal`).
+        """
+        super(FixedPoint, self).__init__(key, public)
+
+        self.scale      = scale
+        self.rounding   = rounding
+
+        self._quantum = DecimalType(1).scaleb(-scale)
+
+    def init(self, value):
+        """
+        :type value: Units|int|decimal.Decimal|unicode|float
+        :param value: An amount (including plain ints), unless it is wrapped in `Units`.
+        """
+        if value is None:
+            return None
+
+        if isinstance(value, Units):
+            return value.value
+
+        return self.from_decimal(value)
+
+    def hydrate(self, value):
+        # Dehydrated values are already in units.
+        return None if value is None else Units(value)
+
+    def dehydrate(self, value):
+        return value
+
+    def make_public_value(self, value):
+        # :see: Decimal.make_public_value
+        return None if value is None else format(self.to_decimal(value), 'f')
+
+    def from_decimal(self, amount):
+        """
+        Converts an amount into units.
+
+        :type amount: int|decimal.Decimal|unicode|float
+
+        :rtype: int
+        """
+        if isinstance(amount, float):
+            # Go through `repr` so that e.g. 0.1 becomes Decimal('0.1') rather than 0.1000000000000000055511151231...
+            amount = repr(amount)
+
+        return int(DecimalType(amount).quantize(self._quantum, rounding=self.rounding).scaleb(self.scale))
+
+    def to_decimal(self, units):
+        """
+        Converts units into an amount.
+
+        :type units: int
+
+        :rtype: decimal.Decimal
+        """
+        return DecimalType(units).scaleb(-self.scale)
+
+    def to_array(self, values):
+        """
+        Packs values (in units) into an array for vectorized arithmetic.
+
+        Returns a numpy int64 array if numpy is installed; otherwise a (much more compact than a list, but not
+            vectorized) `array.array`.
+
+        :type values: collections.Iterable[int]
+        :param values: Must not contain nulls.
+
+        :rtype: numpy.ndarray|array.array
+        """
+        if numpy is not None:
+            return numpy.fromiter(values, dtype=numpy.int64)
+
+        return array(_INT64_TYPECODE, values)
+
+    def aggregate(self, values):
+        """
+        Computes summary statistics for values (in units), skipping nulls.
+
+        :type values: collections.Iterable[int|None]|numpy.ndarray
+
+        :rtype: dict
+        :return: count, sum, min and max (all as decimal amounts except count).
+        """
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            # Note:  unlike Python ints, the int64 sum can overflow (at ~9.2e18 units).
+            count   = len(values)
+            total   = int(values.sum())
+            lowest  = int(values.min()) if count else None
+            highest = int(values.max()) if count else None
+
+        else:
+            count, total, lowest, highest = 0, 0, None, None
+
+            for value in values:
+                if value is None:
+                    continue
+
+                count += 1
+                total += value
+
+                if lowest is None or value < lowest:
+                    lowest = value
+
+                if highest is None or value > highest:
+                    highest = value
+
+        return {
+            'count':    count,
+            'sum':      self.to_decimal(total),
+            'min':      None if lowest is None else self.to_decimal(lowest),
+            'max':      None if highest is None else self.to_decimal(highest),
+        }
@@ -0,0 +1,82 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+from weakref import WeakValueDictionary
+
+
+class InterningPool(object):
+    """
+    Shares identical nested value objects between value objects (e.g., the same loan product or employer in many
+    applicants), so that memory grows with the number of distinct values instead of the number of value objects.
+
+    Shared value objects are frozen, since changing one would change it for every value object that contains it.
+    Updating a value object that contains shared nested objects still works; nested objects are copied before they are
+    changed.
+
+    The pool only holds weak references, so shared value objects are released as soon as nothing else uses them.
+
+    Example:
+        pool        = InterningPool()
+        applicants  = [ApplicantObject.hydrate(row, pool=pool) for row in rows]
+
+    :see: api.value_object.base.ValueObjectMeta.hydrate
+    """
+    def __init__(self, max_size=10000):
+        """
+        :type max_size: int
+        :param max_size: Maximum number of distinct value objects to keep track of.  Once the pool is full, new values
+            are not shared until some of the existing ones are released.
+        """
+        super(InterningPool, self).__init__()
+
+        self.max_size = max_size
+
+        self.hits   = 0
+        self.misses = 0
+
+        # Keyed by hash.  In the (rare) event of a collision, the second value object is just not shared.
+        self._table = WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._table)
+
+    def intern(self, obj):
+        """
+        Returns the shared instance of a value object (after interning its nested value objects).
+
+        Note:  The value object is frozen, whether or not an identical one was already in the pool.
+
+        :type obj: api.value_object.base.BaseValueObject
+
+        :rtype: api.value_object.base.BaseValueObject
+        """
+        self.intern_nested(obj)
+        obj.freeze()
+
+        key     = hash(obj)
+        shared  = self._table.get(key)
+
+        if shared is not None:
+            if shared == obj:
+                self.hits += 1
+                return shared
+
+        elif len(self._table) < self.max_size:
+            self._table[key] = obj
+
+        self.misses += 1
+        return obj
+
+    def intern_nested(self, obj):
+        """
+        Replaces a value object's nested value objects with their shared instances.
+
+        The value object itself is not frozen nor shared.
+
+        :type obj: api.value_object.base.BaseValueObject
+        """
+        for name, field in obj._fields.items():
+            value = obj._values.get(name)
+
+            if value is not None:
+                obj._values[name] = field.intern(value, self)
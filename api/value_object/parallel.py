@@ -0,0 +1,214 @@
+# coding=utf-8
+"""
+Processes large batches of value objects on multiple cores.
+
+Workers hydrate value objects from JSON, apply an operation and send back plain (JSON) results; value objects
+themselves never cross process boundaries, since pickling them would cost about as much as hydrating them.
+
+Example:
+    raw_sessions    = Session.objects.values_list('session_data', flat=True).iterator()
+    public_values   = ParallelBatch(ApplicantObject, path=('applicant',)).get_public_values(raw_sessions)
+"""
+from __future__ import absolute_import, unicode_literals
+
+import json
+from collections import deque
+from itertools import islice
+from multiprocessing import cpu_count
+
+from django.core.serializers.json import DjangoJSONEncoder
+from six import text_type
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # Python 2 doesn't have `concurrent.futures` (unless the `futures` backport is installed); batches are processed
+    #   in the current process instead.
+    ProcessPoolExecutor = None
+
+
+class ParallelBatch(object):
+    """
+    Splits items into chunks, and processes the chunks in a pool of worker processes.
+
+    - Results are yielded in the same order as the items.
+    - At most `max_pending` chunks are in flight at any time, so memory use is bounded even if the items are consumed
+      from a stream that is much faster than the workers (or the results are consumed slowly).
+    - Chunks are sent to workers as a single newline-delimited JSON string, and results are sent back as a single JSON
+      string per chunk, which is much cheaper to transfer than pickled dicts.
+    """
+    def __init__(self, vo_type, path=(), workers=None, chunk_size=500, max_pending=None):
+        """
+        :type vo_type: api.value_object.base.ValueObjectMeta
+
+        :type path: tuple[unicode]
+        :param path: Keys of the (nested) object in each item that contains the value object's dehydrated values.
+            E.g., `('applicant',)` to process `session_data`.  Missing or null objects are hydrated as empty.
+
+        :type workers: int|None
+        :param workers: Number of worker processes (defaults to the number of CPUs).  0 to process items in the
+            current process (e.g., for debugging).
+
+        :type chunk_size: int
+        :param chunk_size: Number of items per chunk.
+
+        :type max_pending: int|None
+        :param max_pending: Max number of chunks in flight (defaults to twice the number of workers).
+        """
+        super(ParallelBatch, self).__init__()
+
+        self.vo_type        = vo_type
+        self.path           = tuple(path)
+        self.workers        = 0 if ProcessPoolExecutor is None else workers
+        self.chunk_size     = chunk_size
+        self.max_pending    = max_pending
+
+    def map(self, func, items):
+        """
+        Hydrates each item and yields `func(value_object)`.
+
+        :type items: collections.Iterable[unicode|bytes|dict]
+        :param items: JSON documents, or dicts of dehydrated values.
+
+        :type func: (api.value_object.base.BaseValueObject) -> object
+        :param func: Must be picklable (i.e., a module-level function), and return a JSON-serializable value.
+
+        :rtype: collections.Iterator
+        """
+        return self._map(func, items)
+
+    def dehydrate(self, items):
+        """
+        Yields the dehydrated values of each item (e.g., to normalize items that were stored by older code).
+
+        :type items: collections.Iterable[unicode|bytes|dict]
+
+        :rtype: collections.Iterator[dict]
+        """
+        return self._map(_dehydrate, items)
+
+    def get_public_values(self, items):
+        """
+        Yields the public values of each item.
+
+        :type items: collections.Iterable[unicode|bytes|dict]
+
+        :rtype: collections.Iterator[dict]
+        """
+        return self._map(_get_public_values, items)
+
+    def _map(self, func, items):
+        chunks = (self._encode_chunk(chunk) for chunk in _chunks(items, self.chunk_size))
+
+        if self.workers == 0:
+            for payload in chunks:
+                for result in _decode_results(_process_chunk(self.vo_type, self.path, func, payload)):
+                    yield result
+            return
+
+        workers     = self.workers or cpu_count()
+        max_pending = self.max_pending or (2 * workers)
+        executor    = ProcessPoolExecutor(max_workers=workers)
+        pending     = deque()
+
+        try:
+            for payload in chunks:
+                # Wait for the oldest chunk before submitting another one once enough chunks are in flight.
+                while len(pending) >= max_pending:
+                    for result in _decode_results(pending.popleft().result()):
+                        yield result
+
+                pending.append(executor.submit(_process_chunk, self.vo_type, self.path, func, payload))
+
+            while pending:
+                for result in _decode_results(pending.popleft().result()):
+                    yield result
+        finally:
+            # If the caller stops consuming results early, don't wait for the remaining chunks.
+            for future in pending:
+                future.cancel()
+
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _encode_chunk(chunk):
+        """
+        Encodes a chunk of items as newline-delimited JSON.
+
+        :type chunk: list[unicode|bytes|dict]
+
+        :rtype: unicode
+        """
+        lines = []
+
+        for item in chunk:
+            if isinstance(item, bytes):
+                item = item.decode('utf-8')
+
+            if not isinstance(item, text_type):
+                item = json.dumps(item, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+            elif '\n' in item:
+                # Newlines can only appear between tokens (strings can't contain them unescaped), so this does not
+                #   change the document.
+                item = item.replace('\n', ' ')
+
+            lines.append(item)
+
+        return '\n'.join(lines)
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _process_chunk(vo_type, path, func, payload):
+    """
+    Runs in a worker process.
+
+    :type vo_type: api.value_object.base.ValueObjectMeta
+    :type path: tuple[unicode]
+    :type func: (api.value_object.base.BaseValueObject) -> object
+    :type payload: unicode
+
+    :rtype: unicode
+    :return: JSON array of results.
+    """
+    # Items are small, so `json.loads` is faster than the single-pass decoder (`hydrate_json`), even though it decodes
+    #   the whole item.
+    return json.dumps(
+        [func(vo_type.hydrate(_get_path(json.loads(line), path))) for line in payload.split('\n')],
+        cls         = DjangoJSONEncoder,
+        separators  = (',', ':'),
+    )
+
+
+def _get_path(data, path):
+    """
+    :type data: dict|None
+    :type path: tuple[unicode]
+
+    :rtype: dict
+    """
+    for key in path:
+        data = (data or {}).get(key)
+
+    return data or {}
+
+
+def _decode_results(payload):
+    return json.loads(payload)
+
+
+def _dehydrate(obj):
+    return obj.dehydrate()
+
+
+def _get_public_values(obj):
+    return obj.get_public_values()
@@ -0,0 +1,363 @@
+# coding=utf-8
+from __future__ import absolute_import, unicode_literals
+
+import json
+import re
+from json.decoder import WHITESPACE, scanstring
+from json.scanner import make_scanner
+
+from six import binary_type, text_type
+
+from api.value_object.fields import ValueObject
+
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+"""Matches a JSON string, including the quotes."""
+
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+"""Matches a JSON number."""
+
+_LITERALS = ('true', 'false', 'null')
+
+
+class SinglePassDecoder(object):
+    """
+    Hydrates value objects directly from JSON, in a single pass.
+
+    Unlike `json.loads` + `ValueObjectMeta.hydrate`, this does not build an intermediate tree of dicts for the entire
+        document:
+
+        - Objects that map to value objects are walked according to the value object's fields, and hydrated as they
+          are decoded.
+        - Keys that are not declared as fields are skipped.  Skipped strings and scalars are never decoded; skipped
+          objects and arrays are decoded by the C scanner and discarded immediately, which is much faster than skipping
+          them in Python.
+        - Values of all other fields (including collections) are decoded with the `json` module's C scanner, then
+          hydrated by the field as usual.
+
+    Note that this is not an incremental parser:  the whole document is read into memory as text before decoding
+        starts (even if it is given as a file-like object).  What it saves is the dict tree, not the raw JSON.  To
+        keep memory bounded for large inputs, split them into smaller documents and use `iter_decode`.
+
+    Only use it for large documents:  for small ones (e.g., session data) it is about 3x slower than `json.loads` +
+        `hydrate`.  See the `session` case of `manage.py benchmark_value_objects`.
+
+    :see: api.value_object.base.ValueObjectMeta.hydrate
+    """
+    def __init__(self, vo_type):
+        """
+        :type vo_type: api.value_object.base.ValueObjectMeta
+        """
+        super(SinglePassDecoder, self).__init__()
+
+        self.vo_type = vo_type
+
+        self._scan_once = make_scanner(json.JSONDecoder())
+
+    def decode(self, data, path=()):
+        """
+        Decodes a JSON document into a value object.
+
+        :type data: unicode|bytes|bytearray|memoryview|io.IOBase
+        :param data: JSON document (bytes are assumed to be UTF-8), or a file-like object to read it from (the entire
+            document is read before decoding).
+
+        :type path: tuple[unicode]
+        :param path: Keys of the (nested) object in the document that contains the value object's values.
+            E.g., `('applicant',)` to decode `session_data`.
+            If any of the keys are missing, the value object is hydrated from an empty dict.
+
+        :rtype: api.value_object.base.BaseValueObject
+        """
+        s   = self._to_text(data)
+        idx = self._skip_whitespace(s, 0)
+
+        idx, found, depth = self._seek(s, idx, path)
+
+        if found:
+            values, idx = self._decode_values(self.vo_type, s, idx)
+        else:
+            values = self.vo_type.hydrate_values({})
+
+        # Skip the rest of the objects that contain the value object.
+        for _ in range(depth):
+            idx = self._skip_rest_of_object(s, idx)
+
+        if idx < len(s) and self._skip_whitespace(s, idx) < len(s):
+            raise self._error('Extra data', s, self._skip_whitespace(s, idx))
+
+        return self.vo_type(values)
+
+    def iter_decode(self, lines, path=()):
+        """
+        Decodes NDJSON (one document per line) into value objects, one line at a time.
+
+        Only one line is held in memory at a time (if `lines` reads lazily, like a file object does).
+
+        :type lines: collections.Iterable[unicode|bytes]
+        :param lines: E.g., a file object.
+
+        :type path: tuple[unicode]
+
+        :rtype: collections.Iterator[api.value_object.base.BaseValueObject]
+        """
+        for line in lines:
+            if line.strip():
+                yield self.decode(line, path)
+
+    @staticmethod
+    def _to_text(data):
+        if hasattr(data, 'read'):
+            data = data.read()
+
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+
+        if isinstance(data, (binary_type, bytearray)):
+            data = bytes(data).decode('utf-8')
+
+        if not isinstance(data, text_type):
+            raise TypeError('Expected JSON text or bytes, got {type}.'.format(type=type(data).__name__))
+
+        return data
+
+    def _seek(self, s, idx, path):
+        """
+        Advances to the value at the end of `path`.
+
+        :rtype: (int, bool, int)
+        :return: (index of the value, whether it was found, number of enclosing objects that haven't been consumed).
+            If the value was not found (or is null), the index is after the value or the object that should have
+            contained it.
+        """
+        for depth, key in enumerate(path):
+            if s.startswith('null', idx):
+                return idx + 4, False, depth
+
+            found   = False
+            idx     = self._begin_object(s, idx)
+
+            while s[idx] != '}':
+                k, idx = self._read_key(s, idx)
+
+                if k == key:
+                    found = True
+                    break
+
+                idx = self._end_member(s, self._skip_value(s, idx))
+
+            if not found:
+                return idx + 1, False, depth
+
+        if s.startswith('null', idx):
+            return idx + 4, False, len(path)
+
+        return idx, True, len(path)
+
+    def _skip_rest_of_object(self, s, idx):
+        """
+        Skips the remaining members of an object, after one of its values has been consumed.
+
+        :rtype: int
+        :return: Index after the object.
+        """
+        idx = self._end_member(s, idx)
+
+        while s[idx] != '}':
+            _, idx = self._read_key(s, idx)
+            idx = self._end_member(s, self._skip_value(s, idx))
+
+        return idx + 1
+
+    def _decode_values(self, vo_type, s, idx):
+        """
+        Decodes a JSON object into hydrated values for a value object.
+
+        :type vo_type: api.value_object.base.ValueObjectMeta
+
+        :rtype: (dict, int)
+        :return: (values to initialize the value object with, index after the object).
+        """
+        fields_by_key   = _get_fields_by_key(vo_type)
+        values          = {}
+
+        idx = self._begin_object(s, idx)
+
+        while s[idx] != '}':
+            key, idx    = self._read_key(s, idx)
+            field       = fields_by_key.get(key)
+
+            if field is None:
+                idx = self._skip_value(s, idx)
+            else:
+                values[key], idx = self._decode_field(field, s, idx)
+
+            idx = self._end_member(s, idx)
+
+        for key, field in fields_by_key.items():
+            if key not in values:
+                values[key] = field.hydrate(None)
+
+        return values, idx + 1
+
+    def _decode_field(self, field, s, idx):
+        """
+        Decodes and hydrates a single field value.
+
+        :type field: api.value_object.fields.Field
+
+        :rtype: (object, int)
+        """
+        if isinstance(field, ValueObject):
+            if s.startswith('null', idx):
+                return field.hydrate(None), idx + 4
+
+            return self._decode_values(field.vo_type, s, idx)
+
+        # Everything else (including collections) is decoded by the C scanner, then hydrated by the field.
+        # Walking collections item by item in Python would be slower than letting the scanner build the dict.
+        try:
+            value, end = self._scan_once(s, idx)
+        except StopIteration:
+            raise self._error('Expecting value', s, idx)
+
+        return field.hydrate(value), end
+
+    def _begin_object(self, s, idx):
+        """
+        Consumes the opening brace of a JSON object.
+
+        :rtype: int
+        :return: Index of the first key, or of the closing brace if the object is empty.
+        """
+        if not s.startswith('{', idx):
+            raise self._error('Expecting object', s, idx)
+
+        return self._expect_key_or_end(s, self._skip_whitespace(s, idx + 1), allow_end=True)
+
+    def _read_key(self, s, idx):
+        """
+        Reads an object key and the colon after it.
+
+        :rtype: (unicode, int)
+        :return: (key, index of the value).
+        """
+        key, idx = scanstring(s, idx + 1)
+
+        idx = self._skip_whitespace(s, idx)
+        if not s.startswith(':', idx):
+            raise self._error("Expecting ':' delimiter", s, idx)
+
+        return key, self._skip_whitespace(s, idx + 1)
+
+    def _end_member(self, s, idx):
+        """
+        Consumes the separator after an object member.
+
+        :rtype: int
+        :return: Index of the next key, or of the closing brace.
+        """
+        idx = self._skip_whitespace(s, idx)
+
+        if s.startswith(',', idx):
+            return self._expect_key_or_end(s, self._skip_whitespace(s, idx + 1), allow_end=False)
+
+        if s.startswith('}', idx):
+            return idx
+
+        raise self._error("Expecting ',' delimiter", s, idx)
+
+    def _expect_key_or_end(self, s, idx, allow_end):
+        if s.startswith('"', idx) or (allow_end and s.startswith('}', idx)):
+            return idx
+
+        raise self._error('Expecting property name enclosed in double quotes', s, idx)
+
+    def _skip_value(self, s, idx):
+        """
+        Skips over a JSON value without decoding it.
+
+        :rtype: int
+        :return: Index after the value.
+        """
+        try:
+            c = s[idx]
+        except IndexError:
+            raise self._error('Expecting value', s, idx)
+
+        if c == '"':
+            match = _STRING.match(s, idx)
+            if match is None:
+                raise self._error('Unterminated string starting at', s, idx)
+            return match.end()
+
+        if c in '{[':
+            # Matching brackets in Python is several times slower than letting the C scanner decode the container;
+            #   the decoded value is discarded straight away, so this only costs memory for the one value.
+            try:
+                return self._scan_once(s, idx)[1]
+            except StopIteration:
+                raise self._error('Expecting value', s, idx)
+
+        for literal in _LITERALS:
+            if s.startswith(literal, idx):
+                return idx + len(literal)
+
+        match = _NUMBER.match(s, idx)
+        if match is None:
+            raise self._error('Expecting value', s, idx)
+        return match.end()
+
+    @staticmethod
+    def _skip_whitespace(s, idx):
+        return WHITESPACE.match(s, idx).end()
+
+    @staticmethod
+    def _error(message, s, idx):
+        # Same format as the `json` module's errors.
+        lineno  = s.count('\n', 0, idx) + 1
+        colno   = idx - s.rfind('\n', 0, idx)
+
+        return ValueError('{message}: line {lineno} column {colno} (char {idx})'.format(
+            message = message,
+            lineno  = lineno,
+            colno   = colno,
+            idx     = idx,
+        ))
+
+
+_fields_by_key = {}
+""":type: dict[api.value_object.base.ValueObjectMeta, dict]"""
+
+
+def _get_fields_by_key(vo_type):
+    """
+    Returns a value object type's fields, keyed by the dict key that each field reads from.
+
+    :type vo_type: api.value_object.base.ValueObjectMeta
+
+    :rtype: dict[unicode, api.value_object.fields.Field]
+    """
+    try:
+        return _fields_by_key[vo_type]
+    except KeyError:
+        fields = _fields_by_key[vo_type] = {field.key or name: field for name, field in vo_type.fields.items()}
+        return fields
+
+
+_decoders = {}
+""":type: dict[api.value_object.base.ValueObjectMeta, SinglePassDecoder]"""
+
+
+def get_decoder(vo_type):
+    """
+    Returns the (cached) single-pass decoder for a value object type.
+
+    :type vo_type: api.value_object.base.ValueObjectMeta
+
+    :rtype: SinglePassDecoder
+    """
+    try:
+        return _decoders[vo_type]
+    except KeyError:
+        decoder = _decoders[vo_type] = SinglePassDecoder(vo_type)
+        return decoder
@@ -8,6 +8,6 @@ from api.value_object.base import BaseValueObject
 class ApplicantObject(BaseValueObject):
   first_name  = fields.Primitive()
   last_name   = fields.Primitive()
-  gender      = fields.Primitive()
+  gender      = fields.Choice((('m', 'Male'), ('f', 'Female')))
   birthday    = fields.Date()
   email       = fields.Primitive()
\ No newline at end of file
@@ -1,19 +1,44 @@
 # coding=utf-8
 from __future__ import absolute_import, unicode_literals
 
+import json
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
+from api import metrics, search
 from api.forms import ApplicantForm
+from api.ingest import ApplicantIngest
+
+
+def render_applicant(request, form, cache_form):
+  """
+  Renders the applicant page.
+
+  Shared by the sync and async versions of the view.
+
+  :type form: ApplicantForm|type
+  :type cache_form: bool
+  """
+  return render(request, 'applicant.html', {
+    'form':             form,
+    'cache_form':       cache_form,
+    'applicant':        SimpleLazyObject(request.session.get_applicant_vo),
+    'applicant_digest': request.session.get_applicant_digest(),
+  })
 
 
 class Applicant(View):
   @staticmethod
   def get(request):
-    return render(request, 'applicant.html', {
-      'form':       ApplicantForm,
-      'applicant':  request.session.get_applicant_vo(),
-    })
+    return render_applicant(request, ApplicantForm, cache_form=True)
 
   @staticmethod
   def post(request):
@@ -22,7 +47,116 @@ class Applicant(View):
     if form.is_valid():
       request.session.update_applicant_vo(form.cleaned_data)
 
-    return render(request, 'applicant.html', {
-      'form':       form,
-      'applicant':  request.session.get_applicant_vo(),
-    })
\ No newline at end of file
+    # Bound forms contain user input, so they must never be cached.
+    return render_applicant(request, form, cache_form=False)
+
+
+def get_partner(request):
+  """
+  Identifies the partner system that sent a request, from its `Authorization: Bearer <token>` header.
+
+  :rtype: unicode|None
+  :return: Name of the partner (see `settings.BULK_APPLICANT_TOKENS`), or None if the token is missing or invalid.
+  """
+  scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+  if scheme.lower() != 'bearer' or not token:
+    return None
+
+  partner = None
+
+  # Compare against every token, so that the response time doesn't reveal which partner (if any) a token is close to.
+  for name, expected in getattr(settings, 'BULK_APPLICANT_TOKENS', {}).items():
+    if constant_time_compare(token, expected):
+      partner = name
+
+  return partner
+
+
+class BulkApplicant(View):
+  """
+  Imports applicants from an NDJSON request body.
+
+  The request body is consumed line by line and the results are streamed back as NDJSON (one result per input line,
+    followed by a summary), so that neither side has to hold the entire payload in memory.
+
+  Only partners listed in `settings.BULK_APPLICANT_TOKENS` may post, and request bodies are limited to
+    `settings.BULK_APPLICANT_MAX_BYTES`.
+  """
+  @method_decorator(csrf_exempt)
+  def dispatch(self, request, *args, **kwargs):
+    # Partner systems post raw NDJSON, so they don't have a CSRF token to send (they authenticate with a token
+    #   instead).
+    return super(BulkApplicant, self).dispatch(request, *args, **kwargs)
+
+  @staticmethod
+  def post(request):
+    if get_partner(request) is None:
+      response = JsonResponse({'error': 'Missing or invalid partner token.'}, status=401)
+      response['WWW-Authenticate'] = 'Bearer'
+      return response
+
+    # The body is streamed, so its size has to be known up front (Django never reads past the Content-Length).
+    try:
+      content_length = int(request.META.get('CONTENT_LENGTH') or '')
+    except ValueError:
+      return JsonResponse({'error': 'Content-Length is required.'}, status=411)
+
+    if content_length > getattr(settings, 'BULK_APPLICANT_MAX_BYTES', 10 * 1024 * 1024):
+      return JsonResponse({'error': 'Request body is too large.'}, status=413)
+
+    ingest = ApplicantIngest()
+
+    def stream():
+      for result in ingest.ingest(request):
+        yield json.dumps(result, sort_keys=True) + '\n'
+
+      yield json.dumps({'summary': ingest.get_summary()}, sort_keys=True) + '\n'
+
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
+class ApplicantSearch(View):
+  """
+  Finds applicants by name or email, for support tooling.
+
+  Only available to (logged in) staff users.
+
+  Query parameters:
+    - q:          Search query.
+    - fuzzy:      "1" to match similar (e.g., misspelled) values instead of prefixes.
+    - page:       1-based page number.
+    - page_size:  Results per page (max 100).
+
+  :see: api.search.search
+  """
+  @staticmethod
+  def get(request):
+    if not (request.user.is_authenticated() and request.user.is_staff):
+      raise PermissionDenied()
+
+    try:
+      page      = int(request.GET.get('page', 1))
+      page_size = int(request.GET.get('page_size', 20))
+    except ValueError:
+      return JsonResponse({'error': 'page and page_size must be integers.'}, status=400)
+
+    return JsonResponse(search.search(
+      query     = request.GET.get('q', ''),
+      fuzzy     = request.GET.get('fuzzy') == '1',
+      page      = page,
+      page_size = page_size,
+    ))
+
+
+class Metrics(View):
+  """
+  Exports metrics in the Prometheus text format.
+
+  :see: api.middleware.MetricsMiddleware
+  """
+  @staticmethod
+  def get(request):
+    if not getattr(settings, 'METRICS_ENABLED', False):
+      raise Http404()
+
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
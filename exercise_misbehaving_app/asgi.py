@@ -0,0 +1,17 @@
+"""
+ASGI config for exercise_misbehaving_app project (requires Python 3.5+).
+
+It exposes the ASGI callable as a module-level variable named ``application``, e.g.::
+
+    uvicorn exercise_misbehaving_app.asgi:application
+
+:see: api.asgi
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "exercise_misbehaving_app.settings")
+
+from api.asgi import get_asgi_application
+
+application = get_asgi_application('exercise_misbehaving_app.asgi_urls')
@@ -0,0 +1,16 @@
+# coding=utf-8
+"""
+URLconf for the ASGI application:  same as the WSGI one, except that some paths are routed to async views.
+
+:see: exercise_misbehaving_app.asgi
+"""
+from __future__ import absolute_import, unicode_literals
+
+from django.conf.urls import url
+
+from api import async_views
+from exercise_misbehaving_app.urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    url(r'^applicant$', async_views.Applicant.as_view(), name='applicant'),
+] + wsgi_urlpatterns
@@ -32,7 +32,11 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'api.middleware.RequestCaptureMiddleware',
+    'api.middleware.AllocationProfilingMiddleware',
+    'api.middleware.InstrumentationMiddleware',
+    'api.middleware.MetricsMiddleware',
+    'api.sessions.middleware.LazySessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -49,8 +53,18 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')]
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Outside of development, keep compiled templates in memory (so that they can be compiled during warm-up).
+            # :see: exercise_misbehaving_app.warmup
+            'loaders': [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ] if DEBUG else [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -77,6 +91,151 @@ DATABASES = {
 
 SESSION_ENGINE = 'api.sessions.backends.custom_db'
 
+# Number of times a session save is retried (after merging) if the session was written to concurrently.
+# :see: api.sessions.backends.custom_db.SessionStore.save
+SESSION_SAVE_MAX_RETRIES = 3
+
+# Write-behind sessions
+# Buffers changes to existing sessions in memory and writes them in batches, so that clients that save the same session
+#   many times per second (e.g., autosave) cause one write per session per flush instead of one per request.
+# Buffered changes are visible to requests served by the same process straight away, but other processes only see them
+#   once they have been flushed, so this requires session affinity (sticky sessions).
+# Durability:  Changes are written within `FLUSH_INTERVAL` seconds, or when the process exits normally.  If the process
+#   crashes, they are lost, unless `JOURNAL_DIR` is set (the journal survives process crashes; set `FSYNC` as well for
+#   it to survive OS crashes, at the cost of an fsync per save).
+# Set `ENABLED` to enable.
+# :see: api.sessions.write_behind.WriteBehindBuffer
+
+SESSION_WRITE_BEHIND = {
+    'ENABLED':          False,
+    'FLUSH_INTERVAL':   0.5,
+
+    # Number of sessions written per transaction, and number of buffered sessions that triggers an early flush.
+    'BATCH_SIZE':       100,
+    'MAX_PENDING':      1000,
+
+    'JOURNAL_DIR':      None,
+    'FSYNC':            False,
+}
+
+
+# Bulk applicant ingest
+# Partner systems authenticate with `Authorization: Bearer <token>`; tokens are keyed by partner name.
+# :see: api.views.BulkApplicant
+
+BULK_APPLICANT_TOKENS = {}
+
+# Max size of a bulk ingest request body (bytes).
+BULK_APPLICANT_MAX_BYTES = 10 * 1024 * 1024
+
+
+# Caches
+# https://docs.djangoproject.com/en/1.8/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+
+    # Rendered fragments of `applicant.html`, keyed on a digest of the session data.
+    # :see: api.sessions.backends.custom_db.SessionStore.get_applicant_digest
+    'template_fragments': {
+        'BACKEND':  'api.cache.FragmentCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES':      5000,
+            'CULL_FREQUENCY':   4,
+        },
+    },
+}
+
+
+# Request capture
+# Samples requests and writes them to a JSONL log that can be replayed with `manage.py replay_requests`.
+# Set `LOG_PATH` to enable.
+# :see: api.middleware.RequestCaptureMiddleware
+
+REQUEST_CAPTURE = {
+    'LOG_PATH':         None,
+    'SAMPLE_RATE':      0.01,
+
+    # Exact paths to capture.  Never include endpoints that stream their request body (e.g., `/applicant/bulk`).
+    'PATHS':            ('/applicant',),
+
+    # How to scrub each form field:  "keep", "drop", "mask", "hash", "year", or a callable.
+    'SCRUB_RULES': {
+        'csrfmiddlewaretoken':  'drop',
+        'gender':               'keep',
+        'birthday':             'year',
+    },
+    'DEFAULT_SCRUB_RULE':   'mask',
+
+    'QUEUE_SIZE':       10000,
+    'BATCH_SIZE':       100,
+    'FLUSH_INTERVAL':   1.0,
+}
+
+
+# Instrumentation
+# Records call counts, cumulative time and payload sizes for value object and session operations.
+# :see: api.instrumentation
+
+INSTRUMENTATION_ENABLED = False
+
+
+# Allocation profiling
+# Samples requests and reports the memory allocated while handling them (requires Python 3.4+).  Enabling profiling
+#   also enables instrumentation.  Tracing allocations is slow; keep the sample rate low outside of development.
+# Set `SAMPLE_RATE` to enable.
+# :see: api.middleware.AllocationProfilingMiddleware
+
+ALLOCATION_PROFILING = {
+    'SAMPLE_RATE':  0,
+    'PATHS':        ('/applicant',),
+
+    # Appends reports to this JSONL file (reports are logged if not set).
+    'LOG_PATH':     None,
+
+    # Number of frames to record per allocation, and number of allocation sites to report.
+    'FRAMES':       10,
+    'TOP':          10,
+}
+
+
+# Metrics
+# Exported at `/metrics` in the Prometheus text format.  Enabling metrics also enables instrumentation.
+# For pre-fork servers, point `METRICS_MULTIPROCESS_DIR` at a directory shared by all workers (and empty it on
+#   startup).
+# :see: api.middleware.MetricsMiddleware
+
+METRICS_ENABLED = False
+
+METRICS_MULTIPROCESS_DIR = None
+
+METRICS_FLUSH_INTERVAL = 10.0
+
+
+# Warm-up
+# Initializes lazily-loaded state and freezes the heap when the WSGI application is loaded, so that pre-fork servers
+#   (e.g., `gunicorn --preload`) share it between workers.
+# :see: exercise_misbehaving_app.warmup
+
+WARMUP_ENABLED = False
+
+# Paths to GET during warm-up (without a session cookie).
+WARMUP_PATHS = ('/applicant',)
+
+# Host header for warm-up requests; must be in `ALLOWED_HOSTS` when `DEBUG` is off.
+WARMUP_HOST = 'localhost'
+
+
+# ASGI
+# Size of the thread pool that the ASGI handler uses for blocking work (sync views, database queries, saving the
+#   session, etc.).  Requests waiting on slow clients don't use a thread.
+# :see: api.asgi
+
+ASGI_THREADS = 10
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
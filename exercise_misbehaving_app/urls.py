@@ -3,8 +3,11 @@ from __future__ import absolute_import, unicode_literals
 
 from django.conf.urls import url
 
-from api.views import Applicant
+from api.views import Applicant, ApplicantSearch, BulkApplicant, Metrics
 
 urlpatterns = [
-    url(r'^applicant$', Applicant.as_view(), name='applicant')
+    url(r'^applicant$', Applicant.as_view(), name='applicant'),
+    url(r'^applicant/bulk$', BulkApplicant.as_view(), name='applicant-bulk'),
+    url(r'^applicant/search$', ApplicantSearch.as_view(), name='applicant-search'),
+    url(r'^metrics$', Metrics.as_view(), name='metrics'),
 ]
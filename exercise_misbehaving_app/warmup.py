@@ -0,0 +1,169 @@
+# coding=utf-8
+"""
+Warms up the application before a pre-fork server (e.g., `gunicorn --preload`) forks its workers.
+
+Anything that is lazily initialized on the first request (URL resolvers, compiled templates, form media, `strptime`'s
+regex cache, etc.) is initialized once in the parent process instead of once per worker, and then the heap is frozen
+so that the garbage collector does not touch (and hence copy) those pages in the workers.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import gc
+import logging
+from datetime import datetime
+from io import BytesIO
+from sys import stderr
+from time import time
+
+from django.conf import settings
+from django.core.urlresolvers import get_resolver, get_urlconf, resolve, reverse
+from django.db import connections
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(application=None, paths=None):
+    """
+    Exercises code paths that would otherwise be initialized by the first request(s) in each worker, then freezes the
+    heap.
+
+    Must be called before the server forks, and after the application has been loaded.
+
+    :type application: callable
+    :param application: WSGI application to send warm-up requests to.  If not provided, no requests are sent.
+
+    :type paths: collections.Iterable[unicode]
+    :param paths: Paths to GET.  Defaults to `settings.WARMUP_PATHS`.
+        Note:  Warm-up requests do not send a session cookie, so they should not touch the database.
+
+    :rtype: dict
+    :return: Timings for each step (seconds), for logging.
+    """
+    timings = {}
+
+    def step(name, func, *args):
+        started = time()
+        try:
+            func(*args)
+        except Exception:
+            # Warming up is an optimization; never prevent the server from starting.
+            logger.warning('Warm-up step %s failed.', name, exc_info=True)
+        timings[name] = time() - started
+
+    step('urls', _warm_up_urls)
+    step('templates', _warm_up_templates)
+    step('forms', _warm_up_forms)
+    step('value_objects', _warm_up_value_objects)
+
+    if application is not None:
+        for path in (getattr(settings, 'WARMUP_PATHS', ()) if paths is None else paths):
+            step('GET {0}'.format(path), _warm_up_request, application, path)
+
+    # Connections must never be shared between processes.
+    step('close_connections', connections.close_all)
+    step('freeze', _freeze)
+
+    logger.info('Warm-up complete: %r', timings)
+    return timings
+
+
+def _warm_up_urls():
+    """
+    Populates the URL resolver (and its reverse lookup dicts).
+    """
+    resolver = get_resolver(get_urlconf())
+
+    for pattern in resolver.url_patterns:
+        name = getattr(pattern, 'name', None)
+        if name:
+            resolve(reverse(name))
+
+
+def _warm_up_templates():
+    """
+    Compiles templates.
+
+    Note:  This only helps if the cached template loader is enabled (see `TEMPLATES` in settings).
+    """
+    get_template('applicant.html')
+
+
+def _warm_up_forms():
+    """
+    Renders and validates forms, which also compiles the regexes that `strptime` uses to parse dates.
+    """
+    from api.forms import ApplicantForm
+
+    ApplicantForm().as_table()
+
+    ApplicantForm({
+        'first_name':   'Marcus',
+        'last_name':    'Brody',
+        'gender':       'm',
+        'birthday':     '1900-08-13',
+        'email':        'marcus.brody@marshall.edu',
+    }).is_valid()
+
+
+def _warm_up_value_objects():
+    """
+    Round-trips a value object, which exercises the `strptime` formats used by date/datetime fields.
+    """
+    from api.value_objects import ApplicantObject
+
+    applicant = ApplicantObject.hydrate({'birthday': '1900-08-13'})
+    applicant.get_public_values()
+    ApplicantObject.hydrate(applicant.dehydrate())
+
+    datetime.strptime('2000-01-01 00:00:00', '%Y-%m-%d %H:%M:%S')
+
+
+def _warm_up_request(application, path):
+    """
+    Sends a GET request directly to the WSGI application.
+    """
+    path, _, query_string = path.partition('?')
+
+    environ = {
+        'REQUEST_METHOD':       str('GET'),
+        'PATH_INFO':            str(path),
+        'QUERY_STRING':         str(query_string),
+        'SCRIPT_NAME':          str(''),
+        'SERVER_NAME':          str(getattr(settings, 'WARMUP_HOST', 'localhost')),
+        'SERVER_PORT':          str('80'),
+        'SERVER_PROTOCOL':      str('HTTP/1.1'),
+        'REMOTE_ADDR':          str('127.0.0.1'),
+        'wsgi.input':           BytesIO(),
+        'wsgi.errors':          stderr,
+        'wsgi.version':         (1, 0),
+        'wsgi.url_scheme':      str('http'),
+        'wsgi.multithread':     True,
+        'wsgi.multiprocess':    True,
+        'wsgi.run_once':        False,
+    }
+
+    statuses = []
+
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+    if not statuses[0].startswith('200'):
+        logger.warning('Warm-up request to %s returned %s.', path, statuses[0])
+
+
+def _freeze():
+    """
+    Collects garbage, then moves everything that survived to the permanent generation, so that the garbage collector
+    does not write to those objects (and cause their pages to be copied) in the forked workers.
+    """
+    gc.collect()
+
+    # Requires Python 3.7.
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
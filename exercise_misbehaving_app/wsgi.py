@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "exercise_misbehaving_app.settings")
 
 application = get_wsgi_application()
+
+# When the server loads the application before forking its workers (e.g., `gunicorn --preload`), warm it up first so
+#   that the workers share the initialized state instead of each paying for it on their first requests.
+from django.conf import settings
+
+if settings.WARMUP_ENABLED:
+    from exercise_misbehaving_app.warmup import warm_up
+    warm_up(application)